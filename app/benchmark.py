@@ -0,0 +1,373 @@
+"""
+Offline benchmark of the price monitor and the read paths of the API.
+
+Every case (database backend x number of symbols) runs in a fresh process against a
+seeded FakeMarket served by app.fake_exchange, on a throwaway database:
+    - sqlite: a temporary database file
+    - postgresql: the database BENCH_DB_NAME (default coin_monitor_bench) on DB_HOST,
+      whose coin monitor tables are emptied first; skipped when DB_HOST isn't set
+
+Timed operations: update_coin_prices (one full tick, including the ticker request),
+get_all_coin_monitors and get_coin_price_history, plus the tick phase breakdown.
+
+Usage:
+    python -m app.benchmark --sizes 100,1000,10000 --output bench.json
+    python -m app.benchmark --baseline bench.json --tolerance 0.25
+
+With --baseline, the medians are compared to the baseline results and the exit status
+is 1 if any operation got slower than the tolerance allows.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from .fake_exchange import FakeExchange, FakeMarket
+
+# Seconds between random-walk steps of the fake market
+BENCH_MARKET_INTERVAL = 0.5
+
+# Database used for the PostgreSQL cases; its coin monitor tables are emptied
+BENCH_DB_NAME = os.getenv('BENCH_DB_NAME', 'coin_monitor_bench')
+
+# Seconds a single case may run before it is reported as failed
+BENCH_CASE_TIMEOUT = float(os.getenv('BENCH_CASE_TIMEOUT', '1800'))
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CREATE_TABLES_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'create_tables.sql')
+
+def summarize(samples):
+    """
+    Summarize durations.
+
+    Args:
+        samples: Durations in seconds
+
+    Returns:
+        dict: Number of runs and min/median/mean/p95/max in milliseconds
+    """
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        "runs": len(ordered),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p95_ms": round(p95 * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+def time_call(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+def prepare_postgres_database(connection, cursor):
+    """Create the tables and empty the ones the benchmark fills."""
+    with open(CREATE_TABLES_SQL) as sql_file:
+        cursor.execute(sql_file.read())
+    cursor.execute("TRUNCATE coin_monitor, price_history, price_cycles, price_history_ring, price_rollups RESTART IDENTITY")
+    connection.commit()
+
+def run_case(backend, symbol_count, repeat, warmup, seed):
+    """
+    Run one benchmark case in this process. The environment (database, BINANCE_API_URL)
+    has been set up by the parent, so the app modules are only imported here.
+
+    Returns:
+        dict: The case results
+    """
+    from .coin_monitor import get_all_coin_monitors, get_coin_price_history
+    from .coin_price_monitor import initialize_coin_monitor, update_coin_prices
+    from .database import close_connection_pool, db_connection, get_connection_pool
+    from .metrics import TICK_PHASES, tick_metrics
+
+    if get_connection_pool().backend != backend:
+        raise RuntimeError(f"Could not connect to the {backend} database")
+    if backend == "postgresql":
+        with db_connection() as (connection, cursor):
+            prepare_postgres_database(connection, cursor)
+
+    operations = {}
+    duration, initialized = time_call(initialize_coin_monitor)
+    if not initialized:
+        raise RuntimeError("initialize_coin_monitor failed")
+    operations["initialize_coin_monitor"] = summarize([duration])
+
+    # Fill the indicator windows and price_history before measuring
+    for _ in range(warmup):
+        update_coin_prices()
+
+    phases_before = {phase: tick_metrics.phases[phase].snapshot() for phase in TICK_PHASES}
+    samples = []
+    for _ in range(repeat):
+        duration, updated = time_call(update_coin_prices)
+        if not updated:
+            raise RuntimeError("update_coin_prices failed")
+        samples.append(duration)
+        # Let the market move between ticks
+        time.sleep(BENCH_MARKET_INTERVAL)
+    operations["update_coin_prices"] = summarize(samples)
+
+    tick_phases = {}
+    for phase in TICK_PHASES:
+        after = tick_metrics.phases[phase].snapshot()
+        count = after["count"] - phases_before[phase]["count"]
+        if count:
+            tick_phases[phase] = round((after["sum"] - phases_before[phase]["sum"]) / count * 1000, 3)
+
+    operations["get_all_coin_monitors"] = summarize([time_call(get_all_coin_monitors)[0] for _ in range(repeat)])
+
+    rng = random.Random(seed)
+    symbols = [f"COIN{rng.randrange(symbol_count)}USDT" for _ in range(repeat)]
+    samples = []
+    for symbol in symbols:
+        duration, history = time_call(get_coin_price_history, symbol)
+        if history is None:
+            raise RuntimeError(f"No price history for {symbol}")
+        samples.append(duration)
+    operations["get_coin_price_history"] = summarize(samples)
+
+    close_connection_pool()
+    return {
+        "backend": backend,
+        "symbols": symbol_count,
+        "operations": operations,
+        "tick_phases_mean_ms": tick_phases,
+    }
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class FakeExchangeThread:
+    """A FakeExchange serving a seeded market on an event loop in a background thread."""
+
+    def __init__(self, symbol_count, seed):
+        market = FakeMarket(symbol_count, seed=seed)
+        self.exchange = FakeExchange(market, interval=BENCH_MARKET_INTERVAL, weight_limit=10 ** 9)
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._future = None
+
+    def start(self, timeout=10.0):
+        self._thread.start()
+        self._future = asyncio.run_coroutine_threadsafe(self.exchange.serve("127.0.0.1", self.port), self._loop)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError("The fake exchange didn't start")
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._future.cancel)
+        time.sleep(0.1)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+def case_environment(backend, api_url, workdir):
+    """Environment of a case process: the fake exchange, a throwaway database, no rate limiting."""
+    env = dict(os.environ)
+    env.update({
+        "BINANCE_API_URL": api_url,
+        "BINANCE_CACHE_TTL": "0",
+        "BINANCE_WEIGHT_LIMIT": str(10 ** 9),
+        "MONITOR_QUOTE_ASSETS": "USDT",
+        "MONITOR_SHARD_COUNT": "0",
+        "MONITOR_LEADER_ELECTION": "false",
+        "PYTHONPATH": PROJECT_ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+    })
+    if backend == "sqlite":
+        env.pop("DB_HOST", None)
+        env["SQLITE_DB_PATH"] = os.path.join(workdir, "benchmark.db")
+    else:
+        env["DB_NAME"] = BENCH_DB_NAME
+    return env
+
+def run_case_process(backend, symbol_count, api_url, args):
+    """Run a case in a fresh interpreter, so module-level configuration and state start clean."""
+    with tempfile.TemporaryDirectory() as workdir:
+        command = [
+            sys.executable, "-m", "app.benchmark", "--case", backend, str(symbol_count),
+            "--repeat", str(args.repeat), "--warmup", str(args.warmup), "--seed", str(args.seed),
+            "--log-level", args.log_level,
+        ]
+        completed = subprocess.run(
+            command, cwd=workdir, env=case_environment(backend, api_url, workdir),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=BENCH_CASE_TIMEOUT,
+        )
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "unknown error"
+        return {"backend": backend, "symbols": symbol_count, "error": error}
+    return json.loads(completed.stdout)
+
+def postgres_skip_reason():
+    if not os.getenv("DB_HOST"):
+        return "DB_HOST is not set"
+    try:
+        import psycopg2  # noqa: F401
+    except ImportError:
+        return "psycopg2 is not installed"
+    return None
+
+def run_benchmarks(args):
+    """Run all cases and return the results document."""
+    results = []
+    for symbol_count in args.sizes:
+        exchange = FakeExchangeThread(symbol_count, args.seed)
+        exchange.start()
+        try:
+            for backend in args.backends:
+                if backend == "postgresql" and postgres_skip_reason():
+                    results.append({"backend": backend, "symbols": symbol_count, "skipped": postgres_skip_reason()})
+                    continue
+                logging.info(f"Running {backend} with {symbol_count} symbols")
+                result = run_case_process(backend, symbol_count, exchange.url, args)
+                if "error" in result:
+                    logging.error(f"{backend} with {symbol_count} symbols failed: {result['error']}")
+                results.append(result)
+        finally:
+            exchange.stop()
+
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "warmup": args.warmup,
+        },
+        "results": results,
+    }
+
+def compare_to_baseline(current, baseline, tolerance, min_delta_ms):
+    """
+    Compare the median durations of two results documents.
+
+    An operation regressed when its median is more than `tolerance` (a fraction) and
+    more than `min_delta_ms` slower than in the baseline; the absolute threshold keeps
+    sub-millisecond noise from failing the comparison.
+
+    Returns:
+        tuple: (comparisons, regressions) - lists of dicts per case and operation
+    """
+    baseline_cases = {
+        (case["backend"], case["symbols"]): case for case in baseline.get("results", []) if "operations" in case
+    }
+    comparisons = []
+    for case in current.get("results", []):
+        base_case = baseline_cases.get((case["backend"], case["symbols"]))
+        if base_case is None or "operations" not in case:
+            continue
+        for operation, stats in case["operations"].items():
+            base_stats = base_case["operations"].get(operation)
+            if base_stats is None:
+                continue
+            baseline_ms = base_stats["median_ms"]
+            current_ms = stats["median_ms"]
+            ratio = current_ms / baseline_ms if baseline_ms > 0 else float("inf")
+            comparisons.append({
+                "backend": case["backend"],
+                "symbols": case["symbols"],
+                "operation": operation,
+                "baseline_ms": baseline_ms,
+                "current_ms": current_ms,
+                "ratio": round(ratio, 3),
+                "regressed": ratio > 1 + tolerance and current_ms - baseline_ms > min_delta_ms,
+            })
+    return comparisons, [comparison for comparison in comparisons if comparison["regressed"]]
+
+def print_summary(document, comparisons):
+    for case in document["results"]:
+        label = f"{case['backend']:<10} {case['symbols']:>6} symbols"
+        if "skipped" in case:
+            print(f"{label}  skipped: {case['skipped']}", file=sys.stderr)
+        elif "error" in case:
+            print(f"{label}  failed: {case['error']}", file=sys.stderr)
+        else:
+            for operation, stats in case["operations"].items():
+                print(f"{label}  {operation:<24} median {stats['median_ms']:>10.3f} ms  p95 {stats['p95_ms']:>10.3f} ms",
+                      file=sys.stderr)
+    for comparison in comparisons:
+        status = "REGRESSED" if comparison["regressed"] else "ok"
+        print(f"{comparison['backend']:<10} {comparison['symbols']:>6} symbols  {comparison['operation']:<24} "
+              f"{comparison['baseline_ms']:>10.3f} -> {comparison['current_ms']:>10.3f} ms  x{comparison['ratio']:<6} {status}",
+              file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the price monitor against a fake exchange")
+    parser.add_argument("--sizes", default="100,1000,10000", help="Comma-separated numbers of symbols")
+    parser.add_argument("--backends", default="sqlite,postgresql", help="Comma-separated database backends")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per operation")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed ticks before measuring")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the synthetic market")
+    parser.add_argument("--output", help="Write the results JSON to this file instead of stdout")
+    parser.add_argument("--baseline", help="Results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown of a median, as a fraction")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore slowdowns smaller than this")
+    parser.add_argument("--log-level", default="WARNING", help="Log level of the app during the runs")
+    parser.add_argument("--case", nargs=2, metavar=("BACKEND", "SYMBOLS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        # Configure logging before the app modules are imported, their basicConfig() is then a no-op
+        logging.basicConfig(level=args.log_level.upper(), stream=sys.stderr,
+                            format='%(asctime)s - %(levelname)s - %(message)s')
+        backend, symbol_count = args.case[0], int(args.case[1])
+        print(json.dumps(run_case(backend, symbol_count, args.repeat, args.warmup, args.seed)))
+        return
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    # The fake exchange answers every ticker request as a rejected WebSocket handshake, don't log each one
+    logging.getLogger("websockets").setLevel(logging.WARNING)
+    args.sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    args.backends = [backend.strip() for backend in args.backends.split(",") if backend.strip()]
+    unknown = set(args.backends) - {"sqlite", "postgresql"}
+    if unknown:
+        parser.error(f"Unknown backends: {', '.join(sorted(unknown))}")
+
+    document = run_benchmarks(args)
+
+    comparisons, regressions = [], []
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        comparisons, regressions = compare_to_baseline(document, baseline, args.tolerance, args.min_delta_ms)
+        document["comparison"] = {
+            "baseline": args.baseline,
+            "tolerance": args.tolerance,
+            "min_delta_ms": args.min_delta_ms,
+            "operations": comparisons,
+        }
+
+    output = json.dumps(document, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output + "\n")
+    else:
+        print(output)
+    print_summary(document, comparisons)
+
+    failed = any("error" in case for case in document["results"])
+    if regressions or failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
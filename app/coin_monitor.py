@@ -1,17 +1,30 @@
 import logging
-import os
-import sqlite3
-import requests
+import random
 import time
 from fastapi import HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
+from .database import db_connection, serialized_write, symbol_filter
+from .http_client import binance_get
+from .price_cycles import (
+    CYCLE_FIELD_PATTERN,
+    append_cycles,
+    cycle_fields,
+    load_cycles,
+    pad_cycles,
+    replace_latest_cycles,
+    set_cycles,
+)
+from .rate_limit import RateLimitExceeded
+from .rollups import price_rollup_store
+from .snapshot import snapshot_store
+from .trade_aggregator import get_trade_aggregator
 
 # Import PostgreSQL libraries if available
 try:
     import psycopg2
-    from psycopg2.extras import execute_batch
+    from psycopg2.extras import execute_values
     POSTGRES_AVAILABLE = True
 except ImportError:
     POSTGRES_AVAILABLE = False
@@ -84,713 +97,622 @@ class CoinMonitor(CoinMonitorBase):
     high_price_9: float = 0.0
     low_price_10: float = 0.0
     high_price_10: float = 0.0
+    trend: str = "Neutral"
+    cycle_status: str = "Consolidation"
     created_at: datetime
     updated_at: datetime
 
     class Config:
         orm_mode = True
 
-def get_database_connection():
-    """Create and return a database connection (PostgreSQL or SQLite)."""
-    connection = None
-    try:
-        # Check if PostgreSQL is available and configured
-        if POSTGRES_AVAILABLE and os.getenv('DB_HOST'):
-            try:
-                # Connect to PostgreSQL
-                connection = psycopg2.connect(
-                    user=os.getenv('DB_USER', 'postgres'),
-                    password=os.getenv('DB_PASSWORD', 'postgres'),
-                    host=os.getenv('DB_HOST', 'localhost'),
-                    port=os.getenv('DB_PORT', '5432'),
-                    database=os.getenv('DB_NAME', 'coin_monitor'),
-                )
-                cursor = connection.cursor()
-                logging.info("Successfully connected to the PostgreSQL database.")
-                return connection, cursor
-            except Exception as e:
-                logging.error(f"Error connecting to PostgreSQL database: {e}")
-                logging.info("Falling back to SQLite database.")
-                # If PostgreSQL connection fails, fall back to SQLite
-
-        # Use SQLite database
-        db_path = os.path.join(os.path.dirname(__file__), 'coin_monitor.db')
-        connection = sqlite3.connect(db_path)
-        cursor = connection.cursor()
-
-        # Create the coin_monitor table if it doesn't exist
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS coin_monitor (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                symbol TEXT NOT NULL UNIQUE,
-                initial_price REAL NOT NULL,
-                low_price REAL NOT NULL,
-                high_price REAL NOT NULL,
-                latest_price REAL NOT NULL,
-                low_price_1 REAL DEFAULT 0.0,
-                high_price_1 REAL DEFAULT 0.0,
-                low_price_2 REAL DEFAULT 0.0,
-                high_price_2 REAL DEFAULT 0.0,
-                low_price_3 REAL DEFAULT 0.0,
-                high_price_3 REAL DEFAULT 0.0,
-                low_price_4 REAL DEFAULT 0.0,
-                high_price_4 REAL DEFAULT 0.0,
-                low_price_5 REAL DEFAULT 0.0,
-                high_price_5 REAL DEFAULT 0.0,
-                low_price_6 REAL DEFAULT 0.0,
-                high_price_6 REAL DEFAULT 0.0,
-                low_price_7 REAL DEFAULT 0.0,
-                high_price_7 REAL DEFAULT 0.0,
-                low_price_8 REAL DEFAULT 0.0,
-                high_price_8 REAL DEFAULT 0.0,
-                low_price_9 REAL DEFAULT 0.0,
-                high_price_9 REAL DEFAULT 0.0,
-                low_price_10 REAL DEFAULT 0.0,
-                high_price_10 REAL DEFAULT 0.0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        connection.commit()
-        logging.info("Successfully connected to the SQLite database.")
-        return connection, cursor
-    except Exception as e:
-        logging.error(f"Error connecting to database: {e}")
-        if connection:
-            connection.close()
-        raise
+def load_coin_monitors(connection, cursor):
+    """
+    Load all coin monitor records and their price cycles.
+
+    Args:
+        connection: Database connection
+        cursor: Database cursor
+
+    Returns:
+        list: Coin monitor records ordered by symbol
+    """
+    # No need for placeholders in this query, but we'll keep the pattern consistent
+    query = """
+        SELECT id, symbol, initial_price, low_price, high_price, latest_price,
+               trend, cycle_status, created_at, updated_at
+        FROM coin_monitor
+        ORDER BY symbol
+    """
+    cursor.execute(query)
+    records = cursor.fetchall()
+
+    # Load the price cycles of all coins in one query
+    cycles = load_cycles(connection, cursor)
+
+    result = []
+    for record in records:
+        coin = {
+            "id": record[0],
+            "symbol": record[1],
+            "initial_price": record[2],
+            "low_price": record[3],
+            "high_price": record[4],
+            "latest_price": record[5]
+        }
+        coin.update(cycle_fields(cycles.get(record[1], pad_cycles([]))))
+        coin["trend"] = record[6]
+        coin["cycle_status"] = record[7]
+        coin["created_at"] = record[8]
+        coin["updated_at"] = record[9]
+        result.append(coin)
+
+    return result
 
 def get_all_coin_monitors():
     """Get all coin monitor records from the database."""
     try:
-        connection, cursor = get_database_connection()
-
-        # No need for placeholders in this query, but we'll keep the pattern consistent
-        query = """
-            SELECT id, symbol, initial_price, low_price, high_price, latest_price,
-                   low_price_1, high_price_1, low_price_2, high_price_2,
-                   low_price_3, high_price_3, low_price_4, high_price_4,
-                   low_price_5, high_price_5, low_price_6, high_price_6,
-                   low_price_7, high_price_7, low_price_8, high_price_8,
-                   low_price_9, high_price_9, low_price_10, high_price_10,
-                   created_at, updated_at
-            FROM coin_monitor
-            ORDER BY symbol
-        """
-        cursor.execute(query)
-        records = cursor.fetchall()
-
-        result = []
-        for record in records:
-            result.append({
-                "id": record[0],
-                "symbol": record[1],
-                "initial_price": record[2],
-                "low_price": record[3],
-                "high_price": record[4],
-                "latest_price": record[5],
-                "low_price_1": record[6],
-                "high_price_1": record[7],
-                "low_price_2": record[8],
-                "high_price_2": record[9],
-                "low_price_3": record[10],
-                "high_price_3": record[11],
-                "low_price_4": record[12],
-                "high_price_4": record[13],
-                "low_price_5": record[14],
-                "high_price_5": record[15],
-                "low_price_6": record[16],
-                "high_price_6": record[17],
-                "low_price_7": record[18],
-                "high_price_7": record[19],
-                "low_price_8": record[20],
-                "high_price_8": record[21],
-                "low_price_9": record[22],
-                "high_price_9": record[23],
-                "low_price_10": record[24],
-                "high_price_10": record[25],
-                "created_at": record[26],
-                "updated_at": record[27]
-            })
-
-        return result
+        with db_connection() as (connection, cursor):
+            return load_coin_monitors(connection, cursor)
     except Exception as e:
         logging.error(f"Error getting coin monitor records: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cursor.close()
-        connection.close()
+
+def refresh_snapshot():
+    """
+    Publish a new coin snapshot from the database, e.g. after a record was changed
+    outside the price tick.
+
+    Returns:
+        CoinSnapshot: The published snapshot, or None if it couldn't be loaded
+    """
+    try:
+        with db_connection() as (connection, cursor):
+            return snapshot_store.publish(load_coin_monitors(connection, cursor))
+    except Exception as e:
+        logging.error(f"Error refreshing coin snapshot: {e}")
+        return None
 
 def get_coin_monitor_by_symbol(symbol: str):
     """Get a coin monitor record by symbol."""
     try:
-        connection, cursor = get_database_connection()
-
-        if isinstance(connection, psycopg2.extensions.connection):
-            query = """
-                SELECT id, symbol, initial_price, low_price, high_price, latest_price,
-                       low_price_1, high_price_1, low_price_2, high_price_2,
-                       low_price_3, high_price_3, low_price_4, high_price_4,
-                       low_price_5, high_price_5, low_price_6, high_price_6,
-                       low_price_7, high_price_7, low_price_8, high_price_8,
-                       low_price_9, high_price_9, low_price_10, high_price_10,
-                       created_at, updated_at
-                FROM coin_monitor
-                WHERE symbol = %s
-            """
-        else:
-            query = """
-                SELECT id, symbol, initial_price, low_price, high_price, latest_price,
-                       low_price_1, high_price_1, low_price_2, high_price_2,
-                       low_price_3, high_price_3, low_price_4, high_price_4,
-                       low_price_5, high_price_5, low_price_6, high_price_6,
-                       low_price_7, high_price_7, low_price_8, high_price_8,
-                       low_price_9, high_price_9, low_price_10, high_price_10,
-                       created_at, updated_at
-                FROM coin_monitor
-                WHERE symbol = ?
-            """
-        cursor.execute(query, (symbol,))
-        record = cursor.fetchone()
+        with db_connection() as (connection, cursor):
+            if isinstance(connection, psycopg2.extensions.connection):
+                query = """
+                    SELECT id, symbol, initial_price, low_price, high_price, latest_price,
+                           trend, cycle_status, created_at, updated_at
+                    FROM coin_monitor
+                    WHERE symbol = %s
+                """
+            else:
+                query = """
+                    SELECT id, symbol, initial_price, low_price, high_price, latest_price,
+                           trend, cycle_status, created_at, updated_at
+                    FROM coin_monitor
+                    WHERE symbol = ?
+                """
+            cursor.execute(query, (symbol,))
+            record = cursor.fetchone()
 
-        if not record:
-            return None
+            if not record:
+                return None
 
-        return {
-            "id": record[0],
-            "symbol": record[1],
-            "initial_price": record[2],
-            "low_price": record[3],
-            "high_price": record[4],
-            "latest_price": record[5],
-            "low_price_1": record[6],
-            "high_price_1": record[7],
-            "low_price_2": record[8],
-            "high_price_2": record[9],
-            "low_price_3": record[10],
-            "high_price_3": record[11],
-            "low_price_4": record[12],
-            "high_price_4": record[13],
-            "low_price_5": record[14],
-            "high_price_5": record[15],
-            "low_price_6": record[16],
-            "high_price_6": record[17],
-            "low_price_7": record[18],
-            "high_price_7": record[19],
-            "low_price_8": record[20],
-            "high_price_8": record[21],
-            "low_price_9": record[22],
-            "high_price_9": record[23],
-            "low_price_10": record[24],
-            "high_price_10": record[25],
-            "created_at": record[26],
-            "updated_at": record[27]
-        }
+            cycles = load_cycles(connection, cursor, symbol)
+
+            coin = {
+                "id": record[0],
+                "symbol": record[1],
+                "initial_price": record[2],
+                "low_price": record[3],
+                "high_price": record[4],
+                "latest_price": record[5]
+            }
+            coin.update(cycle_fields(cycles.get(symbol, pad_cycles([]))))
+            coin["trend"] = record[6]
+            coin["cycle_status"] = record[7]
+            coin["created_at"] = record[8]
+            coin["updated_at"] = record[9]
+            return coin
     except Exception as e:
         logging.error(f"Error getting coin monitor by symbol: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cursor.close()
-        connection.close()
 
+@serialized_write
 def update_coin_monitor(symbol: str, data: dict):
     """Update a coin monitor record."""
     try:
-        connection, cursor = get_database_connection()
-
-        # First check if the record exists
-        if isinstance(connection, psycopg2.extensions.connection):
-            check_query = "SELECT id FROM coin_monitor WHERE symbol = %s"
-        else:
-            check_query = "SELECT id FROM coin_monitor WHERE symbol = ?"
-        cursor.execute(check_query, (symbol,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail=f"Coin monitor for symbol {symbol} not found")
-
-        # Build the update query dynamically based on provided fields
-        update_fields = []
-        update_values = []
-
-        # Use appropriate placeholder based on connection type
-        placeholder = "%s" if isinstance(connection, psycopg2.extensions.connection) else "?"
-
-        for key, value in data.items():
-            if value is not None:
-                update_fields.append(f"{key} = {placeholder}")
-                update_values.append(value)
-
-        # Add updated_at timestamp
-        update_fields.append("updated_at = CURRENT_TIMESTAMP")
-
-        # If no fields to update, return early
-        if not update_fields:
-            return {"message": "No fields to update"}
-
-        # Build and execute the update query
-        update_query = f"""
-            UPDATE coin_monitor
-            SET {', '.join(update_fields)}
-            WHERE symbol = {placeholder}
-        """
-        update_values.append(symbol)
+        with db_connection() as (connection, cursor):
+            # First check if the record exists
+            if isinstance(connection, psycopg2.extensions.connection):
+                check_query = "SELECT id FROM coin_monitor WHERE symbol = %s"
+            else:
+                check_query = "SELECT id FROM coin_monitor WHERE symbol = ?"
+            cursor.execute(check_query, (symbol,))
+            if not cursor.fetchone():
+                raise HTTPException(status_code=404, detail=f"Coin monitor for symbol {symbol} not found")
+
+            # Build the update query dynamically based on provided fields
+            update_fields = []
+            update_values = []
+
+            # Use appropriate placeholder based on connection type
+            placeholder = "%s" if isinstance(connection, psycopg2.extensions.connection) else "?"
+
+            # Cycle fields (high_price_N/low_price_N) are stored in price_cycles
+            cycle_changes = {}
+            for key, value in data.items():
+                if value is None:
+                    continue
+                cycle_field = CYCLE_FIELD_PATTERN.match(key)
+                if cycle_field:
+                    cycle_changes[(cycle_field.group(1), int(cycle_field.group(2)))] = value
+                else:
+                    update_fields.append(f"{key} = {placeholder}")
+                    update_values.append(value)
+
+            if cycle_changes:
+                depth = max(len(pad_cycles([])), max(index for _, index in cycle_changes))
+                cycle_prices = load_cycles(connection, cursor, symbol, depth).get(symbol, pad_cycles([], depth))
+                for (kind, index), value in cycle_changes.items():
+                    if index < 1:
+                        continue
+                    high, low = cycle_prices[index - 1]
+                    cycle_prices[index - 1] = (value, low) if kind == "high" else (high, value)
+                set_cycles(connection, cursor, symbol, cycle_prices)
+
+            # Add updated_at timestamp
+            update_fields.append("updated_at = CURRENT_TIMESTAMP")
+
+            # If no fields to update, return early
+            if not update_fields:
+                return {"message": "No fields to update"}
+
+            # Build and execute the update query
+            update_query = f"""
+                UPDATE coin_monitor
+                SET {', '.join(update_fields)}
+                WHERE symbol = {placeholder}
+            """
+            update_values.append(symbol)
 
-        cursor.execute(update_query, update_values)
+            cursor.execute(update_query, update_values)
 
-        # Get the id
-        if isinstance(connection, psycopg2.extensions.connection):
-            cursor.execute("SELECT id FROM coin_monitor WHERE symbol = %s", (symbol,))
-        else:
-            cursor.execute("SELECT id FROM coin_monitor WHERE symbol = ?", (symbol,))
-        updated_id = cursor.fetchone()[0]
+            # Get the id
+            if isinstance(connection, psycopg2.extensions.connection):
+                cursor.execute("SELECT id FROM coin_monitor WHERE symbol = %s", (symbol,))
+            else:
+                cursor.execute("SELECT id FROM coin_monitor WHERE symbol = ?", (symbol,))
+            updated_id = cursor.fetchone()[0]
 
-        connection.commit()
+            connection.commit()
 
-        return {"id": updated_id, "message": f"Coin monitor for {symbol} updated successfully"}
+            return {"id": updated_id, "message": f"Coin monitor for {symbol} updated successfully"}
     except HTTPException:
         raise
     except Exception as e:
         logging.error(f"Error updating coin monitor: {e}")
-        if connection:
-            connection.rollback()
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
 
-def update_price_history(symbol, current_high, current_low, latest_price, cycle_end_percent=0.5):
+def calculate_price_history_update(symbol, db_high_price, cycle_prices, current_high, current_low,
+                                   latest_price, cycle_end_percent=0.5):
     """
-    Update the price history for a specific coin based on price cycles.
+    Calculate the new price history cycles for a coin without touching the database.
     A cycle is completed when the price falls by more than cycle_end_percent from its high point.
 
-    This function has been modified to ensure each cycle has unique values and to update cycles
-    more frequently based on significant price movements.
+    Each new cycle gets a random variation so that cycles have unique values, and cycles
+    are also rotated on significant price increases or when all stored cycles are the same.
 
     Args:
         symbol: The coin symbol
+        db_high_price: The high price stored before this update
+        cycle_prices: The stored (high, low) cycles, most recent first
         current_high: The current high price
         current_low: The current low price
         latest_price: The latest price
         cycle_end_percent: The percentage drop from high that signals the end of a cycle
 
     Returns:
-        bool: True if history was updated (cycle completed), False otherwise
+        tuple: (new_cycle_prices, reason), or None if the history doesn't change
     """
-    try:
-        connection, cursor = get_database_connection()
+    # Check if we're in a cycle (high_price_1 is set)
+    high_price_1, low_price_1 = cycle_prices[0]
+
+    # If we don't have history yet, initialize it with current values
+    if high_price_1 == 0.0 and low_price_1 == 0.0:
+        return [(current_high, current_low)] + list(cycle_prices[1:]), "initialized"
+
+    # Check if the price has fallen by more than cycle_end_percent from the high
+    # This indicates the end of a cycle
+    cycle_completed = latest_price < db_high_price * (1 - cycle_end_percent / 100)
+
+    # Also check if there's been a significant price increase (new high)
+    significant_increase = latest_price > db_high_price * 1.05  # 5% increase
+
+    # Check if it's been a long time since the last cycle update (force update)
+    # This is a simplified check - in a real system you might use timestamps
+    all_cycles_same = True
+    first_high, first_low = cycle_prices[0]
+
+    # Count how many cycles are initialized
+    initialized_cycles = sum(1 for h, l in cycle_prices if h != 0.0 or l != 0.0)
+
+    # If we have at least 2 initialized cycles, check if they're all the same
+    if initialized_cycles >= 2:
+        for high, low in cycle_prices[1:]:
+            if high != 0.0 or low != 0.0:  # Skip empty cycles
+                # Use a small epsilon for floating point comparison
+                if abs(high - first_high) > 0.0001 or abs(low - first_low) > 0.0001:
+                    all_cycles_same = False
+                    break
+
+    if not (cycle_completed or significant_increase or all_cycles_same):
+        return None
 
-        # Get the current history values and high price
-        if isinstance(connection, psycopg2.extensions.connection):
-            query = """
-                SELECT 
-                    high_price, low_price, initial_price, latest_price,
-                    high_price_1, low_price_1, 
-                    high_price_2, low_price_2,
-                    high_price_3, low_price_3,
-                    high_price_4, low_price_4,
-                    high_price_5, low_price_5,
-                    high_price_6, low_price_6,
-                    high_price_7, low_price_7,
-                    high_price_8, low_price_8,
-                    high_price_9, low_price_9,
-                    high_price_10, low_price_10
-                FROM coin_monitor
-                WHERE symbol = %s
-            """
-        else:
-            query = """
-                SELECT 
-                    high_price, low_price, initial_price, latest_price,
-                    high_price_1, low_price_1, 
-                    high_price_2, low_price_2,
-                    high_price_3, low_price_3,
-                    high_price_4, low_price_4,
-                    high_price_5, low_price_5,
-                    high_price_6, low_price_6,
-                    high_price_7, low_price_7,
-                    high_price_8, low_price_8,
-                    high_price_9, low_price_9,
-                    high_price_10, low_price_10
-                FROM coin_monitor
-                WHERE symbol = ?
-            """
-        cursor.execute(query, (symbol,))
-        result = cursor.fetchone()
+    # Determine the reason for the update
+    reason = "cycle completed" if cycle_completed else "significant price change" if significant_increase else "force update"
 
-        if not result:
-            logging.warning(f"No coin monitor record found for {symbol}")
-            return False
+    # Always create significant variation for the new cycle to ensure cycles have different values
+    # Use symbol as seed for reproducibility but add current time to ensure different values each time
+    rng = random.Random(hash(symbol) + int(time.time()))
 
-        # Get the current values from the database
-        db_high_price = result[0]
-        db_low_price = result[1]
-        db_initial_price = result[2]
-        db_latest_price = result[3]
-
-        # Extract all cycle high and low prices
-        cycle_prices = []
-        for i in range(10):
-            high_idx = 4 + i*2
-            low_idx = 5 + i*2
-            cycle_prices.append((result[high_idx], result[low_idx]))
-
-        # Check if we're in a cycle (high_price_1 is set)
-        high_price_1, low_price_1 = cycle_prices[0]
-
-        # If we don't have history yet, initialize it with current values
-        if high_price_1 == 0.0 and low_price_1 == 0.0:
-            # Initialize the first cycle with current values
-            if isinstance(connection, psycopg2.extensions.connection):
-                update_query = """
-                    UPDATE coin_monitor
-                    SET high_price_1 = %s, low_price_1 = %s
-                    WHERE symbol = %s
-                """
-            else:
-                update_query = """
-                    UPDATE coin_monitor
-                    SET high_price_1 = ?, low_price_1 = ?
-                    WHERE symbol = ?
-                """
-            cursor.execute(update_query, (current_high, current_low, symbol))
-            connection.commit()
-            logging.info(f"Initialized price history for {symbol}")
-            return True
-
-        # Check if the price has fallen by more than cycle_end_percent from the high
-        # This indicates the end of a cycle
-        cycle_completed = latest_price < db_high_price * (1 - cycle_end_percent / 100)
-
-        # Also check if there's been a significant price increase (new high)
-        significant_increase = latest_price > db_high_price * 1.05  # 5% increase
-
-        # Check if it's been a long time since the last cycle update (force update)
-        # This is a simplified check - in a real system you might use timestamps
-        all_cycles_same = True
-        first_high, first_low = cycle_prices[0]
-
-        # Count how many cycles are initialized
-        initialized_cycles = sum(1 for h, l in cycle_prices if h != 0.0 or l != 0.0)
-
-        # If we have at least 2 initialized cycles, check if they're all the same
-        if initialized_cycles >= 2:
-            for high, low in cycle_prices[1:]:
-                if high != 0.0 or low != 0.0:  # Skip empty cycles
-                    # Use a small epsilon for floating point comparison
-                    if abs(high - first_high) > 0.0001 or abs(low - first_low) > 0.0001:
-                        all_cycles_same = False
-                        break
-
-        # Update cycle if any condition is met
-        if cycle_completed or significant_increase or all_cycles_same:
-            # Determine the reason for the update
-            reason = "cycle completed" if cycle_completed else "significant price change" if significant_increase else "force update"
-
-            # Shift all history values down
-            if isinstance(connection, psycopg2.extensions.connection):
-                update_query = """
-                    UPDATE coin_monitor
-                    SET 
-                        high_price_10 = high_price_9, low_price_10 = low_price_9,
-                        high_price_9 = high_price_8, low_price_9 = low_price_8,
-                        high_price_8 = high_price_7, low_price_8 = low_price_7,
-                        high_price_7 = high_price_6, low_price_7 = low_price_6,
-                        high_price_6 = high_price_5, low_price_6 = low_price_5,
-                        high_price_5 = high_price_4, low_price_5 = low_price_4,
-                        high_price_4 = high_price_3, low_price_4 = low_price_3,
-                        high_price_3 = high_price_2, low_price_3 = low_price_2,
-                        high_price_2 = high_price_1, low_price_2 = low_price_1,
-                        high_price_1 = %s, low_price_1 = %s
-                    WHERE symbol = %s
-                """
-            else:
-                update_query = """
-                    UPDATE coin_monitor
-                    SET 
-                        high_price_10 = high_price_9, low_price_10 = low_price_9,
-                        high_price_9 = high_price_8, low_price_9 = low_price_8,
-                        high_price_8 = high_price_7, low_price_8 = low_price_7,
-                        high_price_7 = high_price_6, low_price_7 = low_price_6,
-                        high_price_6 = high_price_5, low_price_6 = low_price_5,
-                        high_price_5 = high_price_4, low_price_5 = low_price_4,
-                        high_price_4 = high_price_3, low_price_4 = low_price_3,
-                        high_price_3 = high_price_2, low_price_3 = low_price_2,
-                        high_price_2 = high_price_1, low_price_2 = low_price_1,
-                        high_price_1 = ?, low_price_1 = ?
-                    WHERE symbol = ?
-                """
+    # Base variation - stronger if all cycles are the same
+    base_variation = 0.15 if all_cycles_same else 0.08
 
-            # Always create significant variation for the new cycle to ensure cycles have different values
-            import random
+    # Add random variation to make each cycle unique
+    variation_factor = 1.0 + rng.uniform(-base_variation, base_variation)
 
-            # Use symbol as seed for reproducibility but add current time to ensure different values each time
-            random.seed(hash(symbol) + int(time.time()))
+    # Apply variation to high and low prices
+    new_high = current_high * variation_factor
 
-            # Base variation - stronger if all cycles are the same
-            base_variation = 0.15 if all_cycles_same else 0.08
+    # Use inverse variation for low price to maintain a reasonable range
+    new_low = current_low * (2 - variation_factor)
 
-            # Add random variation to make each cycle unique
-            variation_factor = 1.0 + random.uniform(-base_variation, base_variation)
+    # Ensure the low price is actually lower than the high price
+    if new_low >= new_high:
+        new_low = new_high * 0.85  # Ensure at least 15% difference
 
-            # Apply variation to high and low prices
-            new_high = current_high * variation_factor
+    # Check if the new values are too similar to existing cycles
+    too_similar = False
+    for high, low in cycle_prices:
+        if high != 0.0 or low != 0.0:  # Skip empty cycles
+            # If new values are within 5% of any existing cycle, consider them too similar
+            if (abs(new_high - high) / high < 0.05 and
+                abs(new_low - low) / low < 0.05):
+                too_similar = True
+                break
 
-            # Use inverse variation for low price to maintain a reasonable range
-            new_low = current_low * (2 - variation_factor)
+    # If too similar, apply more variation
+    if too_similar:
+        # Apply a stronger variation in the opposite direction
+        variation_factor = 1.0 - rng.uniform(0.1, 0.2) if variation_factor > 1.0 else 1.0 + rng.uniform(0.1, 0.2)
+        new_high = current_high * variation_factor
+        new_low = current_low * (2 - variation_factor)
 
-            # Ensure the low price is actually lower than the high price
-            if new_low >= new_high:
-                new_low = new_high * 0.85  # Ensure at least 15% difference
+        # Ensure the low price is actually lower than the high price
+        if new_low >= new_high:
+            new_low = new_high * 0.85  # Ensure at least 15% difference
 
-            # Check if the new values are too similar to existing cycles
-            too_similar = False
-            for high, low in cycle_prices:
-                if high != 0.0 or low != 0.0:  # Skip empty cycles
-                    # If new values are within 5% of any existing cycle, consider them too similar
-                    if (abs(new_high - high) / high < 0.05 and 
-                        abs(new_low - low) / low < 0.05):
-                        too_similar = True
-                        break
+    # Log the variation applied
+    logging.info(f"Applied variation factor {variation_factor:.4f} to cycle for {symbol}. New high: {new_high}, New low: {new_low}")
 
-            # If too similar, apply more variation
-            if too_similar:
-                # Apply a stronger variation in the opposite direction
-                variation_factor = 1.0 - random.uniform(0.1, 0.2) if variation_factor > 1.0 else 1.0 + random.uniform(0.1, 0.2)
-                new_high = current_high * variation_factor
-                new_low = current_low * (2 - variation_factor)
+    # Shift all history values down and start the new cycle
+    return [(new_high, new_low)] + list(cycle_prices[:-1]), reason
 
-                # Ensure the low price is actually lower than the high price
-                if new_low >= new_high:
-                    new_low = new_high * 0.85  # Ensure at least 15% difference
+def write_latest_prices(connection, cursor, updates):
+    """
+    Write only the latest, high and low prices of many coins with one bulk statement.
+    Used by the stream flushes between indicator ticks and the manual price update.
+    The caller is responsible for committing.
 
-            # Log the variation applied
-            logging.info(f"Applied variation factor {variation_factor:.4f} to cycle for {symbol}. New high: {new_high}, New low: {new_low}")
+    Args:
+        connection: Database connection
+        cursor: Database cursor
+        updates: List of (latest_price, high_price, low_price, symbol) tuples
+    """
+    if isinstance(connection, psycopg2.extensions.connection):
+        execute_values(
+            cursor,
+            """
+                UPDATE coin_monitor AS c
+                SET latest_price = v.latest_price, high_price = v.high_price, low_price = v.low_price,
+                    updated_at = CURRENT_TIMESTAMP
+                FROM (VALUES %s) AS v (latest_price, high_price, low_price, symbol)
+                WHERE c.symbol = v.symbol
+            """,
+            updates,
+            template="(%s::float, %s::float, %s::float, %s)",
+            page_size=1000
+        )
+    else:
+        cursor.executemany(
+            """
+                UPDATE coin_monitor
+                SET latest_price = ?, high_price = ?, low_price = ?,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE symbol = ?
+            """,
+            updates
+        )
 
-            cursor.execute(update_query, (new_high, new_low, symbol))
-            connection.commit()
-            logging.info(f"Updated price history for {symbol} due to {reason}. Current price: {latest_price}, High: {db_high_price}, Low: {db_low_price}")
-            return True
+def load_updated_at(connection, cursor, symbol):
+    """
+    Get the updated_at timestamp of a coin, e.g. the one a bulk write just set.
 
-        return False
-    except Exception as e:
-        logging.error(f"Error updating price history for {symbol}: {e}")
-        if connection:
-            connection.rollback()
-        return False
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
+    Args:
+        connection: Database connection
+        cursor: Database cursor
+        symbol: The coin symbol
 
-def get_coin_price_history(symbol: str):
+    Returns:
+        The updated_at value as returned by the database, or None if the coin doesn't exist
     """
-    Get the price history for a specific coin.
+    if isinstance(connection, psycopg2.extensions.connection):
+        cursor.execute("SELECT updated_at FROM coin_monitor WHERE symbol = %s", (symbol,))
+    else:
+        cursor.execute("SELECT updated_at FROM coin_monitor WHERE symbol = ?", (symbol,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def write_price_history_updates(connection, cursor, history_updates):
+    """
+    Write new price history cycles for several coins with batched statements.
+    A completed cycle is a single INSERT into price_cycles; the first cycle of a coin
+    overwrites its most recent cycle. The caller is responsible for committing the transaction.
+
+    Args:
+        connection: Database connection
+        cursor: Database cursor
+        history_updates: List of (symbol, cycle_prices, reason) tuples as returned by
+                         calculate_price_history_update()
+    """
+    appended = []
+    replaced = []
+    for symbol, cycle_prices, reason in history_updates:
+        high, low = cycle_prices[0]
+        (replaced if reason == "initialized" else appended).append((symbol, high, low))
+
+    replace_latest_cycles(connection, cursor, replaced)
+    append_cycles(connection, cursor, appended)
+
+@serialized_write
+def update_price_history(symbol, current_high, current_low, latest_price, cycle_end_percent=0.5,
+                         connection=None, cursor=None):
+    """
+    Update the price history for a specific coin based on price cycles.
+    A cycle is completed when the price falls by more than cycle_end_percent from its high point.
+
+    The cycle rules live in calculate_price_history_update(). When a connection and cursor
+    are passed the update runs inside the caller's transaction and is not committed here.
 
     Args:
         symbol: The coin symbol
+        current_high: The current high price
+        current_low: The current low price
+        latest_price: The latest price
+        cycle_end_percent: The percentage drop from high that signals the end of a cycle
+        connection: Optional database connection of the caller
+        cursor: Optional database cursor of the caller
 
     Returns:
-        dict: A dictionary containing the price history data
+        bool: True if history was updated (cycle completed), False otherwise
     """
+    if connection is None:
+        try:
+            with db_connection() as (connection, cursor):
+                updated = update_price_history(symbol, current_high, current_low, latest_price,
+                                               cycle_end_percent, connection, cursor)
+                connection.commit()
+                return updated
+        except Exception as e:
+            logging.error(f"Error updating price history for {symbol}: {e}")
+            return False
+
     try:
-        connection, cursor = get_database_connection()
-
-        if isinstance(connection, psycopg2.extensions.connection):
-            query = """
-                SELECT 
-                    initial_price, low_price, high_price, latest_price,
-                    low_price_1, high_price_1, 
-                    low_price_2, high_price_2,
-                    low_price_3, high_price_3,
-                    low_price_4, high_price_4,
-                    low_price_5, high_price_5,
-                    low_price_6, high_price_6,
-                    low_price_7, high_price_7,
-                    low_price_8, high_price_8,
-                    low_price_9, high_price_9,
-                    low_price_10, high_price_10,
-                    ma7, ma25, ma99, trend, cycle_status,
-                    created_at, updated_at
-                FROM coin_monitor
-                WHERE symbol = %s
-            """
-        else:
-            query = """
-                SELECT 
-                    initial_price, low_price, high_price, latest_price,
-                    low_price_1, high_price_1, 
-                    low_price_2, high_price_2,
-                    low_price_3, high_price_3,
-                    low_price_4, high_price_4,
-                    low_price_5, high_price_5,
-                    low_price_6, high_price_6,
-                    low_price_7, high_price_7,
-                    low_price_8, high_price_8,
-                    low_price_9, high_price_9,
-                    low_price_10, high_price_10,
-                    ma7, ma25, ma99, trend, cycle_status,
-                    created_at, updated_at
-                FROM coin_monitor
-                WHERE symbol = ?
-            """
+        # Get the current history values and high price
+        placeholder = "%s" if isinstance(connection, psycopg2.extensions.connection) else "?"
+        query = f"""
+            SELECT high_price, low_price
+            FROM coin_monitor
+            WHERE symbol = {placeholder}
+        """
         cursor.execute(query, (symbol,))
         result = cursor.fetchone()
 
         if not result:
             logging.warning(f"No coin monitor record found for {symbol}")
-            return None
+            return False
 
-        # Create a structured representation of the price history
-        history = {
-            "symbol": symbol,
-            "initial_price": result[0],
-            "current": {
-                "low_price": result[1],
-                "high_price": result[2],
-                "latest_price": result[3]
-            },
-            "moving_averages": {
-                "ma7": result[24],
-                "ma25": result[25],
-                "ma99": result[26]
-            },
-            "trend_analysis": {
-                "trend": result[27],
-                "cycle_status": result[28]
-            },
-            "history": []
-        }
+        db_high_price, db_low_price = result[0], result[1]
+        cycle_prices = load_cycles(connection, cursor, symbol).get(symbol, pad_cycles([]))
+        update = calculate_price_history_update(
+            symbol, db_high_price, cycle_prices,
+            current_high, current_low, latest_price, cycle_end_percent
+        )
+        if update is None:
+            return False
 
-        # Extract all high prices for easy access to previous cycle high
-        high_prices = []
-        for i in range(10):
-            high_idx = 5 + i*2
-            high_prices.append(result[high_idx])
-
-        # Add the 10 sets of low and high prices to the history
-        for i in range(10):
-            low_idx = 4 + i*2
-            high_idx = 5 + i*2
-
-            # Skip entries with zero values (not yet populated)
-            if result[low_idx] == 0.0 and result[high_idx] == 0.0:
-                continue
-
-            # Get previous cycle high (if available)
-            prev_cycle_high = None
-            if i < 9:  # For all cycles except the last one
-                next_high_idx = high_idx + 2
-                if next_high_idx < 24:  # Make sure we don't go out of bounds (24 is the index of ma7)
-                    prev_cycle_high = result[next_high_idx]
-                    if prev_cycle_high == 0.0:  # If next cycle is not populated, don't show it
-                        prev_cycle_high = None
-
-            history["history"].append({
-                "set": i+1,
-                "low_price": result[low_idx],
-                "high_price": result[high_idx],
-                "prev_cycle_high": prev_cycle_high
-            })
-
-        # Add timestamps
-        history["created_at"] = result[29]
-        history["updated_at"] = result[30]
-
-        return history
+        cycle_prices, reason = update
+        write_price_history_updates(connection, cursor, [(symbol, cycle_prices, reason)])
+        logging.info(f"Updated price history for {symbol} due to {reason}. Current price: {latest_price}, High: {db_high_price}, Low: {db_low_price}")
+        return True
     except Exception as e:
-        logging.error(f"Error getting price history for {symbol}: {e}")
-        return None
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
+        logging.error(f"Error updating price history for {symbol}: {e}")
+        return False
 
-def get_recent_trades(symbol: str):
+def build_price_history(symbol, record, cycle_prices):
     """
-    Get recent trades for a specific coin from Binance API and analyze buyer/seller activity.
+    Build the structured price history of a coin.
 
     Args:
         symbol: The coin symbol
+        record: Row of (initial_price, low_price, high_price, latest_price, ma7, ma25, ma99,
+            trend, cycle_status, created_at, updated_at)
+        cycle_prices: List of (high, low) tuples, most recent first
 
     Returns:
-        dict: A dictionary containing recent trade statistics and analysis
+        dict: A dictionary containing the price history data
+    """
+    history = {
+        "symbol": symbol,
+        "initial_price": record[0],
+        "current": {
+            "low_price": record[1],
+            "high_price": record[2],
+            "latest_price": record[3]
+        },
+        "moving_averages": {
+            "ma7": record[4],
+            "ma25": record[5],
+            "ma99": record[6]
+        },
+        "trend_analysis": {
+            "trend": record[7],
+            "cycle_status": record[8]
+        },
+        "history": []
+    }
+
+    # Add the sets of low and high prices to the history, most recent first
+    for i, (high_price, low_price) in enumerate(cycle_prices):
+        # Skip entries with zero values (not yet populated)
+        if low_price == 0.0 and high_price == 0.0:
+            continue
+
+        # Get previous cycle high (if available)
+        prev_cycle_high = None
+        if i + 1 < len(cycle_prices):
+            prev_cycle_high = cycle_prices[i + 1][0]
+            if prev_cycle_high == 0.0:  # If next cycle is not populated, don't show it
+                prev_cycle_high = None
+
+        history["history"].append({
+            "set": i+1,
+            "low_price": low_price,
+            "high_price": high_price,
+            "prev_cycle_high": prev_cycle_high
+        })
+
+    # Add timestamps
+    history["created_at"] = record[9]
+    history["updated_at"] = record[10]
+
+    return history
+
+def load_price_histories(connection, cursor, symbols):
+    """
+    Load the price histories of several coins with one query for the coins and one
+    for their cycles.
+
+    Args:
+        connection: Database connection
+        cursor: Database cursor
+        symbols: List of coin symbols
+
+    Returns:
+        dict: symbol -> price history, for the symbols that exist
+    """
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return {}
+
+    condition, params = symbol_filter(connection, symbols)
+    cursor.execute(f"""
+        SELECT
+            symbol, initial_price, low_price, high_price, latest_price,
+            ma7, ma25, ma99, trend, cycle_status,
+            created_at, updated_at
+        FROM coin_monitor
+        WHERE {condition}
+    """, params)
+    records = {row[0]: row[1:] for row in cursor.fetchall()}
+    if not records:
+        return {}
+
+    cycles = load_cycles(connection, cursor, symbols=list(records))
+    return {
+        symbol: build_price_history(symbol, records[symbol], cycles.get(symbol, pad_cycles([])))
+        for symbol in symbols
+        if symbol in records
+    }
+
+def get_coin_price_history(symbol: str):
+    """
+    Get the price history for a specific coin.
+
+    Args:
+        symbol: The coin symbol
+
+    Returns:
+        dict: A dictionary containing the price history data
     """
     try:
-        # Fetch recent trades from Binance API (last 30 seconds)
-        # Binance API returns trades in descending order (newest first)
-        current_time_ms = int(time.time() * 1000)
-        thirty_secs_ago_ms = current_time_ms - (30 * 1000)  # 30 seconds in milliseconds
-
-        # First get the most recent 1000 trades (API limit)
-        response = requests.get(
-            f'https://api.binance.com/api/v3/trades',
-            params={
-                'symbol': symbol,
-                'limit': 1000
-            },
-            timeout=10
-        )
-        response.raise_for_status()
-        trades = response.json()
+        with db_connection() as (connection, cursor):
+            history = load_price_histories(connection, cursor, [symbol]).get(symbol)
+            if history is None:
+                logging.warning(f"No coin monitor record found for {symbol}")
+            return history
+    except Exception as e:
+        logging.error(f"Error getting price history for {symbol}: {e}")
+        return None
 
-        # Filter trades from the last 30 seconds
-        recent_trades = [trade for trade in trades if trade['time'] >= thirty_secs_ago_ms]
+def get_coin_price_histories(symbols):
+    """
+    Get the price histories of several coins over a single connection.
 
-        if not recent_trades:
-            return {
-                "symbol": symbol,
-                "period": "30 seconds",
-                "total_trades": 0,
-                "buy_trades": 0,
-                "sell_trades": 0,
-                "buy_volume": 0,
-                "sell_volume": 0,
-                "buy_percentage": 0,
-                "sell_percentage": 0,
-                "average_trade_size": 0,
-                "trend": "Neutral",
-                "binance_link": f"https://www.binance.com/en/trade/{symbol.replace('USDT', '_USDT')}"
-            }
+    Args:
+        symbols: List of coin symbols
 
-        # Analyze trades
-        buy_trades = [trade for trade in recent_trades if trade['isBuyerMaker'] == False]
-        sell_trades = [trade for trade in recent_trades if trade['isBuyerMaker'] == True]
+    Returns:
+        dict: symbol -> price history, in the order requested; unknown symbols are left out
+    """
+    try:
+        with db_connection() as (connection, cursor):
+            return load_price_histories(connection, cursor, symbols)
+    except Exception as e:
+        logging.error(f"Error getting price histories: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Calculate volumes
-        buy_volume = sum(float(trade['qty']) for trade in buy_trades)
-        sell_volume = sum(float(trade['qty']) for trade in sell_trades)
-        total_volume = buy_volume + sell_volume
+def get_coin_price_bars(symbol: str, start: float, end: float, resolution: Optional[int] = None):
+    """
+    Get OHLC bars of a coin's price from the rollup tier matching the range and resolution.
 
-        # Calculate percentages
-        buy_percentage = (buy_volume / total_volume * 100) if total_volume > 0 else 0
-        sell_percentage = (sell_volume / total_volume * 100) if total_volume > 0 else 0
+    Args:
+        symbol: The coin symbol
+        start: Unix time of the first bar
+        end: Unix time after the last bar
+        resolution: Optional seconds per bar
 
-        # Calculate average trade size
-        total_trades = len(recent_trades)
-        average_trade_size = total_volume / total_trades if total_trades > 0 else 0
+    Returns:
+        dict: Symbol, tier, resolution and the bars, oldest first
+    """
+    try:
+        with db_connection() as (connection, cursor):
+            return price_rollup_store.load_bars(connection, cursor, symbol, start, end, resolution)
+    except Exception as e:
+        logging.error(f"Error getting price bars for {symbol}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Determine trend based on buy/sell ratio
-        trend = "Neutral"
-        if buy_percentage > 55:
-            trend = "Bullish"  # More buying than selling
-        elif sell_percentage > 55:
-            trend = "Bearish"  # More selling than buying
+def get_recent_trades(symbol: str):
+    """
+    Get recent trades for a specific coin from Binance API and analyze buyer/seller activity.
 
-        # Return structured data
-        return {
-            "symbol": symbol,
-            "period": "30 seconds",
-            "total_trades": total_trades,
-            "buy_trades": len(buy_trades),
-            "sell_trades": len(sell_trades),
-            "buy_volume": round(buy_volume, 4),
-            "sell_volume": round(sell_volume, 4),
-            "buy_percentage": round(buy_percentage, 2),
-            "sell_percentage": round(sell_percentage, 2),
-            "average_trade_size": round(average_trade_size, 4),
-            "trend": trend,
-            "binance_link": f"https://www.binance.com/en/trade/{symbol.replace('USDT', '_USDT')}"
-        }
+    The statistics come from the symbol's shared rolling trade aggregator, which only
+    fetches the trades since its last refresh, so concurrent viewers of a coin don't
+    each download the last 1000 trades.
+
+    Args:
+        symbol: The coin symbol
+
+    Returns:
+        dict: A dictionary containing recent trade statistics and analysis
+    """
+    try:
+        aggregator = get_trade_aggregator(symbol)
+        aggregator.refresh()
+        trades = aggregator.summary()
+        trades["binance_link"] = f"https://www.binance.com/en/trade/{symbol.replace('USDT', '_USDT')}"
+        return trades
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         logging.error(f"Error getting recent trades for {symbol}: {e}")
         return {
@@ -803,38 +725,41 @@ def update_latest_prices():
     """Update the latest prices for all coins in the coin_monitor table."""
     try:
         # Fetch current prices from Binance API
-        response = requests.get('https://api.binance.com/api/v3/ticker/price', timeout=10)
-        response.raise_for_status()
-        price_data = response.json()
+        price_data = binance_get('/api/v3/ticker/price')
 
         # Create a dictionary of symbol -> price for easy lookup
         price_dict = {item['symbol']: float(item['price']) for item in price_data}
 
-        connection, cursor = get_database_connection()
+        return write_latest_price_updates(price_dict)
+    except Exception as e:
+        logging.error(f"Error updating latest prices: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@serialized_write
+def write_latest_price_updates(price_dict):
+    """
+    Write the latest, high and low prices and the price cycles of all coins in one transaction.
+
+    Args:
+        price_dict: dict of symbol -> current price
 
-        # Get all symbols from coin_monitor
-        cursor.execute("SELECT symbol FROM coin_monitor")
-        symbols = [row[0] for row in cursor.fetchall()]
+    Returns:
+        dict: Message with the number of coins updated
+    """
+    with db_connection() as (connection, cursor):
+        # Get the high/low prices and cycles of all coins
+        cursor.execute("SELECT symbol, high_price, low_price FROM coin_monitor")
+        rows = cursor.fetchall()
+        cycles = load_cycles(connection, cursor)
 
         updates = []
-        history_updates = 0
+        history_updates = []
 
-        for symbol in symbols:
+        for row in rows:
+            symbol, db_high_price, db_low_price = row[0], row[1], row[2]
             if symbol in price_dict:
                 latest_price = price_dict[symbol]
-
-                # Get current high and low prices
-                if isinstance(connection, psycopg2.extensions.connection):
-                    cursor.execute(
-                        "SELECT high_price, low_price FROM coin_monitor WHERE symbol = %s",
-                        (symbol,)
-                    )
-                else:
-                    cursor.execute(
-                        "SELECT high_price, low_price FROM coin_monitor WHERE symbol = ?",
-                        (symbol,)
-                    )
-                high_price, low_price = cursor.fetchone()
+                high_price, low_price = db_high_price, db_low_price
 
                 # Update high_price if latest_price is higher
                 if latest_price > high_price:
@@ -848,41 +773,24 @@ def update_latest_prices():
                 updates.append((latest_price, high_price, low_price, symbol))
 
                 # Check if we need to update the price history
-                if update_price_history(symbol, high_price, low_price, latest_price):
-                    history_updates += 1
+                history_update = calculate_price_history_update(
+                    symbol, db_high_price, cycles.get(symbol, pad_cycles([])),
+                    high_price, low_price, latest_price
+                )
+                if history_update is not None:
+                    history_updates.append((symbol,) + history_update)
+                    logging.info(f"Updated price history for {symbol} due to {history_update[1]}. Current price: {latest_price}, High: {db_high_price}, Low: {db_low_price}")
 
         # Execute batch update
         if updates:
-            # Do individual updates
-            if isinstance(connection, psycopg2.extensions.connection):
-                update_query = """
-                    UPDATE coin_monitor
-                    SET latest_price = %s, high_price = %s, low_price = %s, updated_at = CURRENT_TIMESTAMP
-                    WHERE symbol = %s
-                """
-            else:
-                update_query = """
-                    UPDATE coin_monitor
-                    SET latest_price = ?, high_price = ?, low_price = ?, updated_at = CURRENT_TIMESTAMP
-                    WHERE symbol = ?
-                """
-            for update in updates:
-                cursor.execute(update_query, update)
+            write_latest_prices(connection, cursor, updates)
+            write_price_history_updates(connection, cursor, history_updates)
 
             connection.commit()
 
-            logging.info(f"Updated latest prices for {len(updates)} coins, updated history for {history_updates} coins")
+            logging.info(f"Updated latest prices for {len(updates)} coins, updated history for {len(history_updates)} coins")
             return {
-                "message": f"Updated latest prices for {len(updates)} coins, updated history for {history_updates} coins"
+                "message": f"Updated latest prices for {len(updates)} coins, updated history for {len(history_updates)} coins"
             }
         else:
             return {"message": "No prices updated"}
-    except Exception as e:
-        logging.error(f"Error updating latest prices: {e}")
-        if connection:
-            connection.rollback()
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
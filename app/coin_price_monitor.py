@@ -1,15 +1,40 @@
+import asyncio
+import functools
+import json
 import logging
 import os
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
-import sqlite3
-from .coin_monitor import update_price_history
+
+from .coin_monitor import (
+    calculate_price_history_update,
+    load_coin_monitors,
+    load_updated_at,
+    write_latest_prices,
+    write_price_history_updates,
+)
+from .database import db_connection, serialized_write
+from .http_client import binance_get, binance_get_async
+from .rate_limit import PRIORITY_MONITOR
+from .indicators import NUMPY_AVAILABLE, VectorIndicatorEngine
+from .metrics import tick_metrics
+from .leader import FOLLOWER_REFRESH_INTERVAL, LEADER_RETRY_INTERVAL, create_leader_election
+from .moving_averages import MOVING_AVERAGE_PERIODS, MovingAverageTracker
+from .price_cycles import PRICE_CYCLE_DEPTH, cycle_fields, load_cycles, pad_cycles, replace_latest_cycles
+from .price_history import PriceHistoryStore
+from .rollups import price_rollup_store
+from .scheduler import TickScheduler
+from .sharding import shard_coordinator
+from .snapshot import snapshot_store
+from .price_stream import WEBSOCKETS_AVAILABLE, MiniTickerStream
 
 # Import PostgreSQL libraries if available
 try:
     import psycopg2
-    from psycopg2.extras import execute_batch
+    from psycopg2.extras import execute_values
     POSTGRES_AVAILABLE = True
 except ImportError:
     POSTGRES_AVAILABLE = False
@@ -24,160 +49,94 @@ logging.basicConfig(
     ]
 )
 
-def get_database_connection():
-    """Create and return a database connection (PostgreSQL or SQLite)."""
-    connection = None
-    try:
-        # Check if PostgreSQL is available and configured
-        if POSTGRES_AVAILABLE and os.getenv('DB_HOST'):
-            try:
-                # Connect to PostgreSQL
-                connection = psycopg2.connect(
-                    user=os.getenv('DB_USER', 'postgres'),
-                    password=os.getenv('DB_PASSWORD', 'postgres'),
-                    host=os.getenv('DB_HOST', 'localhost'),
-                    port=os.getenv('DB_PORT', '5432'),
-                    database=os.getenv('DB_NAME', 'coin_monitor'),
-                )
-                cursor = connection.cursor()
-                logging.info("Successfully connected to the PostgreSQL database.")
-                return connection, cursor
-            except Exception as e:
-                logging.error(f"Error connecting to PostgreSQL database: {e}")
-                logging.info("Falling back to SQLite database.")
-                # If PostgreSQL connection fails, fall back to SQLite
-
-        # Use SQLite database
-        db_path = os.path.join(os.path.dirname(__file__), 'coin_monitor.db')
-        connection = sqlite3.connect(db_path)
-        cursor = connection.cursor()
-
-        # Create the coin_monitor table if it doesn't exist
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS coin_monitor (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                symbol TEXT NOT NULL UNIQUE,
-                initial_price REAL NOT NULL,
-                low_price REAL NOT NULL,
-                high_price REAL NOT NULL,
-                latest_price REAL NOT NULL,
-                low_price_1 REAL DEFAULT 0.0,
-                high_price_1 REAL DEFAULT 0.0,
-                low_price_2 REAL DEFAULT 0.0,
-                high_price_2 REAL DEFAULT 0.0,
-                low_price_3 REAL DEFAULT 0.0,
-                high_price_3 REAL DEFAULT 0.0,
-                low_price_4 REAL DEFAULT 0.0,
-                high_price_4 REAL DEFAULT 0.0,
-                low_price_5 REAL DEFAULT 0.0,
-                high_price_5 REAL DEFAULT 0.0,
-                low_price_6 REAL DEFAULT 0.0,
-                high_price_6 REAL DEFAULT 0.0,
-                low_price_7 REAL DEFAULT 0.0,
-                high_price_7 REAL DEFAULT 0.0,
-                low_price_8 REAL DEFAULT 0.0,
-                high_price_8 REAL DEFAULT 0.0,
-                low_price_9 REAL DEFAULT 0.0,
-                high_price_9 REAL DEFAULT 0.0,
-                low_price_10 REAL DEFAULT 0.0,
-                high_price_10 REAL DEFAULT 0.0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        connection.commit()
-        logging.info("Successfully connected to the SQLite database.")
-        return connection, cursor
-    except Exception as e:
-        logging.error(f"Error connecting to database: {e}")
-        if connection:
-            connection.close()
-        raise
-
 def get_all_coins():
     """Get all coins from the coin_monitor table."""
     try:
-        connection, cursor = get_database_connection()
-        query = """
-            SELECT symbol FROM coin_monitor
-        """
-        cursor.execute(query)
-        symbols = [row[0] for row in cursor.fetchall()]
-        logging.info(f"Retrieved {len(symbols)} coins from coin_monitor table.")
-        return symbols
+        with db_connection() as (connection, cursor):
+            query = """
+                SELECT symbol FROM coin_monitor
+            """
+            cursor.execute(query)
+            symbols = [row[0] for row in cursor.fetchall()]
+            logging.info(f"Retrieved {len(symbols)} coins from coin_monitor table.")
+            return symbols
     except Exception as e:
         logging.error(f"Error getting coins: {e}")
         return []
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
 
+@serialized_write
 def add_coin(symbol, price):
     """
     Add a new coin to the coin_monitor table and initialize its price history.
     This function has been enhanced to create varied price history cycles.
     """
     try:
-        connection, cursor = get_database_connection()
+        with db_connection() as (connection, cursor):
+            # Check if the coin already exists
+            if isinstance(connection, psycopg2.extensions.connection):
+                cursor.execute("SELECT COUNT(*) FROM coin_monitor WHERE symbol = %s", (symbol,))
+            else:
+                cursor.execute("SELECT COUNT(*) FROM coin_monitor WHERE symbol = ?", (symbol,))
+            if cursor.fetchone()[0] > 0:
+                logging.info(f"Coin {symbol} already exists in coin_monitor table.")
+                return False
 
-        # Check if the coin already exists
-        if isinstance(connection, psycopg2.extensions.connection):
-            cursor.execute("SELECT COUNT(*) FROM coin_monitor WHERE symbol = %s", (symbol,))
-        else:
-            cursor.execute("SELECT COUNT(*) FROM coin_monitor WHERE symbol = ?", (symbol,))
-        if cursor.fetchone()[0] > 0:
-            logging.info(f"Coin {symbol} already exists in coin_monitor table.")
-            return False
+            # Calculate slightly different values for low and high prices
+            # This helps create more realistic initial data
+            low_price = price * 0.98  # 2% lower
+            high_price = price * 1.02  # 2% higher
 
-        # Calculate slightly different values for low and high prices
-        # This helps create more realistic initial data
-        low_price = price * 0.98  # 2% lower
-        high_price = price * 1.02  # 2% higher
-
-        # Insert the new coin
-        if isinstance(connection, psycopg2.extensions.connection):
-            insert_query = """
-                INSERT INTO coin_monitor 
-                (symbol, initial_price, low_price, high_price, latest_price)
-                VALUES (%s, %s, %s, %s, %s)
-            """
-        else:
-            insert_query = """
-                INSERT INTO coin_monitor 
-                (symbol, initial_price, low_price, high_price, latest_price)
-                VALUES (?, ?, ?, ?, ?)
-            """
-        cursor.execute(insert_query, (symbol, price, low_price, high_price, price))
-        connection.commit()
-        logging.info(f"Added new coin {symbol} to coin_monitor table.")
+            # Insert the new coin
+            if isinstance(connection, psycopg2.extensions.connection):
+                insert_query = """
+                    INSERT INTO coin_monitor 
+                    (symbol, initial_price, low_price, high_price, latest_price)
+                    VALUES (%s, %s, %s, %s, %s)
+                """
+            else:
+                insert_query = """
+                    INSERT INTO coin_monitor 
+                    (symbol, initial_price, low_price, high_price, latest_price)
+                    VALUES (?, ?, ?, ?, ?)
+                """
+            cursor.execute(insert_query, (symbol, price, low_price, high_price, price))
+            connection.commit()
+            logging.info(f"Added new coin {symbol} to coin_monitor table.")
 
-        # Initialize price history with varied values for the first few cycles
-        initialize_price_history(symbol, price)
+            # Initialize price history with varied values for the first few cycles
+            initialize_price_history(symbol, price)
 
-        return True
+            return True
     except Exception as e:
         logging.error(f"Error adding coin {symbol}: {e}")
-        if connection:
-            connection.rollback()
         return False
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
 
-def initialize_price_history(symbol, current_price):
+@serialized_write
+def initialize_price_history(symbol, current_price, connection=None, cursor=None):
     """
     Initialize only the first price history cycle for a newly added coin.
     This allows the other cycles to develop naturally over time.
 
+    When a connection and cursor are passed the update runs inside the caller's
+    transaction and is not committed here.
+
     Args:
         symbol: The coin symbol
         current_price: The current price of the coin
+        connection: Optional database connection of the caller
+        cursor: Optional database cursor of the caller
     """
-    try:
-        connection, cursor = get_database_connection()
+    if connection is None:
+        try:
+            with db_connection() as (connection, cursor):
+                initialized = initialize_price_history(symbol, current_price, connection, cursor)
+                connection.commit()
+                return initialized
+        except Exception as e:
+            logging.error(f"Error initializing price history for {symbol}: {e}")
+            return False
 
+    try:
         # Only initialize the first cycle
         # The other cycles will develop naturally over time
 
@@ -193,56 +152,55 @@ def initialize_price_history(symbol, current_price):
         high_price = current_price * high_factor
         low_price = current_price * low_factor
 
-        # Build the update query based on connection type
-        if isinstance(connection, psycopg2.extensions.connection):
-            update_query = """
-                UPDATE coin_monitor
-                SET high_price_1 = %s, low_price_1 = %s
-                WHERE symbol = %s
-            """
-        else:
-            update_query = """
-                UPDATE coin_monitor
-                SET high_price_1 = ?, low_price_1 = ?
-                WHERE symbol = ?
-            """
-
-        # Execute the update
-        cursor.execute(update_query, (high_price, low_price, symbol))
-        connection.commit()
+        # Overwrite the most recent cycle (or record the first one)
+        replace_latest_cycles(connection, cursor, [(symbol, high_price, low_price)])
 
         logging.info(f"Initialized first price history cycle for coin {symbol}")
         return True
     except Exception as e:
         logging.error(f"Error initializing price history for {symbol}: {e}")
-        if connection:
-            connection.rollback()
         return False
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
 
-def initialize_coin_monitor(symbols=None):
+def initialize_coin_monitor(symbols=None, owned_only=False):
     """
     Initialize the coin_monitor table with specified coins or from API.
     This function has been enhanced to create varied price history cycles for new coins.
+
+    Args:
+        symbols: Optional list of symbols, all monitored pairs on Binance if not given
+        owned_only: With sharding, only add the coins of this worker's shards
     """
-    connection = None
     try:
         # Fetch current prices from Binance API
-        response = requests.get('https://api.binance.com/api/v3/ticker/price', timeout=10)
-        response.raise_for_status()
-        price_data = response.json()
+        price_data = binance_get('/api/v3/ticker/price', priority=PRIORITY_MONITOR)
         price_dict = {item['symbol']: float(item['price']) for item in price_data}
 
-        # If no symbols provided, get all USDT pairs from Binance
+        # If no symbols provided, get all pairs with the configured quote assets from Binance
         if not symbols:
-            symbols = [item['symbol'] for item in price_data if item['symbol'].endswith('USDT')]
-            logging.info(f"No symbols provided, using all USDT pairs from Binance: {len(symbols)} pairs found")
+            symbols = [item['symbol'] for item in price_data if is_monitored_symbol(item['symbol'])]
+            logging.info(f"No symbols provided, using all {','.join(MONITOR_QUOTE_ASSETS)} pairs from Binance: {len(symbols)} pairs found")
 
-        connection, cursor = get_database_connection()
+        if owned_only and shard_coordinator is not None:
+            symbols = [symbol for symbol in symbols if shard_coordinator.owns(symbol)]
+        return insert_new_coins(symbols, price_dict)
+    except Exception as e:
+        logging.error(f"Error initializing coin_monitor table: {e}")
+        return False
 
+@serialized_write
+def insert_new_coins(symbols, price_dict):
+    """
+    Insert the coins of `symbols` that are not in the coin_monitor table yet, with their
+    first price history cycle, in one transaction.
+
+    Args:
+        symbols: List of symbols
+        price_dict: dict of symbol -> current price
+
+    Returns:
+        bool: True if the coins are in the table, False if none could be added
+    """
+    with db_connection() as (connection, cursor):
         # Check which symbols are already in the coin_monitor table
         cursor.execute("SELECT symbol FROM coin_monitor")
         existing_symbols = [row[0] for row in cursor.fetchall()]
@@ -292,10 +250,10 @@ def initialize_coin_monitor(symbols=None):
             for data in insert_data:
                 cursor.execute(insert_query, data)
 
-                # Initialize price history for each new coin
+                # Initialize price history for each new coin in the same transaction
                 symbol = data[0]
                 price = data[1]
-                initialize_price_history(symbol, price)
+                initialize_price_history(symbol, price, connection, cursor)
 
             connection.commit()
             logging.info(f"Initialized {len(insert_data)} new coins in coin_monitor table with varied price history.")
@@ -303,97 +261,169 @@ def initialize_coin_monitor(symbols=None):
         else:
             logging.warning("No new coins to initialize in coin_monitor table.")
             return False
-    except Exception as e:
-        logging.error(f"Error initializing coin_monitor table: {e}")
-        if connection:
-            connection.rollback()
-        return False
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
 
-def calculate_moving_averages(symbol, connection, cursor):
+# Raw price tick storage (append + retention job, or fixed-slot ring buffer)
+price_history_store = PriceHistoryStore()
+
+# "async" runs the monitor as a task on the FastAPI event loop, "thread" in a daemon thread
+MONITOR_RUNTIME = os.getenv('MONITOR_RUNTIME', 'async').lower()
+
+# "rest" polls the ticker endpoint, "stream" subscribes to the all-market mini-ticker WebSocket
+PRICE_INGESTION_MODE = os.getenv('PRICE_INGESTION_MODE', 'rest').lower()
+
+# Seconds between indicator ticks (moving averages, trend, price_history)
+PRICE_SAMPLE_INTERVAL = float(os.getenv('PRICE_SAMPLE_INTERVAL', '20'))
+
+# Stream mode: seconds between flushes of changed latest prices to the database
+PRICE_FLUSH_INTERVAL = float(os.getenv('PRICE_FLUSH_INTERVAL', '1'))
+
+# Stream mode: fall back to REST polling when no message arrived for this many seconds
+STREAM_STALE_AFTER = float(os.getenv('STREAM_STALE_AFTER', '30'))
+
+# Seconds after which a tick reloads the published coin list from the database instead of
+# applying its own changes to it, to pick up coins changed by other processes
+SNAPSHOT_RELOAD_INTERVAL = float(os.getenv('SNAPSHOT_RELOAD_INTERVAL', '60'))
+
+# Indicator engine: "numpy" computes all symbols at once, "python" uses per-symbol rolling windows
+INDICATOR_ENGINE = os.getenv('INDICATOR_ENGINE', 'numpy').lower()
+
+# Sharded workers fetch their symbols with ?symbols= up to this many, and filter the full ticker above it
+TICKER_SYMBOLS_PER_REQUEST = int(os.getenv('TICKER_SYMBOLS_PER_REQUEST', '100'))
+
+# Quote assets of the pairs to monitor, e.g. "USDT,BTC", or "*" for all Binance pairs
+MONITOR_QUOTE_ASSETS = [
+    asset.strip().upper() for asset in os.getenv('MONITOR_QUOTE_ASSETS', 'USDT').split(',') if asset.strip()
+]
+
+def create_indicator_engine():
+    """Create the configured indicator engine, falling back to rolling windows without NumPy."""
+    if INDICATOR_ENGINE == 'numpy':
+        if NUMPY_AVAILABLE:
+            return VectorIndicatorEngine(MOVING_AVERAGE_PERIODS)
+        logging.warning("NumPy is not installed, falling back to the Python indicator engine.")
+    return MovingAverageTracker(MOVING_AVERAGE_PERIODS)
+
+# In-memory indicators, advanced with every tick and rebuilt from price_history at startup
+indicator_engine = create_indicator_engine()
+
+# Schedule of the indicator ticks, anchored to the monotonic clock
+tick_scheduler = TickScheduler(PRICE_SAMPLE_INTERVAL)
+
+def is_monitored_symbol(symbol):
+    """Check whether a Binance symbol matches the configured MONITOR_QUOTE_ASSETS."""
+    if '*' in MONITOR_QUOTE_ASSETS:
+        return True
+    return any(symbol.endswith(asset) for asset in MONITOR_QUOTE_ASSETS)
+
+def calculate_indicators(symbols, prices):
     """
-    Calculate moving averages (MA7, MA25, MA99) for a specific coin based on historical price data.
+    Advance the indicators of many symbols with their new prices.
+
+    Args:
+        symbols: List of coin symbols
+        prices: List of new prices, in the same order
+
+    Returns:
+        list: (ma7, ma25, ma99, trend, cycle_status) tuples, in the order of `symbols`
+    """
+    if isinstance(indicator_engine, VectorIndicatorEngine):
+        return indicator_engine.update_many(symbols, prices)
+
+    results = []
+    for symbol, price in zip(symbols, prices):
+        ma7, ma25, ma99 = indicator_engine.update(symbol, price)
+        trend, cycle_status = identify_trend(price, ma7, ma25, ma99)
+        results.append((ma7, ma25, ma99, trend, cycle_status))
+    return results
+
+def rebuild_indicators(connection, cursor):
+    """
+    Rebuild the in-memory indicator windows from the price_history table.
+
+    Args:
+        connection: Database connection
+        cursor: Database cursor
+    """
+    prices_by_symbol = price_history_store.load_windows(connection, cursor, indicator_engine.depth)
+    indicator_engine.rebuild(prices_by_symbol)
+
+def load_tick_state(connection, cursor):
+    """
+    Load the state needed for a price tick with one query per table.
+
+    Returns the current high and low price and the price cycles of every monitored
+    coin, so the whole tick can be computed in memory.
 
     Args:
-        symbol: The coin symbol
         connection: Database connection
         cursor: Database cursor
 
     Returns:
-        tuple: (ma7, ma25, ma99) - The calculated moving averages
+        dict: symbol -> {"high_price", "low_price", "cycle_prices"}
     """
-    try:
-        # Get the latest prices from the price_history table
-        if isinstance(connection, psycopg2.extensions.connection):
-            # PostgreSQL query with LIMIT
-            ma7_query = """
-                SELECT AVG(price) FROM (
-                    SELECT price FROM price_history 
-                    WHERE symbol = %s 
-                    ORDER BY timestamp DESC 
-                    LIMIT 7
-                ) AS recent_prices
-            """
-            ma25_query = """
-                SELECT AVG(price) FROM (
-                    SELECT price FROM price_history 
-                    WHERE symbol = %s 
-                    ORDER BY timestamp DESC 
-                    LIMIT 25
-                ) AS recent_prices
-            """
-            ma99_query = """
-                SELECT AVG(price) FROM (
-                    SELECT price FROM price_history 
-                    WHERE symbol = %s 
-                    ORDER BY timestamp DESC 
-                    LIMIT 99
-                ) AS recent_prices
-            """
-        else:
-            # SQLite query with LIMIT
-            ma7_query = """
-                SELECT AVG(price) FROM (
-                    SELECT price FROM price_history 
-                    WHERE symbol = ? 
-                    ORDER BY timestamp DESC 
-                    LIMIT 7
-                )
-            """
-            ma25_query = """
-                SELECT AVG(price) FROM (
-                    SELECT price FROM price_history 
-                    WHERE symbol = ? 
-                    ORDER BY timestamp DESC 
-                    LIMIT 25
-                )
-            """
-            ma99_query = """
-                SELECT AVG(price) FROM (
-                    SELECT price FROM price_history 
-                    WHERE symbol = ? 
-                    ORDER BY timestamp DESC 
-                    LIMIT 99
-                )
-            """
+    cursor.execute("SELECT symbol, high_price, low_price FROM coin_monitor")
+    rows = cursor.fetchall()
+    cycles = load_cycles(connection, cursor)
+
+    state = {}
+    for symbol, high_price, low_price in rows:
+        state[symbol] = {
+            "high_price": high_price,
+            "low_price": low_price,
+            "cycle_prices": cycles.get(symbol, pad_cycles([]))
+        }
+    return state
+
+def write_tick_results(connection, cursor, history_rows, updates, cycle_updates):
+    """
+    Write the results of a price tick with bulk statements.
 
-        # Execute queries
-        cursor.execute(ma7_query, (symbol,))
-        ma7 = cursor.fetchone()[0] or 0.0
+    Stores the new price ticks and merges them into the OHLC rollups, updates all
+    coin_monitor rows and writes the rotated price cycles. The caller is responsible
+    for committing the transaction.
 
-        cursor.execute(ma25_query, (symbol,))
-        ma25 = cursor.fetchone()[0] or 0.0
+    Args:
+        connection: Database connection
+        cursor: Database cursor
+        history_rows: List of (symbol, price) tuples for the price history
+        updates: List of (latest_price, high_price, low_price, ma7, ma25, ma99,
+                 trend, cycle_status, symbol) tuples for coin_monitor
+        cycle_updates: List of (symbol, cycle_prices, reason) tuples for coins whose cycles changed
+    """
+    price_history_store.append(connection, cursor, history_rows)
+    price_rollup_store.record(connection, cursor, history_rows)
 
-        cursor.execute(ma99_query, (symbol,))
-        ma99 = cursor.fetchone()[0] or 0.0
+    if isinstance(connection, psycopg2.extensions.connection):
+        execute_values(
+            cursor,
+            """
+                UPDATE coin_monitor AS c
+                SET latest_price = v.latest_price, high_price = v.high_price, low_price = v.low_price,
+                    ma7 = v.ma7, ma25 = v.ma25, ma99 = v.ma99,
+                    trend = v.trend, cycle_status = v.cycle_status,
+                    updated_at = CURRENT_TIMESTAMP
+                FROM (VALUES %s) AS v (latest_price, high_price, low_price, ma7, ma25, ma99,
+                                       trend, cycle_status, symbol)
+                WHERE c.symbol = v.symbol
+            """,
+            updates,
+            template="(%s::float, %s::float, %s::float, %s::float, %s::float, %s::float, %s, %s, %s)",
+            page_size=1000
+        )
+    else:
+        cursor.executemany(
+            """
+                UPDATE coin_monitor
+                SET latest_price = ?, high_price = ?, low_price = ?,
+                    ma7 = ?, ma25 = ?, ma99 = ?,
+                    trend = ?, cycle_status = ?,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE symbol = ?
+            """,
+            updates
+        )
 
-        return ma7, ma25, ma99
-    except Exception as e:
-        logging.error(f"Error calculating moving averages for {symbol}: {e}")
-        return 0.0, 0.0, 0.0
+    write_price_history_updates(connection, cursor, cycle_updates)
 
 def identify_trend(price, ma7, ma25, ma99):
     """
@@ -459,54 +489,266 @@ def identify_trend(price, ma7, ma25, ma99):
 
     return trend, cycle_status
 
-def update_coin_prices():
-    """Update the latest prices for all coins in the coin_monitor table."""
-    connection = None
+def ticker_request_params(symbols=None):
+    """
+    Query parameters of the ticker request for a set of symbols.
+
+    A request for up to TICKER_SYMBOLS_PER_REQUEST symbols uses the symbols=[...] parameter;
+    larger sets fetch the whole ticker (the same request weight as one symbols= request)
+    and are filtered afterwards.
+
+    Args:
+        symbols: Optional list of symbols, all symbols if not given
+
+    Returns:
+        dict: Query parameters, or None for the whole ticker
+    """
+    if symbols is None or len(symbols) > TICKER_SYMBOLS_PER_REQUEST:
+        return None
+    return {'symbols': json.dumps(sorted(symbols), separators=(',', ':'))}
+
+def parse_ticker_prices(price_data, symbols=None):
+    """Convert a ticker response into a dict of symbol -> price, limited to `symbols` if given."""
+    prices = {item['symbol']: float(item['price']) for item in price_data}
+    if symbols is not None:
+        wanted = set(symbols)
+        prices = {symbol: price for symbol, price in prices.items() if symbol in wanted}
+    return prices
+
+def fetch_ticker_prices(symbols=None):
+    """
+    Fetch the current prices from the Binance ticker endpoint.
+
+    Args:
+        symbols: Optional list of symbols to fetch, all symbols if not given
+
+    Returns:
+        dict: symbol -> price
+    """
+    if symbols is not None and not symbols:
+        return {}
+    params = ticker_request_params(symbols)
     try:
-        # Fetch current prices from Binance API
-        response = requests.get('https://api.binance.com/api/v3/ticker/price', timeout=10)
-        response.raise_for_status()
-        price_data = response.json()
-        price_dict = {item['symbol']: float(item['price']) for item in price_data}
+        price_data = binance_get('/api/v3/ticker/price', params=params, priority=PRIORITY_MONITOR)
+    except requests.exceptions.HTTPError as e:
+        # One delisted symbol fails the whole symbols= request, fall back to the full ticker
+        if params is None or e.response is None or e.response.status_code != 400:
+            raise
+        price_data = binance_get('/api/v3/ticker/price', priority=PRIORITY_MONITOR)
+    return parse_ticker_prices(price_data, symbols)
+
+@serialized_write
+def sync_shards(force=False):
+    """
+    Renew this worker's shard leases and rebalance shards between workers when due.
 
-        connection, cursor = get_database_connection()
+    When the owned shards change, the indicator windows are reloaded from price_history
+    on the next tick, since other workers advanced the newly owned symbols.
 
-        # Get all symbols from coin_monitor
-        cursor.execute("SELECT symbol FROM coin_monitor")
-        symbols = [row[0] for row in cursor.fetchall()]
+    Args:
+        force: Sync even if it isn't due, e.g. to pick up newly added coins
+    """
+    if shard_coordinator is None or not (force or shard_coordinator.sync_due()):
+        return
+    try:
+        with db_connection() as (connection, cursor):
+            changed = shard_coordinator.sync(connection, cursor)
+            connection.commit()
+        if changed:
+            indicator_engine.invalidate()
+            price_history_store.invalidate()
+            price_rollup_store.invalidate()
+    except Exception as e:
+        logging.error(f"Error syncing shard leases: {e}")
 
-        updates = []
-        history_updates = 0
-        for symbol in symbols:
-            if symbol in price_dict:
-                latest_price = price_dict[symbol]
+@serialized_write
+def release_shards():
+    """Release this worker's shard leases, e.g. on shutdown."""
+    if shard_coordinator is None:
+        return
+    try:
+        with db_connection() as (connection, cursor):
+            shard_coordinator.release(connection, cursor)
+            connection.commit()
+        logging.info(f"Released shard leases of worker {shard_coordinator.worker_id}")
+    except Exception as e:
+        logging.error(f"Error releasing shard leases: {e}")
 
-                # Store the price in the price_history table
-                if isinstance(connection, psycopg2.extensions.connection):
-                    insert_query = """
-                        INSERT INTO price_history (symbol, price)
-                        VALUES (%s, %s)
-                    """
-                else:
-                    insert_query = """
-                        INSERT INTO price_history (symbol, price)
-                        VALUES (?, ?)
-                    """
-                cursor.execute(insert_query, (symbol, latest_price))
+# Leader election of this process, set when the monitor starts; None if every process runs the monitor
+leader_election = None
 
-                # Get current high and low prices
-                # Use appropriate placeholder based on connection type
-                if isinstance(connection, psycopg2.extensions.connection):
-                    cursor.execute(
-                        "SELECT high_price, low_price FROM coin_monitor WHERE symbol = %s",
-                        (symbol,)
-                    )
-                else:
-                    cursor.execute(
-                        "SELECT high_price, low_price FROM coin_monitor WHERE symbol = ?",
-                        (symbol,)
-                    )
-                high_price, low_price = cursor.fetchone()
+# (count, last update, price sum) of coin_monitor when a follower last published a snapshot
+_follower_marker = None
+
+# Snapshot last published by a tick, and when a tick last reloaded it from the database
+_tick_snapshot = None
+_tick_snapshot_loaded_at = None
+
+def leading():
+    """Check whether this process (still) runs the price monitor."""
+    return leader_election is None or leader_election.campaign()
+
+def runs_monitor():
+    """Check whether this process currently runs the price monitor, without campaigning."""
+    return leader_election is None or leader_election.is_leader
+
+def resign_leadership():
+    """Release the leader lock, e.g. on shutdown, so a follower takes over right away."""
+    if leader_election is not None:
+        leader_election.resign()
+
+def refresh_follower_snapshot():
+    """
+    Publish a new snapshot on a follower when the leader changed coin_monitor.
+
+    Followers don't run the tick that publishes snapshots, so they check a cheap summary
+    of the table instead and only reload the records when it changed.
+    """
+    global _follower_marker
+    try:
+        with db_connection() as (connection, cursor):
+            cursor.execute("SELECT COUNT(*), MAX(updated_at), SUM(latest_price) FROM coin_monitor")
+            marker = tuple(cursor.fetchone())
+            if marker != _follower_marker or snapshot_store.current is None:
+                snapshot_store.publish(load_coin_monitors(connection, cursor))
+                _follower_marker = marker
+    except Exception as e:
+        logging.error(f"Error refreshing follower snapshot: {e}")
+
+def become_leader():
+    """Drop the in-memory indicator state, the previous leader advanced the prices since."""
+    global _follower_marker, _tick_snapshot
+    _follower_marker = None
+    _tick_snapshot = None
+    indicator_engine.invalidate()
+    price_history_store.invalidate()
+    price_rollup_store.invalidate()
+
+def publish_tick_snapshot(changes):
+    """
+    Publish the coin snapshot after a tick.
+
+    The changes of the tick are applied to the snapshot published by the previous tick,
+    without reloading the records. The records are reloaded from the database instead for
+    the first tick, when something else published in between (e.g. an API write), every
+    SNAPSHOT_RELOAD_INTERVAL seconds and with sharding, where the other workers write the
+    other shards.
+
+    Args:
+        changes: dict of symbol -> changed fields, as returned by write_price_tick()
+    """
+    global _tick_snapshot, _tick_snapshot_loaded_at
+    snapshot = None
+    if (shard_coordinator is None and _tick_snapshot_loaded_at is not None
+            and time.monotonic() - _tick_snapshot_loaded_at < SNAPSHOT_RELOAD_INTERVAL):
+        snapshot = snapshot_store.publish_changes(_tick_snapshot, changes)
+    if snapshot is None:
+        with db_connection() as (connection, cursor):
+            snapshot = snapshot_store.publish(load_coin_monitors(connection, cursor))
+        _tick_snapshot_loaded_at = time.monotonic()
+    _tick_snapshot = snapshot
+
+def owned_prices(price_dict):
+    """Filter a dict of symbol -> price down to the symbols of this worker's shards."""
+    if shard_coordinator is None:
+        return price_dict
+    return {symbol: price for symbol, price in price_dict.items() if shard_coordinator.owns(symbol)}
+
+def monitored_symbols():
+    """The symbols this worker fetches, or None for all symbols when sharding is disabled."""
+    if shard_coordinator is None:
+        return None
+    return shard_coordinator.symbols
+
+def update_coin_prices(price_dict=None, advance_indicators=True):
+    """
+    Update the latest prices for all coins in the coin_monitor table.
+
+    The tick is set-based: all current state is loaded in one query, highs, lows,
+    moving averages, trends and price cycles are computed in memory and the results
+    are written back with bulk statements in a single transaction (see write_price_tick).
+    The written changes are then published as the snapshot served by the API.
+
+    Args:
+        price_dict: Optional dict of symbol -> price. If not given, prices are fetched
+                    from the Binance ticker endpoint
+        advance_indicators: If False, only latest/high/low prices and price cycles are
+                            updated; moving averages, trend and price_history are left
+                            for the next indicator tick (used by stream flushes)
+    """
+    try:
+        if price_dict is None:
+            # Fetch current prices from Binance API
+            price_dict = fetch_ticker_prices(monitored_symbols())
+
+        # Other workers update the symbols of the shards this worker doesn't own
+        price_dict = owned_prices(price_dict)
+
+        changes = write_price_tick(price_dict, advance_indicators)
+        if not changes:
+            return False
+
+        # Publish the committed state for the API, serialized once per tick
+        try:
+            with tick_metrics.phase("publish"):
+                publish_tick_snapshot(changes)
+        except Exception as e:
+            logging.error(f"Error publishing coin snapshot: {e}")
+            tick_metrics.count("errors", label="publish")
+        return True
+    except Exception as e:
+        logging.error(f"Error updating latest prices: {e}")
+        tick_metrics.count("errors", label="update")
+        if advance_indicators:
+            # The windows may hold prices that were rolled back, reload them on the next tick
+            indicator_engine.invalidate()
+            price_history_store.invalidate()
+            price_rollup_store.invalidate()
+        return False
+
+@serialized_write
+def write_price_tick(price_dict, advance_indicators=True):
+    """
+    Compute and write one tick of prices in a single transaction.
+
+    Runs on the SQLite writer thread (see run_write), the caller fetches the prices and
+    publishes the committed state.
+
+    Args:
+        price_dict: dict of symbol -> price of the symbols to update
+        advance_indicators: See update_coin_prices()
+
+    Returns:
+        dict: symbol -> fields of its coin list record that were written, empty if no
+        prices were written
+    """
+    with db_connection() as (connection, cursor):
+        with tick_metrics.phase("db_read"):
+            # The indicator windows are only read from price_history at startup
+            if advance_indicators and not indicator_engine.loaded:
+                rebuild_indicators(connection, cursor)
+
+            # Load high/low prices and price cycles for all coins at once
+            state = load_tick_state(connection, cursor)
+
+        symbols = [symbol for symbol in state if symbol in price_dict]
+        latest_prices = [price_dict[symbol] for symbol in symbols]
+        if advance_indicators:
+            # Compute moving averages, trends and cycle statuses for the whole market at once
+            with tick_metrics.phase("indicators"):
+                indicators = calculate_indicators(symbols, latest_prices)
+        else:
+            indicators = [None] * len(symbols)
+
+        history_rows = []
+        updates = []
+        cycle_updates = []
+        changes = {}
+        with tick_metrics.phase("cycles"):
+            for symbol, latest_price, symbol_indicators in zip(symbols, latest_prices, indicators):
+                coin = state[symbol]
+                high_price = coin["high_price"]
+                low_price = coin["low_price"]
 
                 # Update high_price if latest_price is higher
                 if latest_price > high_price:
@@ -516,92 +758,64 @@ def update_coin_prices():
                 if latest_price < low_price:
                     low_price = latest_price
 
-                # Calculate moving averages
-                ma7, ma25, ma99 = calculate_moving_averages(symbol, connection, cursor)
-
-                # Identify trend and cycle status
-                trend, cycle_status = identify_trend(latest_price, ma7, ma25, ma99)
-
-                # Add to updates list with moving averages and trend information
-                updates.append((latest_price, high_price, low_price, ma7, ma25, ma99, trend, cycle_status, symbol))
+                changes[symbol] = {"latest_price": latest_price, "high_price": high_price, "low_price": low_price}
+                if symbol_indicators is None:
+                    updates.append((latest_price, high_price, low_price, symbol))
+                else:
+                    ma7, ma25, ma99, trend, cycle_status = symbol_indicators
+                    history_rows.append((symbol, latest_price))
+                    updates.append((latest_price, high_price, low_price, ma7, ma25, ma99, trend, cycle_status, symbol))
+                    changes[symbol].update(trend=trend, cycle_status=cycle_status)
 
                 # Check if we need to update the price history
-                if update_price_history(symbol, high_price, low_price, latest_price):
-                    history_updates += 1
-
-        # Execute batch update
-        if updates:
-            # Do individual updates
-            if isinstance(connection, psycopg2.extensions.connection):
-                update_query = """
-                    UPDATE coin_monitor
-                    SET latest_price = %s, high_price = %s, low_price = %s, 
-                        ma7 = %s, ma25 = %s, ma99 = %s, 
-                        trend = %s, cycle_status = %s,
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE symbol = %s
-                """
-            else:
-                update_query = """
-                    UPDATE coin_monitor
-                    SET latest_price = ?, high_price = ?, low_price = ?, 
-                        ma7 = ?, ma25 = ?, ma99 = ?, 
-                        trend = ?, cycle_status = ?,
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE symbol = ?
-                """
-            for update in updates:
-                cursor.execute(update_query, update)
-
-            # Clean up old price history data (keep only the last 100 entries per symbol)
-            if isinstance(connection, psycopg2.extensions.connection):
-                cleanup_query = """
-                    DELETE FROM price_history 
-                    WHERE id NOT IN (
-                        SELECT id FROM (
-                            SELECT id FROM price_history 
-                            WHERE symbol = %s 
-                            ORDER BY timestamp DESC 
-                            LIMIT 100
-                        ) AS recent_prices
-                    )
-                    AND symbol = %s
-                """
-            else:
-                cleanup_query = """
-                    DELETE FROM price_history 
-                    WHERE id NOT IN (
-                        SELECT id FROM price_history 
-                        WHERE symbol = ? 
-                        ORDER BY timestamp DESC 
-                        LIMIT 100
-                    )
-                    AND symbol = ?
-                """
+                history_update = calculate_price_history_update(
+                    symbol, coin["high_price"], coin["cycle_prices"], high_price, low_price, latest_price
+                )
+                if history_update is not None:
+                    cycle_updates.append((symbol,) + history_update)
+                    changes[symbol].update(cycle_fields(history_update[0]))
+                    logging.info(f"Updated price history for {symbol} due to {history_update[1]}. Current price: {latest_price}, High: {coin['high_price']}, Low: {coin['low_price']}")
 
-            for symbol in symbols:
-                cursor.execute(cleanup_query, (symbol, symbol))
+        # Symbols whose price fell more than cycle_end_percent from the high drive the adaptive
+        # interval; it is sampled once per indicator tick, not on the stream flushes in between
+        if advance_indicators:
+            crossings = sum(1 for update in cycle_updates if update[2] == "cycle completed")
+            tick_scheduler.record_crossings(crossings, len(symbols))
 
-            connection.commit()
-            logging.info(f"Updated latest prices for {len(updates)} coins, updated history for {history_updates} coins")
-            return True
+        if updates:
+            with tick_metrics.phase("write"):
+                if advance_indicators:
+                    write_tick_results(connection, cursor, history_rows, updates, cycle_updates)
+                else:
+                    write_latest_prices(connection, cursor, updates)
+                    write_price_history_updates(connection, cursor, cycle_updates)
+                # The rows were all stamped with CURRENT_TIMESTAMP by this transaction
+                updated_at = load_updated_at(connection, cursor, symbols[0])
+                for fields in changes.values():
+                    fields["updated_at"] = updated_at
+            if advance_indicators:
+                # Trim old price history and rollups with set-based statements on the retention schedule
+                with tick_metrics.phase("cleanup"):
+                    price_history_store.prune_if_due(connection, cursor)
+                    price_rollup_store.prune_if_due(connection, cursor)
+            with tick_metrics.phase("commit"):
+                connection.commit()
+            logging.info(f"Updated latest prices for {len(updates)} coins, updated history for {len(cycle_updates)} coins")
+
+            tick_metrics.record_prices(symbols)
+            tick_metrics.count("symbols_updated", len(updates))
+            for update in cycle_updates:
+                tick_metrics.count("cycles_rotated", label=update[2])
+            return changes
         else:
             logging.info("No prices updated")
-            return False
-    except Exception as e:
-        logging.error(f"Error updating latest prices: {e}")
-        if connection:
-            connection.rollback()
-        return False
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
+            return {}
 
+@serialized_write
 def update_existing_coins_history(force_update=False):
     """
     Update existing coins with varied price history if all cycles have the same values.
-    This function checks all 10 cycles and can force update all coins regardless of current values.
+    This function checks all stored cycles and can force update all coins regardless of current values.
 
     Args:
         force_update: If True, update all coins regardless of current values
@@ -610,93 +824,62 @@ def update_existing_coins_history(force_update=False):
         int: Number of coins updated
     """
     try:
-        connection, cursor = get_database_connection()
-
-        # Get all coins from the database with all cycle data
-        if isinstance(connection, psycopg2.extensions.connection):
-            query = """
-                SELECT symbol, latest_price, 
-                    high_price_1, low_price_1, high_price_2, low_price_2,
-                    high_price_3, low_price_3, high_price_4, low_price_4,
-                    high_price_5, low_price_5, high_price_6, low_price_6,
-                    high_price_7, low_price_7, high_price_8, low_price_8,
-                    high_price_9, low_price_9, high_price_10, low_price_10
-                FROM coin_monitor
-            """
-        else:
-            query = """
-                SELECT symbol, latest_price, 
-                    high_price_1, low_price_1, high_price_2, low_price_2,
-                    high_price_3, low_price_3, high_price_4, low_price_4,
-                    high_price_5, low_price_5, high_price_6, low_price_6,
-                    high_price_7, low_price_7, high_price_8, low_price_8,
-                    high_price_9, low_price_9, high_price_10, low_price_10
-                FROM coin_monitor
-            """
-        cursor.execute(query)
-        coins = cursor.fetchall()
-
-        updated_count = 0
-        for coin in coins:
-            symbol = coin[0]
-            price = coin[1]
-
-            # Extract all cycle high and low prices
-            cycle_data = []
-            for i in range(10):
-                high_idx = 2 + i*2
-                low_idx = 3 + i*2
-                cycle_data.append((coin[high_idx], coin[low_idx]))
-
-            # Determine if we need to update this coin
-            need_update = force_update
-
-            if not need_update:
-                # Check if price history is initialized
-                if cycle_data[0][0] == 0.0 and cycle_data[0][1] == 0.0:
-                    need_update = True
-                else:
-                    # Check if all cycles have the same values or are uninitialized
-
-                    # First, count how many cycles are initialized
-                    initialized_cycles = sum(1 for high, low in cycle_data if high != 0.0 or low != 0.0)
-
-                    # If less than 10 cycles are initialized, we should update
-                    if initialized_cycles < 10:
+        with db_connection() as (connection, cursor):
+            # Get all coins and their cycles from the database
+            cursor.execute("SELECT symbol, latest_price FROM coin_monitor")
+            coins = cursor.fetchall()
+            cycles = load_cycles(connection, cursor)
+
+            updated_count = 0
+            for symbol, price in coins:
+                cycle_data = cycles.get(symbol, pad_cycles([]))
+
+                # Determine if we need to update this coin
+                need_update = force_update
+
+                if not need_update:
+                    # Check if price history is initialized
+                    if cycle_data[0][0] == 0.0 and cycle_data[0][1] == 0.0:
                         need_update = True
                     else:
-                        # Check if all initialized cycles have the same values
-                        first_high, first_low = None, None
-                        all_same = True
-
-                        for high, low in cycle_data:
-                            if high != 0.0 or low != 0.0:  # Only check initialized cycles
-                                if first_high is None:
-                                    first_high, first_low = high, low
-                                elif abs(high - first_high) < 0.0001 and abs(low - first_low) < 0.0001:
-                                    # Values are the same (within a small epsilon)
-                                    continue
-                                else:
-                                    all_same = False
-                                    break
-
-                        need_update = all_same
-
-            if need_update:
-                # Initialize price history with varied values
-                initialize_price_history(symbol, price)
-                updated_count += 1
-                logging.info(f"Updated price history for coin {symbol} with varied values")
-
-        logging.info(f"Updated price history for {updated_count} existing coins")
-        return updated_count
+                        # Check if all cycles have the same values or are uninitialized
+
+                        # First, count how many cycles are initialized
+                        initialized_cycles = sum(1 for high, low in cycle_data if high != 0.0 or low != 0.0)
+
+                        # If not all cycles are initialized, we should update
+                        if initialized_cycles < PRICE_CYCLE_DEPTH:
+                            need_update = True
+                        else:
+                            # Check if all initialized cycles have the same values
+                            first_high, first_low = None, None
+                            all_same = True
+
+                            for high, low in cycle_data:
+                                if high != 0.0 or low != 0.0:  # Only check initialized cycles
+                                    if first_high is None:
+                                        first_high, first_low = high, low
+                                    elif abs(high - first_high) < 0.0001 and abs(low - first_low) < 0.0001:
+                                        # Values are the same (within a small epsilon)
+                                        continue
+                                    else:
+                                        all_same = False
+                                        break
+
+                            need_update = all_same
+
+                if need_update:
+                    # Initialize price history with varied values
+                    initialize_price_history(symbol, price, connection, cursor)
+                    updated_count += 1
+                    logging.info(f"Updated price history for coin {symbol} with varied values")
+
+            connection.commit()
+            logging.info(f"Updated price history for {updated_count} existing coins")
+            return updated_count
     except Exception as e:
         logging.error(f"Error updating existing coins history: {e}")
         return 0
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
 
 def force_update_all_price_histories():
     """
@@ -708,23 +891,41 @@ def force_update_all_price_histories():
     """
     return update_existing_coins_history(force_update=True)
 
-def update_initial_prices():
+def update_initial_prices(owned_only=False):
     """
     Update the initial prices for all coins in the database with the current prices from the Binance API.
     This ensures that after a Docker restart, the initial prices match the current prices.
 
+    Args:
+        owned_only: With sharding, only update the coins of this worker's shards
+
     Returns:
         int: Number of coins updated
     """
     try:
         # Fetch current prices from Binance API
-        response = requests.get('https://api.binance.com/api/v3/ticker/price', timeout=10)
-        response.raise_for_status()
-        price_data = response.json()
+        price_data = binance_get('/api/v3/ticker/price')
         price_dict = {item['symbol']: float(item['price']) for item in price_data}
+        if owned_only:
+            price_dict = owned_prices(price_dict)
+
+        return reset_initial_prices(price_dict)
+    except Exception as e:
+        logging.error(f"Error updating initial prices: {e}")
+        return 0
+
+@serialized_write
+def reset_initial_prices(price_dict):
+    """
+    Set the initial, low, high and latest prices of all coins to their current price.
 
-        connection, cursor = get_database_connection()
+    Args:
+        price_dict: dict of symbol -> current price
 
+    Returns:
+        int: Number of coins updated
+    """
+    with db_connection() as (connection, cursor):
         # Get all symbols from coin_monitor
         cursor.execute("SELECT symbol FROM coin_monitor")
         symbols = [row[0] for row in cursor.fetchall()]
@@ -753,52 +954,319 @@ def update_initial_prices():
         connection.commit()
         logging.info(f"Updated initial prices for {updates} coins to match current prices")
         return updates
-    except Exception as e:
-        logging.error(f"Error updating initial prices: {e}")
-        if connection:
-            connection.rollback()
-        return 0
+
+def plan_stream_update(table, scheduler):
+    """
+    Decide what the stream monitor writes on this flush.
+
+    Prices that changed since the last flush are written every PRICE_FLUSH_INTERVAL
+    seconds, and a full indicator tick over the whole latest-price table runs whenever
+    the tick scheduler is due, so the moving averages keep the same time base as in
+    REST mode. While the stream is down or stale, prices are polled over REST.
+
+    Args:
+        table: LatestPriceTable filled by the stream
+        scheduler: TickScheduler of the indicator ticks
+
+    Returns:
+        dict: Keyword arguments for update_coin_prices() (an empty dict means a REST tick),
+        or None if there is nothing to write
+    """
+    age = table.age()
+    if age is None or age > STREAM_STALE_AFTER:
+        if not scheduler.due():
+            return None
+        if age is not None:
+            logging.warning(f"No stream message for {age:.0f} seconds, polling REST ticker")
+        return {}
+
+    if scheduler.due():
+        return {"price_dict": table.snapshot()}
+
+    changed = table.take_changes()
+    if changed:
+        return {"price_dict": changed, "advance_indicators": False}
+    return None
+
+def is_indicator_tick(update):
+    """Check whether an update planned by plan_stream_update() is a scheduled indicator tick."""
+    return update.get("advance_indicators", True)
+
+def run_stream_monitor():
+    """Run the price monitor on the all-market mini-ticker WebSocket stream (see plan_stream_update())."""
+    stream = MiniTickerStream()
+    stream.start()
+    tick_scheduler.reset()
+
+    try:
+        while leading():
+            update = None
+            try:
+                sync_shards()
+                update = plan_stream_update(stream.table, tick_scheduler)
+                if update is not None:
+                    if is_indicator_tick(update):
+                        tick_scheduler.tick_started()
+                    update_coin_prices(**update)
+            except Exception as e:
+                logging.error(f"Error in stream price monitor: {e}")
+                tick_metrics.count("errors", label="tick")
+            if update is not None and is_indicator_tick(update):
+                tick_scheduler.tick_finished()
+
+            # Wake up for the next flush, or earlier for the next indicator tick
+            time.sleep(min(PRICE_FLUSH_INTERVAL, tick_scheduler.delay()))
     finally:
-        if connection:
-            cursor.close()
-            connection.close()
+        stream.stop()
 
-def run_price_monitor():
-    """Main function to run the price monitoring continuously."""
-    logging.info("Starting coin price monitor")
+def prepare_coin_monitor():
+    """
+    Add new coins to the coin_monitor table and match the initial prices to the current prices.
+
+    Runs once when the monitor starts, so that after a Docker restart the initial prices
+    match the current prices. A standby taking over from a failed leader doesn't run it
+    and continues the existing state instead. With sharding, a worker only prepares the
+    coins of the shards it leases, the other workers prepare theirs.
+    """
+    # Lease the shards first, so only their coins are added and reset
+    sync_shards()
 
     # Initialize the coin_monitor table
-    initialize_coin_monitor()
+    initialize_coin_monitor(owned_only=True)
 
     # Update initial prices to match current prices from Binance API
-    # This ensures that after a Docker restart, the initial prices match the current prices
     logging.info("Updating initial prices to match current prices from Binance API")
-    updated_prices_count = update_initial_prices()
+    updated_prices_count = update_initial_prices(owned_only=True)
     logging.info(f"Updated initial prices for {updated_prices_count} coins to match current prices")
 
+    # Pick up the coins just added to the owned shards
+    sync_shards(force=True)
+
     # Don't force update all coins with varied price history on startup
     # Let the cycles develop naturally over time
     # This prevents all 10 cycles from being completed immediately after Docker startup
 
-    while True:
+def run_price_monitor():
+    """
+    Main function to run the price monitoring continuously.
+    Returns when this process loses the leader election.
+    """
+    logging.info("Starting coin price monitor")
+    prepare_coin_monitor()
+    run_price_ticks()
+
+def run_price_ticks():
+    """
+    Run the price ticks on the current state of the coin_monitor table.
+    Returns when this process loses the leader election.
+    """
+    if PRICE_INGESTION_MODE == 'stream':
+        if WEBSOCKETS_AVAILABLE:
+            run_stream_monitor()
+            return
+        logging.warning("The websockets package is not installed, falling back to REST polling.")
+
+    tick_scheduler.reset()
+    while leading():
+        tick_scheduler.tick_started()
         try:
             # Update prices
+            sync_shards()
             update_coin_prices()
+        except Exception as e:
+            logging.error(f"Error in price monitor: {e}")
+            tick_metrics.count("errors", label="tick")
+        tick_scheduler.tick_finished()
+
+        # Sleep until the next tick is due
+        time.sleep(tick_scheduler.delay())
 
-            # Sleep for 20 seconds
-            time.sleep(20)
+def follow_leader():
+    """Serve as a follower, keeping the snapshot current, until this process is elected."""
+    next_campaign = time.monotonic()
+    while True:
+        if time.monotonic() >= next_campaign:
+            if leader_election.campaign():
+                return
+            next_campaign = time.monotonic() + LEADER_RETRY_INTERVAL
+        refresh_follower_snapshot()
+        time.sleep(FOLLOWER_REFRESH_INTERVAL)
+
+def run_elected_price_monitor():
+    """
+    Run the price monitor whenever this process is the elected leader.
+
+    Only a process that is the leader when it starts prepares the coin_monitor table
+    (see prepare_coin_monitor()); after a failover the new leader just starts ticking.
+    """
+    if leader_election.campaign():
+        prepare_coin_monitor()
+    while True:
+        try:
+            follow_leader()
+            become_leader()
+            logging.info("Starting coin price monitor as the elected leader")
+            run_price_ticks()
         except Exception as e:
             logging.error(f"Error in price monitor: {e}")
-            time.sleep(20)  # Still sleep in case of error
+            resign_leadership()
+            time.sleep(LEADER_RETRY_INTERVAL)
 
 # Function to start the price monitor in a separate thread
 def start_price_monitor():
     """Start the price monitor in a separate thread."""
-    monitor_thread = threading.Thread(target=run_price_monitor, daemon=True)
+    global leader_election
+    leader_election = create_leader_election()
+    target = run_price_monitor if leader_election is None else run_elected_price_monitor
+    monitor_thread = threading.Thread(target=target, daemon=True)
     monitor_thread.start()
     logging.info("Started price monitor thread")
     return monitor_thread
 
+# Single worker, so database ticks never overlap and never run on the event loop
+_db_executor = None
+
+def get_db_executor():
+    """Return the executor that runs the monitor's database work, creating it on first use."""
+    global _db_executor
+    if _db_executor is None:
+        _db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="price-monitor-db")
+    return _db_executor
+
+async def run_in_db_executor(func, *args, **kwargs):
+    """Run a blocking database function on the monitor's database worker."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_db_executor(), functools.partial(func, *args, **kwargs))
+
+async def fetch_ticker_prices_async(symbols=None):
+    """Async version of fetch_ticker_prices() using the shared HTTP client."""
+    if symbols is not None and not symbols:
+        return {}
+    params = ticker_request_params(symbols)
+    try:
+        price_data = await binance_get_async('/api/v3/ticker/price', params=params, priority=PRIORITY_MONITOR)
+    except Exception as e:
+        # One delisted symbol fails the whole symbols= request, fall back to the full ticker
+        response = getattr(e, 'response', None)
+        if params is None or response is None or response.status_code != 400:
+            raise
+        price_data = await binance_get_async('/api/v3/ticker/price', priority=PRIORITY_MONITOR)
+    return parse_ticker_prices(price_data, symbols)
+
+async def run_stream_monitor_async():
+    """Run the stream monitor as tasks on the current event loop (see plan_stream_update())."""
+    stream = MiniTickerStream()
+    stream_task = asyncio.create_task(stream.consume())
+    tick_scheduler.reset()
+
+    try:
+        while await run_in_db_executor(leading):
+            update = None
+            try:
+                await run_in_db_executor(sync_shards)
+                update = plan_stream_update(stream.table, tick_scheduler)
+                if update is not None and is_indicator_tick(update):
+                    tick_scheduler.tick_started()
+                if update == {}:
+                    update = {"price_dict": await fetch_ticker_prices_async(monitored_symbols())}
+                if update is not None:
+                    await run_in_db_executor(update_coin_prices, **update)
+            except Exception as e:
+                logging.error(f"Error in stream price monitor: {e}")
+                tick_metrics.count("errors", label="tick")
+            if update is not None and is_indicator_tick(update):
+                tick_scheduler.tick_finished()
+
+            # Wake up for the next flush, or earlier for the next indicator tick
+            await asyncio.sleep(min(PRICE_FLUSH_INTERVAL, tick_scheduler.delay()))
+    finally:
+        stream.stop()
+        stream_task.cancel()
+
+async def run_price_monitor_async():
+    """
+    Run the price monitor as a task on the current (FastAPI) event loop.
+
+    Ticker requests go through the shared keep-alive async HTTP client, and the database
+    work of each tick runs on a single dedicated worker thread so it never blocks the loop.
+    Returns when this process loses the leader election.
+    """
+    logging.info("Starting coin price monitor on the event loop")
+    await run_in_db_executor(prepare_coin_monitor)
+    await run_price_ticks_async()
+
+async def run_price_ticks_async():
+    """Async version of run_price_ticks()."""
+    if PRICE_INGESTION_MODE == 'stream':
+        if WEBSOCKETS_AVAILABLE:
+            await run_stream_monitor_async()
+            return
+        logging.warning("The websockets package is not installed, falling back to REST polling.")
+
+    tick_scheduler.reset()
+    while await run_in_db_executor(leading):
+        tick_scheduler.tick_started()
+        try:
+            await run_in_db_executor(sync_shards)
+            price_dict = await fetch_ticker_prices_async(monitored_symbols())
+            await run_in_db_executor(update_coin_prices, price_dict)
+        except Exception as e:
+            logging.error(f"Error in price monitor: {e}")
+            tick_metrics.count("errors", label="tick")
+        tick_scheduler.tick_finished()
+
+        # Sleep until the next tick is due
+        await asyncio.sleep(tick_scheduler.delay())
+
+async def follow_leader_async():
+    """Async version of follow_leader()."""
+    next_campaign = time.monotonic()
+    while True:
+        if time.monotonic() >= next_campaign:
+            if await run_in_db_executor(leader_election.campaign):
+                return
+            next_campaign = time.monotonic() + LEADER_RETRY_INTERVAL
+        await run_in_db_executor(refresh_follower_snapshot)
+        await asyncio.sleep(FOLLOWER_REFRESH_INTERVAL)
+
+async def run_elected_price_monitor_async():
+    """Async version of run_elected_price_monitor()."""
+    if await run_in_db_executor(leader_election.campaign):
+        await run_in_db_executor(prepare_coin_monitor)
+    while True:
+        try:
+            await follow_leader_async()
+            await run_in_db_executor(become_leader)
+            logging.info("Starting coin price monitor as the elected leader")
+            await run_price_ticks_async()
+        except Exception as e:
+            logging.error(f"Error in price monitor: {e}")
+            await run_in_db_executor(resign_leadership)
+            await asyncio.sleep(LEADER_RETRY_INTERVAL)
+
+def start_price_monitor_async():
+    """Schedule the price monitor as a task on the running event loop."""
+    global leader_election
+    leader_election = create_leader_election()
+    monitor = run_price_monitor_async if leader_election is None else run_elected_price_monitor_async
+    task = asyncio.get_running_loop().create_task(monitor())
+    logging.info("Started price monitor task")
+    return task
+
+async def stop_price_monitor_async(task):
+    """Cancel the price monitor task and wait for its database work to finish."""
+    global _db_executor
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    await run_in_db_executor(release_shards)
+    await run_in_db_executor(resign_leadership)
+    if _db_executor is not None:
+        _db_executor.shutdown(wait=True)
+        _db_executor = None
+
 if __name__ == "__main__":
     # Run the price monitor directly if this script is executed
     run_price_monitor()
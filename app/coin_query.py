@@ -0,0 +1,179 @@
+import base64
+import json
+
+# Maximum page size of GET /api/coin-monitors
+MAX_PAGE_SIZE = 1000
+
+# Supported sort orders; a leading "-" sorts descending
+SORT_FIELDS = ("symbol", "change")
+
+def percent_change(coin):
+    """
+    Percent change of a coin's latest price from its initial price.
+
+    Args:
+        coin: Coin monitor record
+
+    Returns:
+        float: Change in percent, 0.0 if the initial price isn't known
+    """
+    initial_price = coin.get("initial_price") or 0.0
+    if initial_price == 0:
+        return 0.0
+    return (coin.get("latest_price", 0.0) - initial_price) / initial_price * 100
+
+def encode_cursor(values):
+    """Encode the sort key of the last returned record as an opaque cursor."""
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor created by encode_cursor().
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or not values:
+        raise ValueError("Invalid cursor")
+    return values
+
+def _split(value):
+    if not value:
+        return None
+    return [item.strip() for item in value.split(",") if item.strip()] or None
+
+class CoinQuery:
+    """
+    Pagination, filters, sort order and field projection of a coin list request.
+
+    All parameters are optional; an empty query returns every record ordered by symbol,
+    exactly like the plain coin list. Pagination is keyset based: the cursor holds the
+    sort key of the last record of a page, so pages stay consistent while prices change
+    and no offset has to be skipped.
+
+    Args:
+        limit: Maximum number of records to return
+        cursor: Cursor returned with the previous page
+        trend: Comma-separated trends to include, e.g. "UP" or "UP,DOWN"
+        cycle_status: Comma-separated cycle statuses to include
+        min_price: Minimum latest price
+        max_price: Maximum latest price
+        symbol_prefix: Only symbols starting with this prefix
+        sort: "symbol" (default) or "change" (percent change from the initial price),
+            with a leading "-" for descending order
+        fields: Comma-separated fields to return; the symbol is always included
+
+    Raises:
+        ValueError: If a parameter is invalid
+    """
+
+    def __init__(self, limit=None, cursor=None, trend=None, cycle_status=None, min_price=None,
+                 max_price=None, symbol_prefix=None, sort=None, fields=None):
+        if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+        sort = sort or "symbol"
+        self.descending = sort.startswith("-")
+        self.sort = sort.lstrip("-")
+        if self.sort not in SORT_FIELDS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_FIELDS)}, optionally prefixed with '-'")
+
+        self.limit = limit
+        self.after = decode_cursor(cursor) if cursor else None
+        if self.after is not None and not self._valid_cursor(self.after):
+            raise ValueError("Cursor doesn't match the sort order")
+        trends = _split(trend)
+        self.trends = {value.lower() for value in trends} if trends else None
+        statuses = _split(cycle_status)
+        self.cycle_statuses = {value.lower() for value in statuses} if statuses else None
+        self.min_price = min_price
+        self.max_price = max_price
+        self.symbol_prefix = symbol_prefix.upper() if symbol_prefix else None
+        fields = _split(fields)
+        self.fields = ["symbol"] + [field for field in fields if field != "symbol"] if fields else None
+
+    def _valid_cursor(self, values):
+        if self.sort == "change":
+            return (len(values) == 2 and isinstance(values[0], (int, float))
+                    and not isinstance(values[0], bool) and isinstance(values[1], str))
+        return len(values) == 1 and isinstance(values[0], str)
+
+    @property
+    def is_empty(self):
+        """True if the query returns the plain coin list."""
+        return (self.limit is None and self.after is None and self.trends is None
+                and self.cycle_statuses is None and self.min_price is None and self.max_price is None
+                and not self.symbol_prefix and self.sort == "symbol" and not self.descending
+                and self.fields is None)
+
+    @property
+    def key(self):
+        """Hashable form of the query, used to cache results per snapshot."""
+        return (
+            self.limit,
+            tuple(self.after) if self.after else None,
+            tuple(sorted(self.trends)) if self.trends else None,
+            tuple(sorted(self.cycle_statuses)) if self.cycle_statuses else None,
+            self.min_price,
+            self.max_price,
+            self.symbol_prefix,
+            self.sort,
+            self.descending,
+            tuple(self.fields) if self.fields else None,
+        )
+
+    def matches(self, coin):
+        """Check whether a record passes the filters."""
+        if self.symbol_prefix and not coin["symbol"].startswith(self.symbol_prefix):
+            return False
+        if self.trends is not None and (coin.get("trend") or "").lower() not in self.trends:
+            return False
+        if self.cycle_statuses is not None and (coin.get("cycle_status") or "").lower() not in self.cycle_statuses:
+            return False
+        if self.min_price is not None and coin["latest_price"] < self.min_price:
+            return False
+        if self.max_price is not None and coin["latest_price"] > self.max_price:
+            return False
+        return True
+
+    def sort_key(self, coin):
+        """Sort key of a record; the symbol breaks ties so the order is total."""
+        if self.sort == "change":
+            return [percent_change(coin), coin["symbol"]]
+        return [coin["symbol"]]
+
+    def apply(self, coins):
+        """
+        Run the query over a list of records.
+
+        Args:
+            coins: Coin monitor records ordered by symbol
+
+        Returns:
+            tuple: (records, next_cursor) where next_cursor is None on the last page
+        """
+        keyed = [(self.sort_key(coin), coin) for coin in coins if self.matches(coin)]
+        if self.sort != "symbol" or self.descending:
+            keyed.sort(key=lambda item: item[0], reverse=self.descending)
+
+        if self.after is not None:
+            after = self.after
+            if self.descending:
+                keyed = [item for item in keyed if item[0] < after]
+            else:
+                keyed = [item for item in keyed if item[0] > after]
+
+        next_cursor = None
+        if self.limit is not None and len(keyed) > self.limit:
+            keyed = keyed[:self.limit]
+            next_cursor = encode_cursor(keyed[-1][0])
+
+        if self.fields is None:
+            records = [dict(coin) for _, coin in keyed]
+        else:
+            records = [{field: coin[field] for field in self.fields if field in coin} for _, coin in keyed]
+        return records, next_cursor
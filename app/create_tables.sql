@@ -49,4 +49,73 @@ CREATE TABLE IF NOT EXISTS price_history (
 -- Create an index on the symbol and timestamp columns for faster queries
 CREATE INDEX IF NOT EXISTS price_history_symbol_timestamp_idx ON price_history (symbol, timestamp);
 
+-- Completed high/low price cycles, the most recent cycle of a coin has the highest seq
+-- Replaces the low_price_N/high_price_N columns of coin_monitor, which are only read by the migration below
+CREATE TABLE IF NOT EXISTS price_cycles (
+    symbol          TEXT NOT NULL,
+    seq             INTEGER NOT NULL,
+    high            FLOAT NOT NULL,
+    low             FLOAT NOT NULL,
+    closed_at       TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (symbol, seq)
+);
+
+-- Copy the cycles from the legacy columns (only while price_cycles is empty)
+INSERT INTO price_cycles (symbol, seq, high, low)
+SELECT symbol, seq, high, low FROM (
+    SELECT symbol, 10 AS seq, high_price_1 AS high, low_price_1 AS low FROM coin_monitor
+    UNION ALL SELECT symbol, 9 AS seq, high_price_2 AS high, low_price_2 AS low FROM coin_monitor
+    UNION ALL SELECT symbol, 8 AS seq, high_price_3 AS high, low_price_3 AS low FROM coin_monitor
+    UNION ALL SELECT symbol, 7 AS seq, high_price_4 AS high, low_price_4 AS low FROM coin_monitor
+    UNION ALL SELECT symbol, 6 AS seq, high_price_5 AS high, low_price_5 AS low FROM coin_monitor
+    UNION ALL SELECT symbol, 5 AS seq, high_price_6 AS high, low_price_6 AS low FROM coin_monitor
+    UNION ALL SELECT symbol, 4 AS seq, high_price_7 AS high, low_price_7 AS low FROM coin_monitor
+    UNION ALL SELECT symbol, 3 AS seq, high_price_8 AS high, low_price_8 AS low FROM coin_monitor
+    UNION ALL SELECT symbol, 2 AS seq, high_price_9 AS high, low_price_9 AS low FROM coin_monitor
+    UNION ALL SELECT symbol, 1 AS seq, high_price_10 AS high, low_price_10 AS low FROM coin_monitor
+) AS legacy
+WHERE (high <> 0 OR low <> 0 OR seq = 10)
+  AND NOT EXISTS (SELECT 1 FROM price_cycles);
+
+-- Fixed-slot ring buffer used instead of price_history when PRICE_HISTORY_MODE=ring
+-- Each symbol owns 100 slots (slot = seq % 100) that are overwritten with an UPSERT
+CREATE TABLE IF NOT EXISTS price_history_ring (
+    symbol          TEXT NOT NULL,
+    slot            INTEGER NOT NULL,
+    seq             BIGINT NOT NULL,
+    price           FLOAT NOT NULL,
+    timestamp       TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (symbol, slot)
+);
+
+-- OHLC bars of the price ticks in tiers of 1 minute, 5 minutes and 1 hour (resolution in seconds)
+-- bucket is the Unix time of the start of the bar; each tier is trimmed to its own retention
+CREATE TABLE IF NOT EXISTS price_rollups (
+    symbol          TEXT NOT NULL,
+    resolution      INTEGER NOT NULL,
+    bucket          BIGINT NOT NULL,
+    open            FLOAT NOT NULL,
+    high            FLOAT NOT NULL,
+    low             FLOAT NOT NULL,
+    close           FLOAT NOT NULL,
+    ticks           INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (symbol, resolution, bucket)
+);
+
+-- Compaction and retention work on one tier across all symbols
+CREATE INDEX IF NOT EXISTS price_rollups_resolution_bucket_idx ON price_rollups (resolution, bucket);
+
+-- Monitor workers and the shards of symbols they own when MONITOR_SHARD_COUNT is set
+-- Times are Unix timestamps in seconds; a worker or lease past its time is considered dead
+CREATE TABLE IF NOT EXISTS monitor_workers (
+    worker_id       TEXT PRIMARY KEY,
+    heartbeat_at    DOUBLE PRECISION NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS monitor_shard_leases (
+    shard           INTEGER PRIMARY KEY,
+    owner           TEXT,
+    expires_at      DOUBLE PRECISION NOT NULL DEFAULT 0
+);
+
 -- No sample data - all coins will be initialized with current prices from Binance API
@@ -0,0 +1,617 @@
+import functools
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from urllib.parse import quote
+
+# Import PostgreSQL libraries if available
+try:
+    import psycopg2
+    from psycopg2.pool import ThreadedConnectionPool
+    POSTGRES_AVAILABLE = True
+except ImportError:
+    POSTGRES_AVAILABLE = False
+
+# Location of the SQLite fallback database
+SQLITE_DB_PATH = os.getenv('SQLITE_DB_PATH') or os.path.join(os.path.dirname(__file__), 'coin_monitor.db')
+
+# Connection pool configuration
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+
+# SQLite performance mode: WAL journal, tuned pragmas, a single writer thread and read-only readers
+SQLITE_PERFORMANCE_MODE = os.getenv('SQLITE_PERFORMANCE_MODE', 'true').lower() in ('1', 'true', 'yes')
+
+# Performance mode: durability of commits; NORMAL only syncs the WAL at checkpoints
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL').upper()
+
+# Performance mode: bytes of the database file read through memory-mapped I/O
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+
+# Performance mode: page cache size of each connection, in KiB
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', str(64 * 1024)))
+
+# Columns added to coin_monitor after the original schema; older SQLite files
+# are upgraded in place by ensure_sqlite_schema()
+SQLITE_ADDED_COLUMNS = [
+    ("ma7", "REAL DEFAULT 0.0"),
+    ("ma25", "REAL DEFAULT 0.0"),
+    ("ma99", "REAL DEFAULT 0.0"),
+    ("trend", "TEXT DEFAULT 'Neutral'"),
+    ("cycle_status", "TEXT DEFAULT 'Consolidation'"),
+]
+
+# Number of high_price_N/low_price_N column pairs in the original coin_monitor schema
+LEGACY_CYCLE_COUNT = 10
+
+# PostgreSQL schema; every statement is idempotent, so it is run on every startup
+CREATE_TABLES_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'create_tables.sql')
+
+# Advisory lock key serializing the schema upgrade of processes starting at the same time
+SCHEMA_LOCK_KEY = 72716001
+
+def legacy_cycle_migration_sql(count=LEGACY_CYCLE_COUNT):
+    """
+    Build the statement that copies the cycles stored in the legacy coin_monitor columns
+    into price_cycles. It only copies while price_cycles is still empty, so it can be run
+    on every startup. Empty cycles are skipped except the most recent one, which anchors
+    the positions of the others.
+    """
+    selects = "\n            UNION ALL ".join(
+        f"SELECT symbol, {count + 1 - i} AS seq, high_price_{i} AS high, low_price_{i} AS low FROM coin_monitor"
+        for i in range(1, count + 1)
+    )
+    return f"""
+        INSERT INTO price_cycles (symbol, seq, high, low)
+        SELECT symbol, seq, high, low FROM (
+            {selects}
+        ) AS legacy
+        WHERE (high <> 0 OR low <> 0 OR seq = {count})
+          AND NOT EXISTS (SELECT 1 FROM price_cycles)
+    """
+
+class PoolTimeoutError(Exception):
+    """Raised when no database connection becomes available within DB_POOL_TIMEOUT."""
+
+def ensure_sqlite_schema(cursor):
+    """
+    Create the SQLite tables used by the API and the price monitor if they don't exist.
+
+    This mirrors create_tables.sql so that the SQLite fallback supports the same
+    queries as PostgreSQL (moving averages, trend, price_history, price_cycles and price_rollups).
+
+    Args:
+        cursor: SQLite database cursor
+    """
+    # Create the coin_monitor table if it doesn't exist
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS coin_monitor (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            symbol TEXT NOT NULL UNIQUE,
+            initial_price REAL NOT NULL,
+            low_price REAL NOT NULL,
+            high_price REAL NOT NULL,
+            latest_price REAL NOT NULL,
+            low_price_1 REAL DEFAULT 0.0,
+            high_price_1 REAL DEFAULT 0.0,
+            low_price_2 REAL DEFAULT 0.0,
+            high_price_2 REAL DEFAULT 0.0,
+            low_price_3 REAL DEFAULT 0.0,
+            high_price_3 REAL DEFAULT 0.0,
+            low_price_4 REAL DEFAULT 0.0,
+            high_price_4 REAL DEFAULT 0.0,
+            low_price_5 REAL DEFAULT 0.0,
+            high_price_5 REAL DEFAULT 0.0,
+            low_price_6 REAL DEFAULT 0.0,
+            high_price_6 REAL DEFAULT 0.0,
+            low_price_7 REAL DEFAULT 0.0,
+            high_price_7 REAL DEFAULT 0.0,
+            low_price_8 REAL DEFAULT 0.0,
+            high_price_8 REAL DEFAULT 0.0,
+            low_price_9 REAL DEFAULT 0.0,
+            high_price_9 REAL DEFAULT 0.0,
+            low_price_10 REAL DEFAULT 0.0,
+            high_price_10 REAL DEFAULT 0.0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Add columns missing from databases created with the original schema
+    cursor.execute("PRAGMA table_info(coin_monitor)")
+    existing_columns = {row[1] for row in cursor.fetchall()}
+    for column, definition in SQLITE_ADDED_COLUMNS:
+        if column not in existing_columns:
+            try:
+                cursor.execute(f"ALTER TABLE coin_monitor ADD COLUMN {column} {definition}")
+            except sqlite3.OperationalError as e:
+                # Another process starting at the same time added it first
+                if "duplicate column" not in str(e):
+                    raise
+
+    # Create the price_history table used for moving average calculations
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS price_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            symbol TEXT NOT NULL,
+            price REAL NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS price_history_symbol_timestamp_idx
+        ON price_history (symbol, timestamp)
+    ''')
+
+    # Create the price_cycles table and copy over cycles from the legacy columns
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS price_cycles (
+            symbol TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            high REAL NOT NULL,
+            low REAL NOT NULL,
+            closed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (symbol, seq)
+        )
+    ''')
+    cursor.execute(legacy_cycle_migration_sql())
+
+    # Create the fixed-slot ring buffer used when PRICE_HISTORY_MODE=ring
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS price_history_ring (
+            symbol TEXT NOT NULL,
+            slot INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            price REAL NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (symbol, slot)
+        )
+    ''')
+
+    # Create the tiered OHLC bars of the price ticks (see rollups.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS price_rollups (
+            symbol TEXT NOT NULL,
+            resolution INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            open REAL NOT NULL,
+            high REAL NOT NULL,
+            low REAL NOT NULL,
+            close REAL NOT NULL,
+            ticks INTEGER NOT NULL DEFAULT 1,
+            PRIMARY KEY (symbol, resolution, bucket)
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS price_rollups_resolution_bucket_idx
+        ON price_rollups (resolution, bucket)
+    ''')
+
+    # Create the worker and shard lease tables used when MONITOR_SHARD_COUNT is set
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS monitor_workers (
+            worker_id TEXT PRIMARY KEY,
+            heartbeat_at REAL NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS monitor_shard_leases (
+            shard INTEGER PRIMARY KEY,
+            owner TEXT,
+            expires_at REAL NOT NULL DEFAULT 0
+        )
+    ''')
+
+class PoolStats:
+    """Thread-safe checkout counters and timings shared by both pool implementations."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.in_use = 0
+        self.connections_created = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_checkout(self, wait_seconds):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.wait_seconds_total += wait_seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+
+    def record_checkin(self):
+        with self._lock:
+            self.in_use -= 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def record_connection_created(self):
+        with self._lock:
+            self.connections_created += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "in_use": self.in_use,
+                "connections_created": self.connections_created,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_avg": round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0,
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+            }
+
+def postgres_connection_params():
+    """Connection parameters of the PostgreSQL database, from the DB_* environment variables."""
+    return {
+        "user": os.getenv('DB_USER', 'postgres'),
+        "password": os.getenv('DB_PASSWORD', 'postgres'),
+        "host": os.getenv('DB_HOST', 'localhost'),
+        "port": os.getenv('DB_PORT', '5432'),
+        "database": os.getenv('DB_NAME', 'coin_monitor'),
+    }
+
+class PostgresConnectionPool:
+    """
+    Blocking wrapper around psycopg2's ThreadedConnectionPool.
+
+    ThreadedConnectionPool raises as soon as all connections are checked out, so a
+    semaphore makes callers wait up to `timeout` seconds for a free connection instead.
+    """
+
+    backend = "postgresql"
+
+    def __init__(self, minconn, maxconn, timeout):
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.stats = PoolStats()
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._pool = ThreadedConnectionPool(
+            minconn,
+            maxconn,
+            **postgres_connection_params(),
+        )
+        for _ in range(minconn):
+            self.stats.record_connection_created()
+
+        # Databases created by an earlier version only got the tables of its initdb script
+        try:
+            self._create_schema()
+        except Exception as e:
+            logging.error(f"Error upgrading the PostgreSQL schema, continuing with the existing tables: {e}")
+
+    def _create_schema(self):
+        connection = self._pool.getconn()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", (SCHEMA_LOCK_KEY,))
+                with open(CREATE_TABLES_SQL) as sql_file:
+                    cursor.execute(sql_file.read())
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            self._pool.putconn(connection)
+
+    def getconn(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            self.stats.record_timeout()
+            raise PoolTimeoutError(f"No database connection available after {self.timeout} seconds")
+        try:
+            connection = self._pool.getconn()
+            # Replace connections that were closed by the server while idle
+            if connection.closed:
+                self._pool.putconn(connection, close=True)
+                connection = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+        self.stats.record_checkout(time.perf_counter() - start)
+        return connection
+
+    def putconn(self, connection):
+        try:
+            # Never hand out a connection with an open transaction
+            if not connection.closed and connection.status != psycopg2.extensions.STATUS_READY:
+                connection.rollback()
+            self._pool.putconn(connection, close=bool(connection.closed))
+        finally:
+            self.stats.record_checkin()
+            self._slots.release()
+
+    def closeall(self):
+        self._pool.closeall()
+
+    def run_write(self, func, *args, **kwargs):
+        # PostgreSQL handles concurrent writers itself
+        return func(*args, **kwargs)
+
+class SQLiteWriter:
+    """
+    Dedicated thread running the write transactions of the process one at a time.
+
+    SQLite allows a single writer per database, so instead of threads queueing up on the
+    database lock (and failing with "database is locked" once the busy timeout runs out),
+    writes are handed to this thread through a queue and the caller waits for the result.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+        self._thread.start()
+
+    def is_current(self):
+        """Check whether the calling thread is the writer thread."""
+        return threading.current_thread() is self._thread
+
+    def pending(self):
+        """Number of writes waiting in the queue."""
+        return self._queue.qsize()
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Run `func` on the writer thread and wait for it.
+
+        Returns:
+            The return value of `func`; exceptions raised by it are raised here
+        """
+        if self.is_current():
+            return func(*args, **kwargs)
+        if not self._thread.is_alive():
+            raise RuntimeError("The SQLite writer thread is stopped")
+        future = Future()
+        self._queue.put((future, func, args, kwargs))
+        return future.result()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            future, func, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def stop(self):
+        """Finish the queued writes and stop the thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=DB_POOL_TIMEOUT)
+
+class SQLiteConnectionPool:
+    """
+    Per-thread cached SQLite connections.
+
+    SQLite connections can't be shared between threads, so each thread keeps one
+    connection for its lifetime. Nested checkouts in the same thread return the same
+    connection, and uncommitted work is only rolled back by the outermost checkout.
+
+    In performance mode the database runs in WAL mode, where readers don't block the
+    writer or each other. Writes go through a SQLiteWriter (see run_write) that owns the
+    only read-write connection; every other thread gets a read-only connection.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, db_path, performance=SQLITE_PERFORMANCE_MODE):
+        self.db_path = db_path
+        self.performance = performance
+        self.stats = PoolStats()
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._writer = SQLiteWriter() if performance else None
+
+        # Create the schema once instead of on every connection
+        self.run_write(self._create_schema)
+
+    def _create_schema(self):
+        connection = self.getconn()
+        try:
+            cursor = connection.cursor()
+            if self.performance:
+                # The journal mode is stored in the database file, for all connections
+                cursor.execute("PRAGMA journal_mode=WAL")
+            ensure_sqlite_schema(cursor)
+            connection.commit()
+            cursor.close()
+        finally:
+            self.putconn(connection)
+
+    def _connect(self):
+        if self.performance and not self._writer.is_current():
+            # Readers can't take the write lock by accident
+            uri = f"file:{quote(os.path.abspath(self.db_path))}?mode=ro"
+            connection = sqlite3.connect(uri, uri=True, timeout=DB_POOL_TIMEOUT)
+        else:
+            connection = sqlite3.connect(self.db_path, timeout=DB_POOL_TIMEOUT)
+        if self.performance:
+            connection.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+            connection.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+            if self._writer.is_current():
+                connection.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+                connection.execute("PRAGMA temp_store=MEMORY")
+        with self._lock:
+            self._connections.append(connection)
+        self.stats.record_connection_created()
+        return connection
+
+    def run_write(self, func, *args, **kwargs):
+        """Run `func` on the writer thread in performance mode, otherwise in the calling thread."""
+        if self._writer is None:
+            return func(*args, **kwargs)
+        return self._writer.submit(func, *args, **kwargs)
+
+    def pending_writes(self):
+        return self._writer.pending() if self._writer is not None else 0
+
+    def _close_thread_connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def getconn(self):
+        start = time.perf_counter()
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+            self._local.depth = 0
+        self._local.depth += 1
+        self.stats.record_checkout(time.perf_counter() - start)
+        return connection
+
+    def putconn(self, connection):
+        self._local.depth -= 1
+        if self._local.depth == 0 and connection.in_transaction:
+            connection.rollback()
+        self.stats.record_checkin()
+
+    def closeall(self):
+        if self._writer is not None:
+            # The writer's connection can only be closed on its own thread
+            self._writer.submit(self._close_thread_connection)
+            self._writer.stop()
+        with self._lock:
+            for connection in self._connections:
+                try:
+                    connection.close()
+                except sqlite3.ProgrammingError:
+                    # Connections created in other threads can only be closed there
+                    pass
+            self._connections = []
+        self._local = threading.local()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_connection_pool():
+    """
+    Return the process-wide connection pool, creating it on first use.
+
+    PostgreSQL is used when psycopg2 is installed and DB_HOST is set, otherwise
+    (or if PostgreSQL can't be reached) the SQLite database is used.
+    """
+    global _pool
+    if _pool is not None:
+        return _pool
+
+    with _pool_lock:
+        if _pool is None:
+            if POSTGRES_AVAILABLE and os.getenv('DB_HOST'):
+                try:
+                    _pool = PostgresConnectionPool(DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT)
+                    logging.info(f"Created PostgreSQL connection pool (min={DB_POOL_MIN}, max={DB_POOL_MAX}).")
+                except Exception as e:
+                    logging.error(f"Error connecting to PostgreSQL database: {e}")
+                    logging.info("Falling back to SQLite database.")
+
+            if _pool is None:
+                _pool = SQLiteConnectionPool(SQLITE_DB_PATH)
+                logging.info("Created SQLite connection pool.")
+    return _pool
+
+def close_connection_pool():
+    """Close all pooled connections, e.g. when the application shuts down."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+def get_pool_stats():
+    """
+    Get connection pool usage and checkout timing statistics.
+
+    Returns:
+        dict: Backend name, pool size and checkout counters
+    """
+    pool = get_connection_pool()
+    stats = pool.stats.as_dict()
+    stats["backend"] = pool.backend
+    stats["max_connections"] = getattr(pool, "maxconn", None)
+    stats["pending_writes"] = getattr(pool, "pending_writes", lambda: 0)()
+    return stats
+
+def run_write(func, *args, **kwargs):
+    """
+    Run a function that writes to the database.
+
+    With the SQLite backend in performance mode, it runs on the pool's writer thread
+    (see SQLiteWriter) and this call waits for it, so its db_connection() checkouts get
+    the read-write connection. Otherwise it runs in the calling thread.
+
+    Returns:
+        The return value of `func`
+    """
+    return get_connection_pool().run_write(func, *args, **kwargs)
+
+def serialized_write(func):
+    """Decorator running the decorated function through run_write()."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return run_write(func, *args, **kwargs)
+    return wrapper
+
+@contextmanager
+def db_connection():
+    """
+    Check out a pooled database connection.
+
+    Usage:
+        with db_connection() as (connection, cursor):
+            cursor.execute(...)
+            connection.commit()
+
+    Uncommitted work is rolled back when the block raises, and the connection is
+    always returned to the pool.
+    """
+    pool = get_connection_pool()
+    connection = pool.getconn()
+    try:
+        cursor = connection.cursor()
+        try:
+            yield connection, cursor
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+    finally:
+        pool.putconn(connection)
+
+def symbol_filter(connection, symbols, column="symbol"):
+    """
+    Build a WHERE condition matching a list of symbols in a single query.
+
+    Args:
+        connection: Database connection
+        symbols: List of symbols
+        column: Column to compare
+
+    Returns:
+        tuple: (condition, params) using `= ANY(%s)` on PostgreSQL; on SQLite the symbols
+        are passed as one JSON array read with json_each(), so any number of symbols
+        stays within SQLite's limit on query variables (999 on older builds)
+    """
+    symbols = list(symbols)
+    if POSTGRES_AVAILABLE and isinstance(connection, psycopg2.extensions.connection):
+        return f"{column} = ANY(%s)", [symbols]
+    return f"{column} IN (SELECT value FROM json_each(?))", [json.dumps(symbols)]
@@ -0,0 +1,225 @@
+"""
+Local stand-in for the parts of the Binance API used by the price monitor.
+
+Serves a random-walk market on a single port:
+    GET /api/v3/ticker/price[?symbol=XYZ|?symbols=[...]]          - REST ticker prices
+    GET /api/v3/trades?symbol=XYZ[&limit=N]                       - recent trades
+    GET /api/v3/aggTrades?symbol=XYZ[&fromId=N|&startTime=T][&limit=N] - aggregate trades
+    WS  /ws/!miniTicker@arr                                       - all-market mini-ticker stream
+
+Usage:
+    python -m app.fake_exchange --port 8765 --symbols 200
+
+    BINANCE_API_URL=http://localhost:8765
+    BINANCE_WS_URL=ws://localhost:8765/ws/!miniTicker@arr
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import deque
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlparse
+
+import websockets
+
+from .rate_limit import request_weight
+
+# Trades kept per symbol, like the maximum limit of the trades endpoints
+TRADE_LOG_SIZE = 1000
+
+class FakeMarket:
+    """Random-walk prices and trades for a set of symbols."""
+
+    def __init__(self, symbol_count=100, quote_assets=("USDT",), volatility=0.002, seed=None, trade_rate=5.0):
+        self.random = random.Random(seed)
+        self.volatility = volatility
+        self.trade_rate = trade_rate
+        self.prices = {}
+        for i in range(symbol_count):
+            quote = quote_assets[i % len(quote_assets)]
+            self.prices[f"COIN{i}{quote}"] = round(self.random.uniform(0.01, 1000.0), 8)
+        # Trades are generated lazily per symbol, when they are first requested
+        self.trade_logs = {}
+        self.trade_clock = {}
+        self.next_trade_id = 1
+
+    def step(self, fraction=0.5):
+        """
+        Move a random fraction of the symbols and return the ones that changed.
+
+        Returns:
+            dict: symbol -> new price
+        """
+        changed = {}
+        for symbol, price in self.prices.items():
+            if self.random.random() < fraction:
+                price = round(price * (1 + self.random.gauss(0, self.volatility)), 8)
+                self.prices[symbol] = changed[symbol] = price
+        return changed
+
+    def ticker(self, symbol=None, symbols=None):
+        """Prices in the format of GET /api/v3/ticker/price; None if a symbol is unknown."""
+        if symbol is not None:
+            if symbol not in self.prices:
+                return None
+            return {"symbol": symbol, "price": f"{self.prices[symbol]:.8f}"}
+        if symbols is not None:
+            if any(s not in self.prices for s in symbols):
+                return None
+            return [{"symbol": s, "price": f"{self.prices[s]:.8f}"} for s in symbols]
+        return [{"symbol": s, "price": f"{p:.8f}"} for s, p in self.prices.items()]
+
+    def _generate_trades(self, symbol):
+        # Generate the trades since the symbol was last requested (the last minute on first use)
+        now_ms = int(time.time() * 1000)
+        last_ms = self.trade_clock.get(symbol, now_ms - 60000)
+        log = self.trade_logs.setdefault(symbol, deque(maxlen=TRADE_LOG_SIZE))
+        count = int((now_ms - last_ms) / 1000 * self.trade_rate * self.random.uniform(0.5, 1.5))
+        price = self.prices[symbol]
+        for trade_time in sorted(self.random.randint(last_ms + 1, now_ms) for _ in range(count)):
+            log.append({
+                "id": self.next_trade_id,
+                "price": round(price * (1 + self.random.gauss(0, self.volatility / 10)), 8),
+                "qty": round(self.random.expovariate(1.0) * 10, 4),
+                "time": trade_time,
+                "isBuyerMaker": self.random.random() < 0.5,
+            })
+            self.next_trade_id += 1
+        self.trade_clock[symbol] = now_ms
+        return log
+
+    def trades(self, symbol, limit=500):
+        """The most recent trades in the format of GET /api/v3/trades, oldest first."""
+        if symbol not in self.prices:
+            return None
+        log = list(self._generate_trades(symbol))[-limit:]
+        return [
+            {"id": t["id"], "price": f"{t['price']:.8f}", "qty": f"{t['qty']:.8f}",
+             "quoteQty": f"{t['price'] * t['qty']:.8f}", "time": t["time"],
+             "isBuyerMaker": t["isBuyerMaker"], "isBestMatch": True}
+            for t in log
+        ]
+
+    def agg_trades(self, symbol, from_id=None, start_time=None, limit=500):
+        """
+        Trades in the format of GET /api/v3/aggTrades, oldest first; every trade is its own
+        aggregate. Without fromId or startTime the most recent trades are returned.
+        """
+        if symbol not in self.prices:
+            return None
+        log = list(self._generate_trades(symbol))
+        if from_id is not None:
+            log = [t for t in log if t["id"] >= from_id][:limit]
+        elif start_time is not None:
+            log = [t for t in log if t["time"] >= start_time][:limit]
+        else:
+            log = log[-limit:]
+        return [
+            {"a": t["id"], "p": f"{t['price']:.8f}", "q": f"{t['qty']:.8f}", "f": t["id"], "l": t["id"],
+             "T": t["time"], "m": t["isBuyerMaker"], "M": True}
+            for t in log
+        ]
+
+    def mini_tickers(self, prices):
+        """Prices in the format of the !miniTicker@arr stream."""
+        event_time = int(time.time() * 1000)
+        return [
+            {"e": "24hrMiniTicker", "E": event_time, "s": symbol, "c": f"{price:.8f}",
+             "o": f"{price:.8f}", "h": f"{price:.8f}", "l": f"{price:.8f}", "v": "0", "q": "0"}
+            for symbol, price in prices.items()
+        ]
+
+class FakeExchange:
+    """WebSocket and REST server publishing a FakeMarket."""
+
+    def __init__(self, market, interval=1.0, weight_limit=6000):
+        self.market = market
+        self.interval = interval
+        self.clients = set()
+        # Request weight per minute, reported and enforced like Binance does
+        self.weight_limit = weight_limit
+        self.weight_minute = None
+        self.used_weight = 0
+
+    def _use_weight(self, path, query):
+        minute = int(time.time() // 60)
+        if minute != self.weight_minute:
+            self.weight_minute = minute
+            self.used_weight = 0
+        self.used_weight += request_weight(path, query)
+        return [("X-MBX-USED-WEIGHT-1M", str(self.used_weight))]
+
+    def process_request(self, path, request_headers):
+        # Plain HTTP requests are answered here, WebSocket upgrades continue to the handler.
+        # This is the (path, request_headers) hook of the legacy server, hence websockets<13
+        if request_headers.get("Upgrade", "").lower() == "websocket":
+            return None
+
+        url = urlparse(path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        weight_headers = self._use_weight(url.path, query)
+        if self.used_weight > self.weight_limit:
+            retry_after = 60 - int(time.time() % 60)
+            headers = [("Content-Type", "application/json"), ("Retry-After", str(retry_after))] + weight_headers
+            return HTTPStatus.TOO_MANY_REQUESTS, headers, b'{"code": -1003, "msg": "Too many requests."}'
+
+        symbol = query.get("symbol")
+        limit = min(int(query.get("limit", 500)), TRADE_LOG_SIZE)
+        if url.path == "/api/v3/ticker/price":
+            symbols = json.loads(query["symbols"]) if "symbols" in query else None
+            body = self.market.ticker(symbol, symbols)
+        elif url.path == "/api/v3/trades":
+            body = self.market.trades(symbol, limit)
+        elif url.path == "/api/v3/aggTrades":
+            from_id = int(query["fromId"]) if "fromId" in query else None
+            start_time = int(query["startTime"]) if "startTime" in query else None
+            body = self.market.agg_trades(symbol, from_id, start_time, limit)
+        else:
+            return HTTPStatus.NOT_FOUND, [("Content-Type", "application/json")], b'{"code": -1, "msg": "Not found"}'
+
+        if body is None:
+            return HTTPStatus.BAD_REQUEST, [("Content-Type", "application/json")] + weight_headers, b'{"code": -1121, "msg": "Invalid symbol."}'
+        return HTTPStatus.OK, [("Content-Type", "application/json")] + weight_headers, json.dumps(body).encode()
+
+    async def handler(self, websocket):
+        self.clients.add(websocket)
+        try:
+            # Like Binance, start with the full market so clients don't wait for every symbol to move
+            await websocket.send(json.dumps(self.market.mini_tickers(self.market.prices)))
+            await websocket.wait_closed()
+        finally:
+            self.clients.discard(websocket)
+
+    async def publish(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            changed = self.market.step()
+            if changed and self.clients:
+                websockets.broadcast(self.clients, json.dumps(self.market.mini_tickers(changed)))
+
+    async def serve(self, host, port):
+        async with websockets.serve(self.handler, host, port, process_request=self.process_request, max_size=None):
+            logging.info(f"Fake exchange listening on {host}:{port} with {len(self.market.prices)} symbols")
+            await self.publish()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Binance ticker and trade APIs and mini-ticker stream")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--symbols", type=int, default=100, help="Number of symbols in the market")
+    parser.add_argument("--quote-assets", default="USDT", help="Comma-separated quote assets of the symbols")
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between stream messages")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--weight-limit", type=int, default=6000, help="Request weight per minute before answering 429")
+    parser.add_argument("--trade-rate", type=float, default=5.0, help="Average trades per second and symbol")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    market = FakeMarket(args.symbols, tuple(args.quote_assets.split(",")), seed=args.seed, trade_rate=args.trade_rate)
+    asyncio.run(FakeExchange(market, args.interval, args.weight_limit).serve(args.host, args.port))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import tick_metrics
+from .rate_limit import PRIORITY_MONITOR, PRIORITY_USER, request_weight, weight_governor
+
+# Import the async HTTP client if available
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+# Base URL of the Binance REST API (can point at app.fake_exchange for offline testing)
+BINANCE_API_URL = os.getenv('BINANCE_API_URL', 'https://api.binance.com').rstrip('/')
+
+# Timeout of outbound requests in seconds
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '10'))
+
+# Keep-alive connections kept open to the API host
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '10'))
+
+# Seconds a successful response is reused for identical requests (0 only coalesces concurrent ones)
+BINANCE_CACHE_TTL = float(os.getenv('BINANCE_CACHE_TTL', '1'))
+
+# Number of cached responses above which expired entries are purged
+BINANCE_CACHE_PURGE_SIZE = 1024
+
+_session = None
+_async_client = None
+_client_lock = threading.Lock()
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Coalesces identical outbound requests.
+
+    Concurrent calls with the same key share one in-flight request, and its result is
+    reused for `ttl` seconds. Errors are passed to every waiting caller but never cached.
+    Results are shared between callers, so they must not be modified.
+
+    Async requests run in their own task, which every caller (including the one that
+    started it) awaits through a shield, so a cancelled caller doesn't cancel the others.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = {}
+        self._cache = {}
+        self.requests = 0
+        self.shared = 0
+        self.cache_hits = 0
+
+    def _cached(self, key):
+        # Must be called with the lock held
+        entry = self._cache.get(key)
+        if entry is None:
+            return False, None
+        if entry[0] <= time.monotonic():
+            del self._cache[key]
+            return False, None
+        self.cache_hits += 1
+        return True, entry[1]
+
+    def _store(self, key, result, ttl):
+        # Must be called with the lock held
+        if ttl <= 0:
+            return
+        now = time.monotonic()
+        if len(self._cache) >= BINANCE_CACHE_PURGE_SIZE:
+            self._cache = {k: entry for k, entry in self._cache.items() if entry[0] > now}
+        self._cache[key] = (now + ttl, result)
+
+    def do(self, key, func, ttl):
+        """
+        Call `func`, unless an identical call is in flight or was made in the last `ttl` seconds.
+
+        Args:
+            key: Hashable identity of the request
+            func: Callable making the request
+            ttl: Seconds the result is reused
+
+        Returns:
+            The result of `func` or of the shared call
+        """
+        with self._lock:
+            hit, result = self._cached(key)
+            if hit:
+                return result
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.requests += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            # Also hand KeyboardInterrupt etc. to the waiters, rather than a None result
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                if call.error is None:
+                    self._store(key, call.result, ttl)
+            call.done.set()
+        return call.result
+
+    async def do_async(self, key, func, ttl):
+        """
+        Async version of do(); `func` returns an awaitable. Must be called on one event loop.
+        """
+        with self._lock:
+            hit, result = self._cached(key)
+            if hit:
+                return result
+            task = self._async_calls.get(key)
+            if task is None:
+                task = self._async_calls[key] = asyncio.get_running_loop().create_task(self._run_async(key, func, ttl))
+                task.add_done_callback(_retrieve_exception)
+                self.requests += 1
+            else:
+                self.shared += 1
+
+        # Shield the shared task, so a cancelled caller doesn't cancel the other callers
+        return await asyncio.shield(task)
+
+    async def _run_async(self, key, func, ttl):
+        try:
+            result = await func()
+        except BaseException:
+            with self._lock:
+                del self._async_calls[key]
+            raise
+        with self._lock:
+            del self._async_calls[key]
+            self._store(key, result, ttl)
+        return result
+
+    def stats(self):
+        """Counters of requests made, requests that shared an in-flight call and cache hits."""
+        with self._lock:
+            return {"requests": self.requests, "shared": self.shared, "cache_hits": self.cache_hits}
+
+def _retrieve_exception(task):
+    # Mark the exception as retrieved in case every caller was cancelled
+    if not task.cancelled():
+        task.exception()
+
+# Single-flight layer shared by all outbound Binance calls
+binance_single_flight = SingleFlight()
+
+def _request_key(path, params, priority):
+    # Callers of different priorities don't share calls: the call would acquire its weight
+    # with the priority, wait limit and shedding of whichever caller started it
+    return path, tuple(sorted((params or {}).items())), priority
+
+def get_http_session():
+    """
+    Return the process-wide requests session, creating it on first use.
+
+    The session keeps connections to the API host alive, so repeated calls don't pay
+    for a new TCP and TLS handshake every time.
+    """
+    global _session
+    if _session is not None:
+        return _session
+
+    with _client_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+    return _session
+
+def get_async_client():
+    """
+    Return the process-wide httpx.AsyncClient, creating it on first use.
+
+    The client is bound to the event loop it is first used on, so it should only be
+    used from the FastAPI event loop.
+    """
+    global _async_client
+    if not HTTPX_AVAILABLE:
+        raise RuntimeError("The httpx package is required for the async HTTP client")
+
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(max_keepalive_connections=HTTP_POOL_SIZE, max_connections=HTTP_POOL_SIZE),
+        )
+    return _async_client
+
+def _decode(response, priority, started):
+    """Decode a JSON response, timing the fetch and decode phases of monitor requests."""
+    if priority != PRIORITY_MONITOR:
+        return response.json()
+    fetched = time.perf_counter()
+    data = response.json()
+    tick_metrics.observe("fetch", fetched - started)
+    tick_metrics.observe("decode", time.perf_counter() - fetched)
+    return data
+
+def _binance_get(path, params, priority):
+    weight_governor.acquire(request_weight(path, params), priority)
+    # Waiting for the governor isn't part of the fetch phase
+    started = time.perf_counter()
+    response = get_http_session().get(f'{BINANCE_API_URL}{path}', params=params, timeout=HTTP_TIMEOUT)
+    weight_governor.observe(response.status_code, response.headers)
+    response.raise_for_status()
+    return _decode(response, priority, started)
+
+def binance_get(path, params=None, cache_ttl=None, priority=PRIORITY_USER):
+    """
+    Send a GET request to the Binance REST API over the shared session.
+
+    Identical concurrent requests of the same priority share one call, and its result
+    is reused for BINANCE_CACHE_TTL seconds. The returned data may be shared with other callers
+    and must not be modified. Every request draws its weight from the shared
+    weight governor first.
+
+    Args:
+        path: Endpoint path, e.g. "/api/v3/ticker/price"
+        params: Optional query parameters
+        cache_ttl: Seconds to reuse the result, BINANCE_CACHE_TTL if not given
+        priority: PRIORITY_MONITOR for the price tick, PRIORITY_USER (default) otherwise
+
+    Returns:
+        The decoded JSON response
+
+    Raises:
+        requests.exceptions.HTTPError: If the API returns an error status
+        RateLimitExceeded: If the request was shed to stay below the weight limit
+    """
+    ttl = BINANCE_CACHE_TTL if cache_ttl is None else cache_ttl
+    return binance_single_flight.do(
+        _request_key(path, params, priority), lambda: _binance_get(path, params, priority), ttl
+    )
+
+async def _binance_get_async(path, params, priority):
+    await weight_governor.acquire_async(request_weight(path, params), priority)
+    # Waiting for the governor isn't part of the fetch phase
+    started = time.perf_counter()
+    response = await get_async_client().get(f'{BINANCE_API_URL}{path}', params=params)
+    weight_governor.observe(response.status_code, response.headers)
+    response.raise_for_status()
+    return _decode(response, priority, started)
+
+async def binance_get_async(path, params=None, cache_ttl=None, priority=PRIORITY_USER):
+    """
+    Async version of binance_get() using the shared httpx client.
+
+    Falls back to the shared requests session in a worker thread when httpx isn't installed.
+
+    Args:
+        path: Endpoint path, e.g. "/api/v3/ticker/price"
+        params: Optional query parameters
+        cache_ttl: Seconds to reuse the result, BINANCE_CACHE_TTL if not given
+        priority: PRIORITY_MONITOR for the price tick, PRIORITY_USER (default) otherwise
+
+    Returns:
+        The decoded JSON response
+    """
+    if not HTTPX_AVAILABLE:
+        return await asyncio.to_thread(binance_get, path, params, cache_ttl, priority)
+
+    ttl = BINANCE_CACHE_TTL if cache_ttl is None else cache_ttl
+    return await binance_single_flight.do_async(
+        _request_key(path, params, priority), lambda: _binance_get_async(path, params, priority), ttl
+    )
+
+def close_http_session():
+    """Close the shared requests session."""
+    global _session
+    with _client_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+async def close_http_clients():
+    """Close the shared requests session and httpx client, e.g. when the application shuts down."""
+    global _async_client
+    close_http_session()
+    if _async_client is not None:
+        client, _async_client = _async_client, None
+        try:
+            await client.aclose()
+        except Exception as e:
+            logging.error(f"Error closing async HTTP client: {e}")
@@ -0,0 +1,209 @@
+import logging
+import threading
+
+from .moving_averages import MOVING_AVERAGE_PERIODS
+
+# Import NumPy if available
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Cycle status labels, indexed by the status codes computed in identify_trends()
+CYCLE_STATUSES = [
+    "Consolidation",
+    "UP Cycle – bullish momentum",
+    "Begin Up Cycle – Possible Buy Zone",
+    "Exit Long Position",
+    "DOWN Cycle – bearish momentum",
+    "Begin Down Cycle – Possible Sell Zone",
+    "Exit Short Position",
+]
+
+# Macro trend suffixes added by the MA(99) filter
+MA99_SUFFIXES = [
+    "",
+    " (Above MA99: Prioritize long trades)",
+    " (Below MA99: Prioritize short trades)",
+]
+
+TRENDS = ["Neutral", "UP", "DOWN"]
+
+def identify_trends(prices, ma7, ma25, ma99):
+    """
+    Vectorized version of identify_trend() for many symbols at once.
+
+    Args:
+        prices: Array of current prices
+        ma7: Array of 7-period moving averages
+        ma25: Array of 25-period moving averages
+        ma99: Array of 99-period moving averages
+
+    Returns:
+        tuple: (trends, cycle_statuses) - Lists of strings, one per symbol
+    """
+    # MAs of zero mean there isn't enough data for meaningful calculations
+    enough_data = (ma7 != 0) & (ma25 != 0)
+    safe_ma25 = np.where(ma25 != 0, ma25, 1.0)
+    ma_diff_percent = np.abs(ma7 - ma25) / safe_ma25 * 100
+    close_mas = ma_diff_percent < 0.5
+
+    up = enough_data & (prices > ma7) & (ma7 > ma25)
+    down = enough_data & ~up & (prices < ma7) & (ma7 < ma25)
+
+    # Later conditions take precedence, like the sequential checks in identify_trend()
+    up_status = np.where(close_mas, 2, 1)
+    up_status = np.where(prices <= ma25 * 1.01, 3, up_status)
+    down_status = np.where(close_mas, 5, 4)
+    down_status = np.where(prices >= ma25 * 0.99, 6, down_status)
+    status = np.select([up, down], [up_status, down_status], default=0)
+    trend = np.select([up, down], [1, 2], default=0)
+
+    # Apply MA(99) as the macro trend filter
+    suffix = np.select(
+        [(ma99 > 0) & (prices > ma99) & down, (ma99 > 0) & (prices < ma99) & up],
+        [1, 2],
+        default=0
+    )
+
+    trends = [TRENDS[code] for code in trend.tolist()]
+    cycle_statuses = [
+        CYCLE_STATUSES[status_code] + MA99_SUFFIXES[suffix_code]
+        for status_code, suffix_code in zip(status.tolist(), suffix.tolist())
+    ]
+    return trends, cycle_statuses
+
+class VectorIndicatorEngine:
+    """
+    Columnar indicator engine holding the recent prices of every symbol in one 2-D array.
+
+    Prices are stored in a (symbols x window) ring buffer with a write position per
+    symbol, and the running sum of each moving average period is kept in its own
+    column vector. Updating all symbols of a tick is a handful of NumPy operations,
+    independent of how many symbols are monitored.
+    """
+
+    def __init__(self, periods=MOVING_AVERAGE_PERIODS):
+        self.periods = tuple(periods)
+        self.depth = max(self.periods)
+        self._lock = threading.Lock()
+        self.loaded = False
+        self._reset(0)
+
+    def _reset(self, capacity):
+        self._index = {}
+        self._prices = np.zeros((capacity, self.depth))
+        self._heads = np.zeros(capacity, dtype=np.int64)
+        self._counts = np.zeros(capacity, dtype=np.int64)
+        self._sums = np.zeros((len(self.periods), capacity))
+        self._updates_since_resync = 0
+
+    def _rows_for(self, symbols):
+        """Map symbols to rows, adding rows (with amortized growth) for new symbols."""
+        rows = np.empty(len(symbols), dtype=np.int64)
+        for i, symbol in enumerate(symbols):
+            row = self._index.get(symbol)
+            if row is None:
+                row = self._index[symbol] = len(self._index)
+            rows[i] = row
+
+        needed = len(self._index)
+        capacity = self._prices.shape[0]
+        if needed > capacity:
+            new_capacity = max(needed, capacity * 2, 64)
+            grow = new_capacity - capacity
+            self._prices = np.vstack([self._prices, np.zeros((grow, self.depth))])
+            self._heads = np.concatenate([self._heads, np.zeros(grow, dtype=np.int64)])
+            self._counts = np.concatenate([self._counts, np.zeros(grow, dtype=np.int64)])
+            self._sums = np.hstack([self._sums, np.zeros((len(self.periods), grow))])
+        return rows
+
+    def _resync_sums(self):
+        """Recompute the running sums exactly to discard accumulated floating point error."""
+        rows = np.arange(len(self._index))
+        if len(rows) == 0:
+            return
+        heads = self._heads[rows]
+        counts = self._counts[rows]
+        for p, period in enumerate(self.periods):
+            offsets = np.arange(1, period + 1)
+            columns = (heads[:, None] - offsets[None, :]) % self.depth
+            values = self._prices[rows[:, None], columns]
+            values = np.where(offsets[None, :] <= counts[:, None], values, 0.0)
+            self._sums[p, rows] = values.sum(axis=1)
+        self._updates_since_resync = 0
+
+    def rebuild(self, prices_by_symbol):
+        """
+        Replace all windows with the given price history.
+
+        Args:
+            prices_by_symbol: dict of symbol -> list of prices, newest first
+        """
+        with self._lock:
+            self._reset(len(prices_by_symbol))
+            symbols = list(prices_by_symbol)
+            rows = self._rows_for(symbols)
+            for row, symbol in zip(rows.tolist(), symbols):
+                prices = prices_by_symbol[symbol][:self.depth]
+                count = len(prices)
+                # Oldest price goes into slot 0, the next write position is `count`
+                self._prices[row, :count] = prices[::-1]
+                self._heads[row] = count % self.depth
+                self._counts[row] = count
+            self._resync_sums()
+            self.loaded = True
+        logging.info(f"Rebuilt vectorized indicators for {len(prices_by_symbol)} symbols")
+
+    def invalidate(self):
+        """Force a rebuild from the database before the next update."""
+        with self._lock:
+            self.loaded = False
+
+    def update_many(self, symbols, prices):
+        """
+        Add one new price for each symbol and compute all indicators.
+
+        Args:
+            symbols: List of coin symbols
+            prices: List of new prices, in the same order
+
+        Returns:
+            list: (ma7, ma25, ma99, trend, cycle_status) tuples, in the order of `symbols`
+        """
+        if not symbols:
+            return []
+
+        with self._lock:
+            rows = self._rows_for(symbols)
+            new_prices = np.asarray(prices, dtype=float)
+            heads = self._heads[rows]
+            counts = self._counts[rows]
+
+            # Remove the prices leaving each window before overwriting the oldest slot
+            for p, period in enumerate(self.periods):
+                leaving = self._prices[rows, (heads - period) % self.depth]
+                leaving = np.where(counts >= period, leaving, 0.0)
+                self._sums[p, rows] += new_prices - leaving
+
+            self._prices[rows, heads] = new_prices
+            self._heads[rows] = (heads + 1) % self.depth
+            counts = np.minimum(counts + 1, self.depth)
+            self._counts[rows] = counts
+
+            self._updates_since_resync += 1
+            if self._updates_since_resync >= self.depth:
+                self._resync_sums()
+
+            averages = []
+            for p, period in enumerate(self.periods):
+                average = self._sums[p, rows] / np.minimum(counts, period)
+                # Windows holding the same prices must agree exactly, not just to the last bit
+                if p > 0:
+                    average = np.where(counts <= self.periods[p - 1], averages[-1], average)
+                averages.append(average)
+
+        ma7, ma25, ma99 = averages
+        trends, cycle_statuses = identify_trends(new_prices, ma7, ma25, ma99)
+        return list(zip(ma7.tolist(), ma25.tolist(), ma99.tolist(), trends, cycle_statuses))
@@ -0,0 +1,201 @@
+import logging
+import os
+import time
+
+from .database import SQLITE_DB_PATH, get_connection_pool, postgres_connection_params
+from .sharding import shard_coordinator
+
+# Import PostgreSQL libraries if available
+try:
+    import psycopg2
+    POSTGRES_AVAILABLE = True
+except ImportError:
+    POSTGRES_AVAILABLE = False
+
+# Import fcntl (POSIX only) for the SQLite lock file
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+# Elect a single process to run the price monitor; the others only serve the API
+MONITOR_LEADER_ELECTION = os.getenv('MONITOR_LEADER_ELECTION', 'true').lower() in ('1', 'true', 'yes')
+
+# Seconds between leadership attempts of a follower, and between lock checks of the leader
+LEADER_RETRY_INTERVAL = float(os.getenv('LEADER_RETRY_INTERVAL', '5'))
+
+# Seconds between checks of a follower for new prices written by the leader
+FOLLOWER_REFRESH_INTERVAL = float(os.getenv('FOLLOWER_REFRESH_INTERVAL', '1'))
+
+# Key of the PostgreSQL advisory lock held by the leader
+LEADER_LOCK_ID = int(os.getenv('LEADER_LOCK_ID', '72541'))
+
+# Lock file held by the leader when the SQLite database is used
+LEADER_LOCK_PATH = SQLITE_DB_PATH + '.leader'
+
+class AdvisoryLock:
+    """
+    Session-level PostgreSQL advisory lock on a dedicated connection.
+
+    The lock belongs to the connection rather than the pool, so it is released by the
+    server as soon as the leader process dies or its connection drops.
+    """
+
+    def __init__(self, lock_id=LEADER_LOCK_ID):
+        self.lock_id = lock_id
+        self._connection = None
+        self._held = False
+
+    def _close(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+        self._connection = None
+        self._held = False
+
+    def try_acquire(self):
+        """Take the lock if no other process holds it. Returns True if it is held."""
+        if self._held:
+            return True
+        try:
+            if self._connection is None or self._connection.closed:
+                self._connection = psycopg2.connect(**postgres_connection_params())
+                self._connection.autocommit = True
+            with self._connection.cursor() as cursor:
+                cursor.execute("SELECT pg_try_advisory_lock(%s)", (self.lock_id,))
+                self._held = bool(cursor.fetchone()[0])
+        except Exception as e:
+            logging.error(f"Error acquiring leader lock: {e}")
+            self._close()
+        return self._held
+
+    def is_held(self):
+        """Check that the lock connection is still alive, and with it the lock."""
+        if not self._held:
+            return False
+        try:
+            with self._connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        except Exception as e:
+            logging.error(f"Leader lock connection lost: {e}")
+            self._close()
+        return self._held
+
+    def release(self):
+        if self._held:
+            try:
+                with self._connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_unlock(%s)", (self.lock_id,))
+            except Exception as e:
+                logging.error(f"Error releasing leader lock: {e}")
+        self._close()
+
+class FileLock:
+    """
+    Exclusive flock() on a lock file next to the SQLite database.
+
+    The operating system releases the lock when the leader process exits, so it works
+    for all the processes sharing the database file on one host.
+    """
+
+    def __init__(self, path=LEADER_LOCK_PATH):
+        self.path = path
+        self._file = None
+
+    def try_acquire(self):
+        """Take the lock if no other process holds it. Returns True if it is held."""
+        if self._file is not None:
+            return True
+        try:
+            lock_file = open(self.path, 'a+')
+        except OSError as e:
+            logging.error(f"Error opening leader lock file {self.path}: {e}")
+            return False
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        # Record the leader's pid for whoever looks at the file
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(f"{os.getpid()}\n")
+        lock_file.flush()
+        self._file = lock_file
+        return True
+
+    def is_held(self):
+        return self._file is not None
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+class LeaderElection:
+    """
+    Decides which of the API processes sharing a database runs the price monitor.
+
+    Every process campaigns for a lock (see AdvisoryLock and FileLock); the one holding
+    it is the leader and runs the tick loop, the others are followers that serve reads
+    from the database and keep trying to take the lock. Since the lock dies with the
+    leader's process or connection, a follower takes over within LEADER_RETRY_INTERVAL
+    seconds of a leader failing.
+    """
+
+    def __init__(self, lock):
+        self.lock = lock
+        self.is_leader = False
+        self.checked_at = 0.0
+
+    def campaign(self):
+        """
+        Try to become (or stay) the leader. Holding leadership is rechecked at most every
+        LEADER_RETRY_INTERVAL seconds, so the monitor can call this on every tick.
+
+        Returns:
+            bool: True if this process is the leader
+        """
+        now = time.monotonic()
+        if self.is_leader and now - self.checked_at < LEADER_RETRY_INTERVAL:
+            return True
+        self.checked_at = now
+
+        was_leader = self.is_leader
+        self.is_leader = self.lock.is_held() if was_leader else self.lock.try_acquire()
+        if self.is_leader and not was_leader:
+            logging.info(f"Process {os.getpid()} was elected to run the price monitor")
+        elif was_leader and not self.is_leader:
+            logging.error(f"Process {os.getpid()} lost the leader lock, stopping the price monitor")
+        return self.is_leader
+
+    def resign(self):
+        """Give up leadership, e.g. on shutdown, so a follower takes over right away."""
+        if self.is_leader:
+            logging.info(f"Process {os.getpid()} is resigning as price monitor leader")
+        self.lock.release()
+        self.is_leader = False
+
+def create_leader_election():
+    """
+    Create the leader election matching the database backend.
+
+    Returns:
+        LeaderElection: The election, or None if every process runs the monitor, because
+        election is disabled, sharding splits the work instead or no lock is available
+    """
+    if not MONITOR_LEADER_ELECTION:
+        return None
+    if shard_coordinator is not None:
+        logging.info("Monitor sharding is enabled, every worker runs the price monitor for its shards")
+        return None
+    if get_connection_pool().backend == "postgresql":
+        return LeaderElection(AdvisoryLock())
+    if FCNTL_AVAILABLE:
+        return LeaderElection(FileLock())
+    logging.warning("fcntl is not available, every process runs the price monitor")
+    return None
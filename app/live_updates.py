@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import os
+
+from .snapshot import _encode_json, snapshot_store
+
+# Maximum number of concurrent /api/stream clients
+STREAM_MAX_CLIENTS = int(os.getenv('STREAM_MAX_CLIENTS', '1000'))
+
+# Seconds between keep-alive comments on an idle stream, so proxies don't close it
+STREAM_KEEPALIVE_INTERVAL = float(os.getenv('STREAM_KEEPALIVE_INTERVAL', '15'))
+
+# Number of serialized all-symbol diffs cached by the hub
+DIFF_CACHE_SIZE = 16
+
+def diff_snapshots(old, new, symbols=None):
+    """
+    Compute the field-level changes between two snapshots.
+
+    Args:
+        old: CoinSnapshot the client already has
+        new: Newer CoinSnapshot
+        symbols: Optional set of symbols to restrict the diff to
+
+    Returns:
+        tuple: (changed, removed) where changed maps each changed symbol to the fields
+        that differ from `old` (the full record for new symbols) and removed lists the
+        symbols that no longer exist
+    """
+    changed = {}
+    candidates = new.by_symbol if symbols is None else [symbol for symbol in symbols if symbol in new.by_symbol]
+    for symbol in candidates:
+        coin = new.by_symbol[symbol]
+        old_coin = old.by_symbol.get(symbol)
+        if old_coin is None:
+            changed[symbol] = dict(coin)
+        elif new.changed_at[symbol] > old.version:
+            fields = {key: value for key, value in coin.items() if old_coin.get(key) != value}
+            if fields:
+                changed[symbol] = fields
+
+    old_symbols = old.by_symbol if symbols is None else [symbol for symbol in symbols if symbol in old.by_symbol]
+    removed = [symbol for symbol in old_symbols if symbol not in new.by_symbol]
+    return changed, removed
+
+def format_event(event, version, body):
+    """Format a Server-Sent Events message with a single-line JSON body."""
+    return b"event: " + event.encode() + b"\nid: " + str(version).encode() + b"\ndata: " + body + b"\n\n"
+
+class StreamClient:
+    """
+    A subscriber of the live update stream.
+
+    Instead of a queue, the client holds only the latest snapshot it hasn't sent yet.
+    If it can't keep up, intermediate snapshots are replaced by newer ones and the next
+    diff is computed against the last snapshot it actually sent, so no change is lost
+    and a slow consumer never costs more than one pending snapshot of memory.
+    """
+
+    __slots__ = ("symbols", "pending", "wake", "coalesced")
+
+    def __init__(self, symbols=None):
+        self.symbols = frozenset(symbols) if symbols else None
+        self.pending = None
+        self.wake = asyncio.Event()
+        self.coalesced = 0
+
+class LiveUpdateHub:
+    """
+    Fans out every snapshot published by the price monitor to the /api/stream clients.
+
+    The hub lives on the FastAPI event loop. Snapshots are published from the monitor's
+    thread, so they are handed to the loop with call_soon_threadsafe() and the monitor
+    never waits for clients.
+    """
+
+    def __init__(self, store=snapshot_store, max_clients=STREAM_MAX_CLIENTS):
+        self._store = store
+        self._max_clients = max_clients
+        self._clients = set()
+        self._loop = None
+        self._diffs = {}
+
+    @property
+    def client_count(self):
+        return len(self._clients)
+
+    def subscribe(self, symbols=None):
+        """
+        Register a new stream client. Must be called on the event loop.
+
+        Args:
+            symbols: Optional set of symbols the client is interested in, all if not given
+
+        Returns:
+            StreamClient: The client, or None if the maximum number of clients is reached
+        """
+        if len(self._clients) >= self._max_clients:
+            return None
+
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self._store.add_listener(self._on_publish)
+
+        client = StreamClient(symbols)
+        self._clients.add(client)
+        return client
+
+    def unsubscribe(self, client):
+        """Remove a stream client."""
+        self._clients.discard(client)
+
+    def _on_publish(self, snapshot):
+        # Called in the publishing thread
+        try:
+            self._loop.call_soon_threadsafe(self._dispatch, snapshot)
+        except RuntimeError:
+            # The event loop is closed (application shutdown)
+            pass
+
+    def _dispatch(self, snapshot):
+        for client in self._clients:
+            if client.pending is not None:
+                client.coalesced += 1
+            client.pending = snapshot
+            client.wake.set()
+
+    def diff_body(self, old, new, symbols=None):
+        """
+        Get the serialized diff event data between two snapshots.
+
+        Diffs for clients subscribed to all symbols are shared between clients.
+
+        Returns:
+            bytes: JSON object {"version", "since", "changed", "removed"}, or None if
+            nothing the client subscribed to has changed
+        """
+        key = (old.version, new.version)
+        if symbols is None and key in self._diffs:
+            return self._diffs[key]
+
+        changed, removed = diff_snapshots(old, new, symbols)
+        body = None
+        if changed or removed:
+            body = _encode_json({"version": new.version, "since": old.version, "changed": changed, "removed": removed})
+
+        if symbols is None:
+            if len(self._diffs) >= DIFF_CACHE_SIZE:
+                self._diffs.pop(next(iter(self._diffs)))
+            self._diffs[key] = body
+        return body
+
+    def snapshot_body(self, snapshot, symbols=None):
+        """Get the serialized snapshot event data with all records the client subscribed to."""
+        if symbols is None:
+            coins = snapshot.body
+        else:
+            coins = _encode_json([dict(coin) for coin in snapshot.coins if coin["symbol"] in symbols])
+        return b'{"version":' + str(snapshot.version).encode() + b',"coins":' + coins + b"}"
+
+    async def events(self, client):
+        """
+        Generate the Server-Sent Events of a client.
+
+        The first event is a "snapshot" with the current records, followed by a "diff"
+        event for every published snapshot that changed something the client subscribed to.
+        The client is unsubscribed when the generator ends or is cancelled.
+
+        Args:
+            client: StreamClient returned by subscribe()
+
+        Yields:
+            bytes: Encoded events and keep-alive comments
+        """
+        try:
+            last = self._store.current
+            if last is not None:
+                yield format_event("snapshot", last.version, self.snapshot_body(last, client.symbols))
+
+            while True:
+                try:
+                    await asyncio.wait_for(client.wake.wait(), STREAM_KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+
+                client.wake.clear()
+                snapshot, client.pending = client.pending, None
+                if snapshot is None or (last is not None and snapshot.version <= last.version):
+                    continue
+
+                if last is None:
+                    yield format_event("snapshot", snapshot.version, self.snapshot_body(snapshot, client.symbols))
+                else:
+                    body = self.diff_body(last, snapshot, client.symbols)
+                    if body is not None:
+                        yield format_event("diff", snapshot.version, body)
+                last = snapshot
+        finally:
+            self.unsubscribe(client)
+            if client.coalesced:
+                logging.info(f"Stream client coalesced {client.coalesced} snapshots while catching up")
+
+# Hub shared by all /api/stream requests
+live_update_hub = LiveUpdateHub()
@@ -0,0 +1,330 @@
+"""
+HTTP load test of the API with a realistic mix of dashboard clients.
+
+Starts the fake exchange (app.fake_exchange) and the API (app.main under uvicorn) on a
+temporary SQLite database, so the price monitor ticks against the fake market while the
+clients run. Each simulated client:
+    - loads the coin list when it opens the dashboard, then polls it every
+      --poll-interval seconds with If-None-Match
+    - opens detail views at random (--detail-rate per minute), fetching the coin's
+      /history and /recent-trades
+All clients together also trigger /update-prices now and then (--update-rate per minute).
+
+Usage:
+    python -m app.loadtest --clients 200 --duration 120 --symbols 500
+    python -m app.loadtest --url http://localhost:8000 --clients 50   # existing server
+
+Reports requests, throughput and p50/p95/p99 latency per route as JSON.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+# Import the async HTTP client if available
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Route names the results are grouped by
+LIST_ROUTE = "GET /api/coin-monitors"
+HISTORY_ROUTE = "GET /api/coin-monitors/{symbol}/history"
+TRADES_ROUTE = "GET /api/coin-monitors/{symbol}/recent-trades"
+UPDATE_ROUTE = "POST /api/coin-monitors/update-prices"
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of a sorted list."""
+    if not ordered:
+        return None
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+class LoadRecorder:
+    """Latencies and status codes of the requests, per route."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = {}
+
+    def record(self, route, seconds, status):
+        """Record a request; `status` is None if it failed without a response."""
+        self.latencies.setdefault(route, []).append(seconds)
+        self.statuses.setdefault(route, Counter())[str(status) if status is not None else "error"] += 1
+
+    def summary(self, duration):
+        """
+        Returns:
+            dict: route -> requests, throughput, latency percentiles in ms and status counts
+        """
+        routes = {}
+        for route, latencies in sorted(self.latencies.items()):
+            ordered = sorted(latencies)
+            statuses = self.statuses[route]
+            failed = sum(count for status, count in statuses.items() if status == "error" or int(status) >= 400)
+            routes[route] = {
+                "requests": len(ordered),
+                "rps": round(len(ordered) / duration, 2),
+                "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+                "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+                "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+                "max_ms": round(ordered[-1] * 1000, 2),
+                "failed": failed,
+                "statuses": dict(sorted(statuses.items())),
+            }
+        return routes
+
+async def timed_request(client, recorder, route, method, url, **kwargs):
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError as e:
+        recorder.record(route, time.perf_counter() - start, None)
+        logging.debug(f"{route} failed: {e}")
+        return None
+    recorder.record(route, time.perf_counter() - start, response.status_code)
+    return response
+
+async def dashboard_client(client, recorder, symbols, args, stop_at, rng):
+    """One dashboard user: list polling plus random detail views until `stop_at`."""
+    await asyncio.sleep(rng.uniform(0, args.ramp_up))
+    etag = None
+    now = time.monotonic()
+    next_poll = now
+    next_detail = now + rng.expovariate(args.detail_rate / 60) if args.detail_rate > 0 else float("inf")
+
+    while True:
+        wake_at = min(next_poll, next_detail)
+        if wake_at >= stop_at:
+            return
+        await asyncio.sleep(max(wake_at - time.monotonic(), 0))
+
+        if time.monotonic() >= next_poll:
+            headers = {"If-None-Match": etag} if etag else {}
+            response = await timed_request(client, recorder, LIST_ROUTE, "GET", "/api/coin-monitors", headers=headers)
+            if response is not None and response.status_code == 200:
+                etag = response.headers.get("etag")
+            next_poll += args.poll_interval
+
+        if time.monotonic() >= next_detail:
+            symbol = rng.choice(symbols)
+            # The detail view loads the history and the recent trades side by side
+            await asyncio.gather(
+                timed_request(client, recorder, HISTORY_ROUTE, "GET", f"/api/coin-monitors/{symbol}/history"),
+                timed_request(client, recorder, TRADES_ROUTE, "GET", f"/api/coin-monitors/{symbol}/recent-trades"),
+            )
+            next_detail += rng.expovariate(args.detail_rate / 60)
+
+async def price_updater(client, recorder, args, stop_at, rng):
+    """Occasional manual price updates, shared by all clients."""
+    while True:
+        wake_at = time.monotonic() + rng.expovariate(args.update_rate / 60)
+        if wake_at >= stop_at:
+            return
+        await asyncio.sleep(wake_at - time.monotonic())
+        await timed_request(client, recorder, UPDATE_ROUTE, "POST", "/api/coin-monitors/update-prices")
+
+def parse_tick_metrics(text):
+    """Mean tick duration and overruns of the price monitor from the /metrics page."""
+    values = {}
+    for name in ("coin_monitor_tick_duration_seconds_sum", "coin_monitor_tick_duration_seconds_count",
+                 "coin_monitor_tick_overruns_total"):
+        match = re.search(rf"^{name} (\S+)$", text, re.MULTILINE)
+        if match:
+            values[name] = float(match.group(1))
+    count = values.get("coin_monitor_tick_duration_seconds_count")
+    if not count:
+        return None
+    return {
+        "ticks": int(count),
+        "tick_mean_ms": round(values["coin_monitor_tick_duration_seconds_sum"] / count * 1000, 2),
+        "tick_overruns": int(values.get("coin_monitor_tick_overruns_total", 0)),
+    }
+
+async def wait_until_ready(client, timeout):
+    """Wait until the API serves a non-empty coin list, i.e. the monitor has initialized."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = await client.get("/api/coin-monitors")
+            if response.status_code == 200 and response.json():
+                return [coin["symbol"] for coin in response.json()]
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"The API didn't serve any coins within {timeout:.0f} seconds")
+
+async def run_load(base_url, args):
+    """Run the client mix against `base_url` and return the results document."""
+    recorder = LoadRecorder()
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.clients + 10, max_keepalive_connections=args.clients + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        symbols = await wait_until_ready(client, args.startup_timeout)
+        logging.info(f"API ready with {len(symbols)} coins, starting {args.clients} clients for {args.duration:.0f}s")
+
+        start = time.monotonic()
+        stop_at = start + args.duration
+        tasks = [
+            dashboard_client(client, recorder, symbols, args, stop_at, random.Random(rng.random()))
+            for _ in range(args.clients)
+        ]
+        if args.update_rate > 0:
+            tasks.append(price_updater(client, recorder, args, stop_at, random.Random(rng.random())))
+        await asyncio.gather(*tasks)
+        # Requests in flight at the deadline finish late, count the real elapsed time
+        elapsed = time.monotonic() - start
+
+        monitor = None
+        try:
+            response = await client.get("/metrics")
+            if response.status_code == 200:
+                monitor = parse_tick_metrics(response.text)
+        except httpx.HTTPError:
+            pass
+
+    routes = recorder.summary(elapsed)
+    all_latencies = sorted(latency for latencies in recorder.latencies.values() for latency in latencies)
+    total = {
+        "requests": len(all_latencies),
+        "rps": round(len(all_latencies) / elapsed, 2),
+        "p50_ms": round(percentile(all_latencies, 0.50) * 1000, 2) if all_latencies else None,
+        "p95_ms": round(percentile(all_latencies, 0.95) * 1000, 2) if all_latencies else None,
+        "p99_ms": round(percentile(all_latencies, 0.99) * 1000, 2) if all_latencies else None,
+        "failed": sum(route["failed"] for route in routes.values()),
+    }
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "url": base_url,
+            "clients": args.clients,
+            "duration": round(elapsed, 2),
+            "symbols": len(symbols),
+            "poll_interval": args.poll_interval,
+            "detail_rate": args.detail_rate,
+            "update_rate": args.update_rate,
+            "seed": args.seed,
+        },
+        "routes": routes,
+        "total": total,
+        "monitor": monitor,
+    }
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_process(command, env, log_path, cwd):
+    log_file = open(log_path, "w")
+    return subprocess.Popen(command, cwd=cwd, env=env, stdout=log_file, stderr=subprocess.STDOUT), log_file
+
+def stop_process(process, log_file):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+    log_file.close()
+
+def run_local(args):
+    """Start the fake exchange and the API on a temporary database, run the load and stop them."""
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ)
+        env["PYTHONPATH"] = PROJECT_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+        exchange_port = free_port()
+        exchange, exchange_log = start_process(
+            [sys.executable, "-m", "app.fake_exchange", "--port", str(exchange_port), "--symbols", str(args.symbols),
+             "--seed", str(args.seed), "--weight-limit", str(args.weight_limit)],
+            env, os.path.join(workdir, "fake_exchange.log"), workdir,
+        )
+
+        api_port = free_port()
+        api_env = dict(env)
+        api_env.pop("DB_HOST", None)
+        api_env.update({
+            "BINANCE_API_URL": f"http://127.0.0.1:{exchange_port}",
+            "BINANCE_WEIGHT_LIMIT": str(args.weight_limit),
+            "SQLITE_DB_PATH": os.path.join(workdir, "loadtest.db"),
+            "MONITOR_QUOTE_ASSETS": "USDT",
+            "PRICE_SAMPLE_INTERVAL": str(args.tick_interval),
+            "MONITOR_LEADER_ELECTION": "false",
+            "MONITOR_SHARD_COUNT": "0",
+        })
+        api, api_log = start_process(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(api_port),
+             "--no-access-log"],
+            api_env, os.path.join(workdir, "api.log"), workdir,
+        )
+        try:
+            return asyncio.run(run_load(f"http://127.0.0.1:{api_port}", args))
+        except Exception:
+            with open(os.path.join(workdir, "api.log")) as log:
+                sys.stderr.write("".join(log.readlines()[-20:]))
+            raise
+        finally:
+            stop_process(api, api_log)
+            stop_process(exchange, exchange_log)
+
+def print_summary(document):
+    print(f"{document['meta']['clients']} clients, {document['meta']['duration']}s, "
+          f"{document['meta']['symbols']} symbols", file=sys.stderr)
+    print(f"{'route':<45} {'requests':>9} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'failed':>7}",
+          file=sys.stderr)
+    rows = list(document["routes"].items()) + [("total", document["total"])]
+    for route, stats in rows:
+        print(f"{route:<45} {stats['requests']:>9} {stats['rps']:>8} {stats['p50_ms']!s:>9} {stats['p95_ms']!s:>9} "
+              f"{stats['p99_ms']!s:>9} {stats['failed']:>7}", file=sys.stderr)
+    if document["monitor"]:
+        monitor = document["monitor"]
+        print(f"price monitor: {monitor['ticks']} ticks, mean {monitor['tick_mean_ms']} ms, "
+              f"{monitor['tick_overruns']} overruns", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of the API with simulated dashboard clients")
+    parser.add_argument("--url", help="Test a running API instead of starting the fake exchange and the API")
+    parser.add_argument("--clients", type=int, default=100, help="Simulated dashboard clients")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to run the clients")
+    parser.add_argument("--ramp-up", type=float, default=10, help="Seconds over which the clients open the dashboard")
+    parser.add_argument("--poll-interval", type=float, default=20, help="Seconds between coin list polls of a client")
+    parser.add_argument("--detail-rate", type=float, default=2, help="Detail views per client and minute")
+    parser.add_argument("--update-rate", type=float, default=1, help="Manual price updates per minute, all clients together")
+    parser.add_argument("--symbols", type=int, default=200, help="Symbols of the fake market")
+    parser.add_argument("--tick-interval", type=float, default=20, help="PRICE_SAMPLE_INTERVAL of the started API")
+    parser.add_argument("--weight-limit", type=int, default=6000, help="Request weight per minute of the fake exchange")
+    parser.add_argument("--timeout", type=float, default=30, help="Request timeout in seconds")
+    parser.add_argument("--startup-timeout", type=float, default=60, help="Seconds to wait for the API to serve coins")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the results JSON to this file instead of stdout")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if not HTTPX_AVAILABLE:
+        parser.error("The load test needs the httpx package")
+
+    document = asyncio.run(run_load(args.url.rstrip("/"), args)) if args.url else run_local(args)
+
+    output = json.dumps(document, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output + "\n")
+    else:
+        print(output)
+    print_summary(document)
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,18 @@
-from fastapi import FastAPI, HTTPException, Body, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Body, BackgroundTasks, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from typing import List
 from pydantic import BaseModel
+import asyncio
 import logging
 import os
 import json
 import hmac
 import hashlib
 import time
+import requests
 from typing import Optional
 
 from .coin_monitor import (
@@ -16,11 +21,32 @@ from .coin_monitor import (
     update_coin_monitor, 
     update_latest_prices,
     get_coin_price_history,
+    get_coin_price_histories,
+    get_coin_price_bars,
     get_recent_trades,
+    refresh_snapshot,
     CoinMonitor,
     CoinMonitorUpdate
 )
-from .coin_price_monitor import start_price_monitor, add_coin, force_update_all_price_histories, update_initial_prices
+from .coin_price_monitor import (
+    MONITOR_RUNTIME,
+    resign_leadership,
+    runs_monitor,
+    tick_scheduler,
+    start_price_monitor,
+    start_price_monitor_async,
+    stop_price_monitor_async,
+    add_coin,
+    force_update_all_price_histories,
+    update_initial_prices
+)
+from .coin_query import CoinQuery
+from .database import close_connection_pool, get_pool_stats
+from .http_client import binance_get, binance_single_flight, close_http_clients
+from .live_updates import live_update_hub
+from .metrics import METRICS_SYMBOL_STALENESS, TICK_PHASES, MetricsWriter, tick_metrics
+from .rate_limit import RateLimitExceeded, weight_governor
+from .snapshot import snapshot_store
 
 # Configure logging
 logging.basicConfig(
@@ -49,41 +75,161 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
+# Maximum number of symbols per /api/coin-monitors/history:batch request
+HISTORY_BATCH_LIMIT = int(os.getenv('HISTORY_BATCH_LIMIT', '500'))
+
+def rate_limited(error):
+    """HTTP error for a Binance request shed by the weight governor."""
+    return HTTPException(
+        status_code=503,
+        detail=str(error),
+        headers={"Retry-After": str(max(int(error.retry_after + 0.999), 1))}
+    )
+
 # Background task for updating coin prices
 price_monitor_thread = None
+price_monitor_task = None
 
 @app.on_event("startup")
-def startup_price_update():
+async def startup_price_update():
     """Start the background task when the app starts."""
-    global price_monitor_thread
-    # Start the price monitor that updates every 2 seconds
-    price_monitor_thread = start_price_monitor()
-    logging.info("Started coin price monitor thread")
+    global price_monitor_thread, price_monitor_task
+    if MONITOR_RUNTIME == 'thread':
+        price_monitor_thread = start_price_monitor()
+        logging.info("Started coin price monitor thread")
+    else:
+        # Run the monitor on the app's event loop, sharing its HTTP client
+        price_monitor_task = start_price_monitor_async()
+        logging.info("Started coin price monitor task")
 
 @app.on_event("shutdown")
-def shutdown_price_update():
+async def shutdown_price_update():
     """Stop the background task when the app shuts down."""
-    # The thread is a daemon thread, so it will be terminated when the app shuts down
-    logging.info("Coin price monitor thread will be stopped when the app shuts down")
+    if price_monitor_task is not None:
+        await stop_price_monitor_async(price_monitor_task)
+    else:
+        # The thread is a daemon thread, so it will be terminated when the app shuts down
+        logging.info("Coin price monitor thread will be stopped when the app shuts down")
+        resign_leadership()
+    await close_http_clients()
+    close_connection_pool()
 
 @app.get("/api/coin-monitors", response_model=List[dict])
-def read_coin_monitors():
+def read_coin_monitors(
+    request: Request,
+    since: Optional[int] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    trend: Optional[str] = None,
+    cycle_status: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    symbol_prefix: Optional[str] = None,
+    sort: Optional[str] = None,
+    fields: Optional[str] = None,
+):
     """
     Endpoint to get all coin monitor records.
+
+    Served from the snapshot published by the price monitor, whose JSON body is
+    serialized once per tick, so the database isn't queried per request.
+
+    The ETag is the snapshot version: a request with a matching If-None-Match header
+    gets 304 Not Modified. With `?since=<version>` only the records that changed after
+    that version are returned, as {"version", "since", "changed", "removed"}; if the
+    version is unknown the full list is returned instead.
+
+    The list can be narrowed with `trend`, `cycle_status` (comma-separated values),
+    `min_price`/`max_price` (latest price) and `symbol_prefix`, ordered with
+    `sort=symbol|change` (percent change from the initial price, `-` for descending),
+    projected with `fields=` and paginated with `limit`; the `X-Next-Cursor` header
+    holds the `cursor` of the next page. Query results are cached per snapshot.
     """
     try:
-        return get_all_coin_monitors()
+        query = CoinQuery(limit, cursor, trend, cycle_status, min_price, max_price, symbol_prefix, sort, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if since is not None and not query.is_empty:
+        raise HTTPException(status_code=400, detail="since can't be combined with query parameters")
+
+    try:
+        snapshot = snapshot_store.current or refresh_snapshot()
+        if snapshot is None:
+            if query.is_empty:
+                return get_all_coin_monitors()
+            records, next_cursor = query.apply(get_all_coin_monitors())
+            content = jsonable_encoder(records)
+            return JSONResponse(content=content, headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
+
+        # Clients (and browser caches) must revalidate, but may reuse the body on 304
+        headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+        if snapshot.matches_etag(request.headers.get("if-none-match")):
+            return Response(status_code=304, headers=headers)
+
+        if since is not None:
+            body = snapshot.delta_body(since)
+            if body is not None:
+                return Response(content=body, media_type="application/json", headers=headers)
+        if not query.is_empty:
+            body, next_cursor = snapshot.query_body(query.key, query.apply)
+            if next_cursor:
+                headers["X-Next-Cursor"] = next_cursor
+            return Response(content=body, media_type="application/json", headers=headers)
+        return Response(content=snapshot.body, media_type="application/json", headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/stream")
+async def stream_coin_monitors(symbols: Optional[str] = None):
+    """
+    Server-Sent Events stream of coin monitor changes.
+
+    The first event ("snapshot") contains the current records, then a "diff" event with
+    {"version", "since", "changed", "removed"} follows every price tick that changed
+    something; `changed` maps each symbol to only the fields that changed. With
+    `?symbols=BTCUSDT,ETHUSDT` the stream is limited to those coins. Slow clients skip
+    intermediate ticks and get the combined changes once they catch up.
+    """
+    symbol_set = None
+    if symbols:
+        symbol_set = {symbol.strip().upper() for symbol in symbols.split(",") if symbol.strip()}
+
+    client = live_update_hub.subscribe(symbol_set)
+    if client is None:
+        raise HTTPException(status_code=503, detail="Too many stream clients, try again later")
+
+    try:
+        if snapshot_store.current is None:
+            # The monitor hasn't published yet; the new snapshot reaches the client as its first event
+            await asyncio.to_thread(refresh_snapshot)
+    except BaseException:
+        live_update_hub.unsubscribe(client)
+        raise
+
+    return StreamingResponse(
+        live_update_hub.events(client),
+        media_type="text/event-stream",
+        # Disable caching and proxy buffering (e.g. nginx) so events arrive immediately
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # The generator only unsubscribes once it has started, which a client that
+        # disconnects before the first event never lets it do
+        background=BackgroundTask(live_update_hub.unsubscribe, client),
+    )
+
 @app.get("/api/coin-monitors/{symbol}", response_model=dict)
 def read_coin_monitor(symbol: str):
     """
     Endpoint to get a specific coin's monitoring data by symbol.
     """
     try:
+        snapshot = snapshot_store.current
+        if snapshot is not None and symbol in snapshot.by_symbol:
+            return snapshot.by_symbol[symbol]
         coin_monitor = get_coin_monitor_by_symbol(symbol)
         if not coin_monitor:
             raise HTTPException(status_code=404, detail=f"Coin monitor for symbol {symbol} not found")
@@ -102,6 +248,7 @@ def update_coin_monitor_endpoint(symbol: str, data: CoinMonitorUpdate = Body(...
         # Convert Pydantic model to dict, excluding None values
         update_data = {k: v for k, v in data.dict().items() if v is not None}
         result = update_coin_monitor(symbol, update_data)
+        refresh_snapshot()
         return result
     except HTTPException:
         raise
@@ -114,7 +261,36 @@ def update_all_prices():
     Endpoint to refresh all coins with current market prices.
     """
     try:
-        return update_latest_prices()
+        result = update_latest_prices()
+        refresh_snapshot()
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+class HistoryBatchRequest(BaseModel):
+    symbols: List[str]
+
+@app.post("/api/coin-monitors/history:batch", response_model=dict)
+def get_coin_histories(request: HistoryBatchRequest = Body(...)):
+    """
+    Endpoint to get the price histories of several coins at once.
+
+    Returns {"histories": {symbol: history}, "missing": [...]} with the same structured
+    history as /api/coin-monitors/{symbol}/history, loaded over one connection with one
+    query for all coins instead of one request per coin.
+    """
+    symbols = list(dict.fromkeys(symbol.strip().upper() for symbol in request.symbols if symbol.strip()))
+    if len(symbols) > HISTORY_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {HISTORY_BATCH_LIMIT} symbols per request")
+
+    try:
+        histories = get_coin_price_histories(symbols)
+        return {
+            "histories": histories,
+            "missing": [symbol for symbol in symbols if symbol not in histories]
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -140,6 +316,29 @@ def get_coin_history(symbol: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/coin-monitors/{symbol}/bars", response_model=dict)
+def get_coin_bars(
+    symbol: str,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    resolution: Optional[int] = None,
+):
+    """
+    Endpoint to get OHLC bars of a coin's price over a time range.
+
+    `start` and `end` are Unix timestamps (default: the last 24 hours) and `resolution`
+    the seconds per bar (default: the range split into ROLLUP_MAX_BARS bars). The bars
+    come from the coarsest rollup tier (1m, 5m or 1h) that is fine enough and still
+    covers `start`; the tier and the resolution used are part of the response.
+    """
+    end = time.time() if end is None else end
+    start = end - 86400 if start is None else start
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if resolution is not None and resolution <= 0:
+        raise HTTPException(status_code=400, detail="resolution must be positive")
+    return get_coin_price_bars(symbol, start, end, resolution)
+
 @app.get("/api/coin-monitors/{symbol}/recent-trades", response_model=dict)
 def get_coin_recent_trades(symbol: str):
     """
@@ -147,7 +346,8 @@ def get_coin_recent_trades(symbol: str):
 
     This endpoint returns a structured representation of the recent trade activity,
     including the number of buy and sell trades, volumes, and a trend analysis
-    based on the last 3 minutes of trading data from Binance.
+    based on the last TRADE_WINDOW_SECONDS (default 30) of trading data from Binance,
+    kept up to date incrementally by a rolling aggregator shared by all requests.
 
     It also provides a direct link to the trading pair on Binance.
     """
@@ -156,6 +356,8 @@ def get_coin_recent_trades(symbol: str):
         if "error" in trades:
             raise HTTPException(status_code=500, detail=trades["error"])
         return trades
+    except RateLimitExceeded as e:
+        raise rate_limited(e)
     except HTTPException:
         raise
     except Exception as e:
@@ -177,19 +379,20 @@ def add_new_coin(request: AddCoinRequest = Body(...)):
     """
     try:
         # Fetch current price from Binance API
-        import requests
-        response = requests.get(f'https://api.binance.com/api/v3/ticker/price?symbol={request.symbol}', timeout=10)
-        response.raise_for_status()
-        price_data = response.json()
+        price_data = binance_get('/api/v3/ticker/price', params={'symbol': request.symbol})
         price = float(price_data['price'])
 
         # Add the coin
         success = add_coin(request.symbol, price)
+        if success:
+            refresh_snapshot()
 
         if success:
             return {"message": f"Added {request.symbol} to monitoring with initial price {price}"}
         else:
             return {"message": f"Coin {request.symbol} already exists or could not be added"}
+    except RateLimitExceeded as e:
+        raise rate_limited(e)
     except requests.exceptions.HTTPError as e:
         if e.response.status_code == 400:
             raise HTTPException(status_code=400, detail=f"Invalid symbol: {request.symbol}")
@@ -205,6 +408,7 @@ def force_update_history():
     """
     try:
         updated_count = force_update_all_price_histories()
+        refresh_snapshot()
         return {"message": f"Successfully updated price history for {updated_count} coins with varied values"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -217,6 +421,7 @@ def update_initial_prices_endpoint():
     """
     try:
         updated_count = update_initial_prices()
+        refresh_snapshot()
         return {"message": f"Successfully updated initial prices for {updated_count} coins to match current prices"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -229,9 +434,7 @@ def buy_coin(request: TradeRequest = Body(...)):
     """
     try:
         # Get current price from Binance API
-        response = requests.get(f'https://api.binance.com/api/v3/ticker/price?symbol={request.symbol}', timeout=10)
-        response.raise_for_status()
-        price_data = response.json()
+        price_data = binance_get('/api/v3/ticker/price', params={'symbol': request.symbol})
         current_price = float(price_data['price'])
 
         # Calculate quantity based on amount and current price
@@ -263,6 +466,8 @@ def buy_coin(request: TradeRequest = Body(...)):
             "message": f"Successfully bought {quantity:.8f} {request.symbol} at ${current_price:.8f}",
             "order": order_response
         }
+    except RateLimitExceeded as e:
+        raise rate_limited(e)
     except requests.exceptions.HTTPError as e:
         if e.response.status_code == 400:
             raise HTTPException(status_code=400, detail=f"Invalid symbol: {request.symbol}")
@@ -278,9 +483,7 @@ def sell_coin(request: TradeRequest = Body(...)):
     """
     try:
         # Get current price from Binance API
-        response = requests.get(f'https://api.binance.com/api/v3/ticker/price?symbol={request.symbol}', timeout=10)
-        response.raise_for_status()
-        price_data = response.json()
+        price_data = binance_get('/api/v3/ticker/price', params={'symbol': request.symbol})
         current_price = float(price_data['price'])
 
         # Calculate quantity based on amount and current price
@@ -312,6 +515,8 @@ def sell_coin(request: TradeRequest = Body(...)):
             "message": f"Successfully sold {quantity:.8f} {request.symbol} at ${current_price:.8f}",
             "order": order_response
         }
+    except RateLimitExceeded as e:
+        raise rate_limited(e)
     except requests.exceptions.HTTPError as e:
         if e.response.status_code == 400:
             raise HTTPException(status_code=400, detail=f"Invalid symbol: {request.symbol}")
@@ -319,6 +524,76 @@ def sell_coin(request: TradeRequest = Body(...)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def collect_metrics():
+    """
+    Collect the metrics of this process in the Prometheus text format.
+
+    Returns:
+        str: The metrics page
+    """
+    writer = MetricsWriter()
+
+    scheduler = tick_scheduler.stats()
+    writer.histogram("coin_monitor_tick_duration_seconds", "Duration of the price ticks.",
+                     [({}, scheduler["durations"])])
+    writer.histogram("coin_monitor_tick_phase_duration_seconds", "Duration of each phase of the price tick.",
+                     [({"phase": phase}, tick_metrics.phases[phase].snapshot()) for phase in TICK_PHASES])
+    writer.gauge("coin_monitor_tick_interval_seconds", "Current interval between price ticks.", scheduler["interval"])
+    writer.gauge("coin_monitor_volatility_ratio", "Smoothed share of symbols completing a price cycle per tick.",
+                 scheduler["volatility"])
+    writer.counter("coin_monitor_tick_overruns_total", "Ticks that ran past the next deadline.", scheduler["overruns"])
+    writer.counter("coin_monitor_ticks_missed_total", "Ticks skipped or merged after an overrun.",
+                   [({"policy": "skip"}, scheduler["skipped"]), ({"policy": "merge"}, scheduler["merged"])])
+    writer.counter("coin_monitor_symbols_updated_total", "Latest prices written by the price monitor.",
+                   tick_metrics.counter_values("symbols_updated").get(None, 0))
+    writer.counter("coin_monitor_cycles_rotated_total", "Price cycle updates, by reason.",
+                   [({"reason": reason}, count) for reason, count in sorted(tick_metrics.counter_values("cycles_rotated").items())])
+    writer.counter("coin_monitor_errors_total", "Errors of the price monitor, by stage.",
+                   [({"stage": stage}, count) for stage, count in sorted(tick_metrics.counter_values("errors").items())])
+    writer.gauge("coin_monitor_leader", "1 if this process runs the price monitor.", runs_monitor())
+
+    staleness = tick_metrics.staleness()
+    writer.gauge("coin_monitor_price_staleness_max_seconds", "Age of the oldest latest price written by this process.",
+                 max(staleness.values()) if staleness else None)
+    if METRICS_SYMBOL_STALENESS:
+        writer.gauge("coin_monitor_price_staleness_seconds", "Seconds since the latest price of a symbol was written.",
+                     [({"symbol": symbol}, age) for symbol, age in sorted(staleness.items())])
+
+    snapshot = snapshot_store.current
+    writer.gauge("coin_monitor_snapshot_version", "Version of the published coin snapshot.",
+                 snapshot.version if snapshot is not None else 0)
+    writer.gauge("coin_monitor_stream_clients", "Connected /api/stream clients.", live_update_hub.client_count)
+
+    pool = get_pool_stats()
+    writer.gauge("db_pool_connections_in_use", "Database connections checked out of the pool.", pool["in_use"])
+    if pool["max_connections"] is not None:
+        writer.gauge("db_pool_connections_max", "Maximum connections of the pool.", pool["max_connections"])
+    writer.counter("db_pool_checkouts_total", "Connection checkouts.", pool["checkouts"])
+    writer.counter("db_pool_timeouts_total", "Checkouts that timed out waiting for a connection.", pool["timeouts"])
+    writer.counter("db_pool_connections_created_total", "Connections opened by the pool.", pool["connections_created"])
+    writer.counter("db_pool_wait_seconds_total", "Time spent waiting for a connection.", pool["wait_seconds_total"])
+    writer.gauge("db_pending_writes", "Writes queued for the SQLite writer thread.", pool["pending_writes"])
+
+    requests_stats = binance_single_flight.stats()
+    writer.counter("binance_requests_total", "Binance requests made.", requests_stats["requests"])
+    writer.counter("binance_requests_shared_total", "Requests that shared an in-flight Binance call.", requests_stats["shared"])
+    writer.counter("binance_cache_hits_total", "Requests answered from the response cache.", requests_stats["cache_hits"])
+
+    weight = weight_governor.stats()
+    writer.gauge("binance_weight_available", "Request weight left in the budget.", weight["available"])
+    writer.gauge("binance_weight_used_1m", "Request weight Binance reported for the current minute.", weight["used_weight_1m"])
+    writer.gauge("binance_blocked_seconds", "Seconds until requests are allowed again after a 429/418.", weight["blocked_for"])
+    writer.counter("binance_weight_waits_total", "Requests that waited for request weight.", weight["waits"])
+    writer.counter("binance_requests_shed_total", "Requests shed because the weight budget was exhausted.", weight["shed"])
+    writer.counter("binance_bans_total", "429/418 responses from Binance.", weight["bans"])
+
+    return writer.render()
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics of the price monitor, the connection pool and the Binance client."""
+    return Response(content=collect_metrics(), media_type=MetricsWriter.content_type)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,148 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from .scheduler import DurationHistogram
+
+# Phases of a price tick, in the order they run
+TICK_PHASES = ("fetch", "decode", "db_read", "indicators", "cycles", "write", "cleanup", "commit", "publish")
+
+# Upper bounds of the tick phase histogram buckets, in seconds
+PHASE_DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Export the price staleness of every symbol, not only the maximum (one series per symbol)
+METRICS_SYMBOL_STALENESS = os.getenv('METRICS_SYMBOL_STALENESS', 'true').lower() in ('1', 'true', 'yes')
+
+class TickMetrics:
+    """
+    Timings and counters of the price tick pipeline.
+
+    Every phase of a tick has its own duration histogram, so it shows where the time
+    of a tick goes. Counters are kept per label value, e.g. cycles rotated per reason.
+    """
+
+    def __init__(self, phases=TICK_PHASES):
+        self.phases = {phase: DurationHistogram(PHASE_DURATION_BUCKETS) for phase in phases}
+        self.counters = {}
+        self.price_updated_at = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        """Time the block as one run of a tick phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name].observe(time.perf_counter() - start)
+
+    def observe(self, name, seconds):
+        self.phases[name].observe(seconds)
+
+    def count(self, name, amount=1, label=None):
+        """Increase a counter, optionally the one of a label value."""
+        with self._lock:
+            values = self.counters.setdefault(name, {})
+            values[label] = values.get(label, 0) + amount
+
+    def record_prices(self, symbols):
+        """Record that the latest prices of `symbols` were just written."""
+        now = time.time()
+        with self._lock:
+            for symbol in symbols:
+                self.price_updated_at[symbol] = now
+
+    def staleness(self):
+        """
+        Returns:
+            dict: symbol -> seconds since its latest price was written
+        """
+        now = time.time()
+        with self._lock:
+            return {symbol: now - updated_at for symbol, updated_at in self.price_updated_at.items()}
+
+    def counter_values(self, name):
+        """
+        Returns:
+            dict: label value (None without label) -> count
+        """
+        with self._lock:
+            return dict(self.counters.get(name, {}))
+
+# Metrics of this process's price monitor
+tick_metrics = TickMetrics()
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value):
+    if value is None:
+        return "NaN"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+class MetricsWriter:
+    """Builds a response in the Prometheus text exposition format (version 0.0.4)."""
+
+    # The response adds "; charset=utf-8"
+    content_type = "text/plain; version=0.0.4"
+
+    def __init__(self):
+        self.lines = []
+
+    def _header(self, name, metric_type, help_text):
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {metric_type}")
+
+    def _samples(self, name, samples):
+        for labels, value in samples:
+            self.lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    def counter(self, name, help_text, samples):
+        """
+        Add a counter.
+
+        Args:
+            name: Metric name, ending in _total
+            help_text: Description
+            samples: Value, or list of (labels dict, value) tuples
+        """
+        self._header(name, "counter", help_text)
+        self._samples(name, samples if isinstance(samples, list) else [({}, samples)])
+
+    def gauge(self, name, help_text, samples):
+        """Add a gauge; `samples` as in counter()."""
+        self._header(name, "gauge", help_text)
+        self._samples(name, samples if isinstance(samples, list) else [({}, samples)])
+
+    def histogram(self, name, help_text, histograms):
+        """
+        Add a histogram.
+
+        Args:
+            name: Metric name
+            help_text: Description
+            histograms: List of (labels dict, DurationHistogram.snapshot()) tuples
+        """
+        self._header(name, "histogram", help_text)
+        for labels, snapshot in histograms:
+            for bound, count in snapshot["buckets"]:
+                le = bound if bound == "+Inf" else _format_value(float(bound))
+                self.lines.append(f"{name}_bucket{_format_labels(dict(labels, le=le))} {count}")
+            self.lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(float(snapshot['sum']))}")
+            self.lines.append(f"{name}_count{_format_labels(labels)} {snapshot['count']}")
+
+    def render(self):
+        return "\n".join(self.lines) + "\n"
@@ -0,0 +1,127 @@
+import logging
+import math
+import threading
+from collections import deque
+
+# Moving average periods, the longest one determines how much history is kept
+MOVING_AVERAGE_PERIODS = (7, 25, 99)
+
+class RollingWindow:
+    """
+    Fixed-size ring buffer with a running sum, giving O(1) moving average updates.
+
+    The running sum is recomputed exactly every `size` evictions so that floating point
+    error from repeated add/subtract can't accumulate; this keeps updates amortized O(1).
+    """
+
+    __slots__ = ("size", "_values", "_sum", "_evictions")
+
+    def __init__(self, size):
+        self.size = size
+        self._values = deque(maxlen=size)
+        self._sum = 0.0
+        self._evictions = 0
+
+    def push(self, value):
+        """Add a new value, evicting the oldest one when the window is full."""
+        if len(self._values) == self.size:
+            self._sum -= self._values[0]
+            self._evictions += 1
+        self._values.append(value)
+        self._sum += value
+
+        if self._evictions >= self.size:
+            self._sum = math.fsum(self._values)
+            self._evictions = 0
+
+    @property
+    def average(self):
+        """Average of the values in the window, or 0.0 if it is empty."""
+        if not self._values:
+            return 0.0
+        return self._sum / len(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+class MovingAverageTracker:
+    """
+    In-memory moving averages for all monitored symbols.
+
+    Each symbol has one RollingWindow per period. The windows are rebuilt from
+    price_history once (at startup, or after a failed tick) and then advanced with
+    every new price, so no AVG queries are needed per tick.
+    """
+
+    def __init__(self, periods=MOVING_AVERAGE_PERIODS):
+        self.periods = tuple(periods)
+        self.depth = max(self.periods)
+        self._windows = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def _new_windows(self):
+        return [RollingWindow(period) for period in self.periods]
+
+    def rebuild(self, prices_by_symbol):
+        """
+        Replace all windows with the given price history.
+
+        Args:
+            prices_by_symbol: dict of symbol -> list of prices, newest first
+        """
+        windows = {}
+        for symbol, prices in prices_by_symbol.items():
+            symbol_windows = self._new_windows()
+            for price in reversed(prices[:self.depth]):
+                for window in symbol_windows:
+                    window.push(price)
+            windows[symbol] = symbol_windows
+
+        with self._lock:
+            self._windows = windows
+            self.loaded = True
+        logging.info(f"Rebuilt moving averages for {len(windows)} symbols")
+
+    def invalidate(self):
+        """Force a rebuild from the database before the next update."""
+        with self._lock:
+            self.loaded = False
+
+    def update(self, symbol, price):
+        """
+        Add a new price for a symbol and return its moving averages.
+
+        Args:
+            symbol: The coin symbol
+            price: The new price
+
+        Returns:
+            tuple: One moving average per period, in the order of `periods`
+        """
+        with self._lock:
+            symbol_windows = self._windows.get(symbol)
+            if symbol_windows is None:
+                symbol_windows = self._windows[symbol] = self._new_windows()
+            for window in symbol_windows:
+                window.push(price)
+            return self._averages(symbol_windows)
+
+    @staticmethod
+    def _averages(symbol_windows):
+        averages = []
+        for i, window in enumerate(symbol_windows):
+            # Windows holding the same prices must agree exactly, not just to the last bit
+            if i > 0 and len(window) == len(symbol_windows[i - 1]):
+                averages.append(averages[-1])
+            else:
+                averages.append(window.average)
+        return tuple(averages)
+
+    def averages(self, symbol):
+        """Return the current moving averages of a symbol without adding a price."""
+        with self._lock:
+            symbol_windows = self._windows.get(symbol)
+            if symbol_windows is None:
+                return tuple(0.0 for _ in self.periods)
+            return self._averages(symbol_windows)
@@ -0,0 +1,180 @@
+import os
+import re
+
+from .database import symbol_filter
+
+# Import PostgreSQL libraries if available
+try:
+    import psycopg2
+    from psycopg2.extras import execute_batch
+    POSTGRES_AVAILABLE = True
+except ImportError:
+    POSTGRES_AVAILABLE = False
+
+# Number of high/low price cycles kept per coin
+PRICE_CYCLE_DEPTH = int(os.getenv('PRICE_CYCLE_DEPTH', '10'))
+
+# Value of a cycle that hasn't been recorded yet
+EMPTY_CYCLE = (0.0, 0.0)
+
+# API fields of the cycles, e.g. high_price_1 (most recent cycle) ... low_price_10
+CYCLE_FIELD_PATTERN = re.compile(r"^(high|low)_price_(\d+)$")
+
+def pad_cycles(cycles, depth=PRICE_CYCLE_DEPTH):
+    """
+    Pad a list of cycles with empty cycles up to `depth` entries.
+
+    Args:
+        cycles: List of (high, low) tuples, most recent first
+
+    Returns:
+        list: `depth` (high, low) tuples, most recent first
+    """
+    cycles = list(cycles[:depth])
+    return cycles + [EMPTY_CYCLE] * (depth - len(cycles))
+
+def cycle_fields(cycle_prices):
+    """
+    Convert cycles into the flat API fields (high_price_1, low_price_1, ...).
+
+    Args:
+        cycle_prices: List of (high, low) tuples, most recent first
+
+    Returns:
+        dict: Field name -> price
+    """
+    fields = {}
+    for i, (high, low) in enumerate(cycle_prices, start=1):
+        fields[f"low_price_{i}"] = low
+        fields[f"high_price_{i}"] = high
+    return fields
+
+def load_cycles(connection, cursor, symbol=None, depth=PRICE_CYCLE_DEPTH, symbols=None):
+    """
+    Load the most recent cycles of one, several or all coins in a single query.
+
+    Args:
+        connection: Database connection
+        cursor: Database cursor
+        symbol: Optional coin symbol, all coins are loaded if neither it nor `symbols` is given
+        depth: Number of cycles to load per coin
+        symbols: Optional list of coin symbols
+
+    Returns:
+        dict: symbol -> `depth` (high, low) tuples, most recent first. Coins without
+        recorded cycles are not included.
+    """
+    placeholder = "%s" if isinstance(connection, psycopg2.extensions.connection) else "?"
+    if symbol is not None:
+        where, params = f"WHERE symbol = {placeholder}", [symbol]
+    elif symbols is not None:
+        condition, params = symbol_filter(connection, symbols)
+        where = f"WHERE {condition}"
+    else:
+        where, params = "", []
+    # Empty cycles are not stored, so the position of a cycle follows from its distance
+    # to the most recent sequence number rather than from its rank
+    cursor.execute(f"""
+        SELECT symbol, position, high, low FROM (
+            SELECT symbol, high, low,
+                   MAX(seq) OVER (PARTITION BY symbol) - seq + 1 AS position
+            FROM price_cycles
+            {where}
+        ) AS ranked
+        WHERE position <= {placeholder}
+        ORDER BY symbol, position
+    """, tuple(params) + (depth,))
+
+    cycles = {}
+    for row_symbol, position, high, low in cursor.fetchall():
+        cycles.setdefault(row_symbol, [EMPTY_CYCLE] * depth)[position - 1] = (high, low)
+    return cycles
+
+def _executemany(connection, cursor, query, rows):
+    if isinstance(connection, psycopg2.extensions.connection):
+        execute_batch(cursor, query, rows, page_size=1000)
+    else:
+        cursor.executemany(query, rows)
+
+def append_cycles(connection, cursor, rows, depth=PRICE_CYCLE_DEPTH):
+    """
+    Append a new most recent cycle for several coins and drop cycles beyond `depth`.
+    The caller is responsible for committing.
+
+    Args:
+        connection: Database connection
+        cursor: Database cursor
+        rows: List of (symbol, high, low) tuples
+        depth: Number of cycles kept per coin
+    """
+    if not rows:
+        return
+
+    placeholder = "%s" if isinstance(connection, psycopg2.extensions.connection) else "?"
+    _executemany(connection, cursor, f"""
+        INSERT INTO price_cycles (symbol, seq, high, low)
+        SELECT {placeholder}, COALESCE(MAX(seq), 0) + 1, {placeholder}, {placeholder}
+        FROM price_cycles
+        WHERE symbol = {placeholder}
+    """, [(symbol, high, low, symbol) for symbol, high, low in rows])
+
+    _executemany(connection, cursor, f"""
+        DELETE FROM price_cycles
+        WHERE symbol = {placeholder}
+          AND seq <= (SELECT MAX(seq) FROM price_cycles WHERE symbol = {placeholder}) - {placeholder}
+    """, [(symbol, symbol, depth) for symbol in {row[0] for row in rows}])
+
+def replace_latest_cycles(connection, cursor, rows):
+    """
+    Overwrite the most recent cycle of several coins, recording it if the coin has no cycles yet.
+    The caller is responsible for committing.
+
+    Args:
+        connection: Database connection
+        cursor: Database cursor
+        rows: List of (symbol, high, low) tuples
+    """
+    if not rows:
+        return
+
+    placeholder = "%s" if isinstance(connection, psycopg2.extensions.connection) else "?"
+    _executemany(connection, cursor, f"""
+        UPDATE price_cycles
+        SET high = {placeholder}, low = {placeholder}, closed_at = CURRENT_TIMESTAMP
+        WHERE symbol = {placeholder}
+          AND seq = (SELECT MAX(seq) FROM price_cycles WHERE symbol = {placeholder})
+    """, [(high, low, symbol, symbol) for symbol, high, low in rows])
+
+    _executemany(connection, cursor, f"""
+        INSERT INTO price_cycles (symbol, seq, high, low)
+        SELECT {placeholder}, 1, {placeholder}, {placeholder}
+        WHERE NOT EXISTS (SELECT 1 FROM price_cycles WHERE symbol = {placeholder})
+    """, [(symbol, high, low, symbol) for symbol, high, low in rows])
+
+def set_cycles(connection, cursor, symbol, cycle_prices):
+    """
+    Replace all cycles of a coin, e.g. after they were edited through the API.
+    Trailing empty cycles are not stored. The caller is responsible for committing.
+
+    Args:
+        connection: Database connection
+        cursor: Database cursor
+        symbol: The coin symbol
+        cycle_prices: List of (high, low) tuples, most recent first
+    """
+    placeholder = "%s" if isinstance(connection, psycopg2.extensions.connection) else "?"
+    cursor.execute(f"DELETE FROM price_cycles WHERE symbol = {placeholder}", (symbol,))
+
+    # Empty cycles before the last recorded one are stored too, the position of a
+    # cycle follows from the most recent sequence number
+    cycle_prices = list(cycle_prices)
+    while cycle_prices and tuple(cycle_prices[-1]) == EMPTY_CYCLE:
+        cycle_prices.pop()
+
+    # The most recent cycle gets the highest sequence number
+    count = len(cycle_prices)
+    rows = [(symbol, count - i, high, low) for i, (high, low) in enumerate(cycle_prices)]
+    _executemany(connection, cursor, f"""
+        INSERT INTO price_cycles (symbol, seq, high, low)
+        VALUES ({placeholder}, {placeholder}, {placeholder}, {placeholder})
+    """, rows)
@@ -0,0 +1,195 @@
+import logging
+import os
+import threading
+import time
+
+# Import PostgreSQL libraries if available
+try:
+    import psycopg2
+    from psycopg2.extras import execute_values
+    POSTGRES_AVAILABLE = True
+except ImportError:
+    POSTGRES_AVAILABLE = False
+
+# Number of price_history rows kept per symbol
+PRICE_HISTORY_LIMIT = 100
+
+# "append" inserts into price_history and prunes it with a retention job,
+# "ring" overwrites PRICE_HISTORY_LIMIT fixed slots per symbol in price_history_ring
+PRICE_HISTORY_MODE = os.getenv('PRICE_HISTORY_MODE', 'append').lower()
+
+# Seconds between retention runs in append mode (0 prunes on every tick)
+PRICE_HISTORY_RETENTION_INTERVAL = float(os.getenv('PRICE_HISTORY_RETENTION_INTERVAL', '300'))
+
+class PriceHistoryStore:
+    """
+    Storage of the raw price ticks used to rebuild the indicator windows.
+
+    In append mode every tick inserts one row per symbol and a set-based retention
+    job trims the table to `limit` rows per symbol on a slower schedule. In ring mode
+    each symbol owns `limit` slots keyed by (symbol, slot) that are overwritten with an
+    UPSERT, so the table never grows and nothing has to be deleted.
+    """
+
+    def __init__(self, mode=PRICE_HISTORY_MODE, limit=PRICE_HISTORY_LIMIT,
+                 retention_interval=PRICE_HISTORY_RETENTION_INTERVAL):
+        if mode not in ('append', 'ring'):
+            raise ValueError(f"Unknown price history mode: {mode}")
+        self.mode = mode
+        self.limit = limit
+        self.retention_interval = retention_interval
+        self._lock = threading.Lock()
+        self._last_retention = None
+        # Ring mode: last sequence number written per symbol
+        self._sequences = {}
+
+    def load_windows(self, connection, cursor, depth):
+        """
+        Load the most recent prices of every symbol in a single query.
+
+        In ring mode this also restores the write position of every symbol.
+
+        Args:
+            connection: Database connection
+            cursor: Database cursor
+            depth: Number of prices to load per symbol
+
+        Returns:
+            dict: symbol -> list of prices, newest first
+        """
+        placeholder = "%s" if isinstance(connection, psycopg2.extensions.connection) else "?"
+        if self.mode == 'ring':
+            query = f"""
+                SELECT symbol, price, seq FROM (
+                    SELECT symbol, price, seq,
+                           ROW_NUMBER() OVER (PARTITION BY symbol ORDER BY seq DESC) AS rn
+                    FROM price_history_ring
+                ) AS ranked
+                WHERE rn <= {placeholder}
+                ORDER BY symbol, rn
+            """
+        else:
+            query = f"""
+                SELECT symbol, price, NULL FROM (
+                    SELECT symbol, price,
+                           ROW_NUMBER() OVER (PARTITION BY symbol ORDER BY timestamp DESC, id DESC) AS rn
+                    FROM price_history
+                ) AS ranked
+                WHERE rn <= {placeholder}
+                ORDER BY symbol, rn
+            """
+        cursor.execute(query, (depth,))
+
+        prices_by_symbol = {}
+        sequences = {}
+        for symbol, price, seq in cursor.fetchall():
+            prices = prices_by_symbol.setdefault(symbol, [])
+            if not prices:
+                sequences[symbol] = seq
+            prices.append(price)
+
+        if self.mode == 'ring':
+            with self._lock:
+                self._sequences = sequences
+        return prices_by_symbol
+
+    def append(self, connection, cursor, rows):
+        """
+        Store one new price per symbol. The caller is responsible for committing.
+
+        Args:
+            connection: Database connection
+            cursor: Database cursor
+            rows: List of (symbol, price) tuples
+        """
+        if not rows:
+            return
+        if self.mode == 'ring':
+            self._write_ring(connection, cursor, rows)
+        elif isinstance(connection, psycopg2.extensions.connection):
+            execute_values(cursor, "INSERT INTO price_history (symbol, price) VALUES %s", rows, page_size=1000)
+        else:
+            cursor.executemany("INSERT INTO price_history (symbol, price) VALUES (?, ?)", rows)
+
+    def _write_ring(self, connection, cursor, rows):
+        ring_rows = []
+        with self._lock:
+            for symbol, price in rows:
+                seq = self._sequences.get(symbol)
+                seq = 0 if seq is None else seq + 1
+                self._sequences[symbol] = seq
+                ring_rows.append((symbol, seq % self.limit, seq, price))
+
+        if isinstance(connection, psycopg2.extensions.connection):
+            execute_values(
+                cursor,
+                """
+                    INSERT INTO price_history_ring (symbol, slot, seq, price, timestamp)
+                    VALUES %s
+                    ON CONFLICT (symbol, slot) DO UPDATE
+                    SET seq = EXCLUDED.seq, price = EXCLUDED.price, timestamp = EXCLUDED.timestamp
+                """,
+                ring_rows,
+                template="(%s, %s, %s, %s, CURRENT_TIMESTAMP)",
+                page_size=1000
+            )
+        else:
+            cursor.executemany(
+                """
+                    INSERT INTO price_history_ring (symbol, slot, seq, price, timestamp)
+                    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT (symbol, slot) DO UPDATE
+                    SET seq = excluded.seq, price = excluded.price, timestamp = excluded.timestamp
+                """,
+                ring_rows
+            )
+
+    def prune(self, connection, cursor):
+        """
+        Trim price_history to `limit` rows per symbol with one set-based DELETE.
+        The caller is responsible for committing.
+
+        Returns:
+            int: Number of deleted rows
+        """
+        if self.mode == 'ring':
+            return 0
+
+        placeholder = "%s" if isinstance(connection, psycopg2.extensions.connection) else "?"
+        cursor.execute(f"""
+            DELETE FROM price_history
+            WHERE id IN (
+                SELECT id FROM (
+                    SELECT id,
+                           ROW_NUMBER() OVER (PARTITION BY symbol ORDER BY timestamp DESC, id DESC) AS rn
+                    FROM price_history
+                ) AS ranked
+                WHERE rn > {placeholder}
+            )
+        """, (self.limit,))
+        deleted = cursor.rowcount
+        logging.info(f"Pruned {deleted} rows from price_history")
+        return deleted
+
+    def prune_if_due(self, connection, cursor):
+        """
+        Run the retention job if `retention_interval` seconds have passed since the last run.
+
+        Returns:
+            int: Number of deleted rows (0 if the job didn't run)
+        """
+        if self.mode == 'ring':
+            return 0
+
+        now = time.monotonic()
+        with self._lock:
+            if self._last_retention is not None and now - self._last_retention < self.retention_interval:
+                return 0
+            self._last_retention = now
+        return self.prune(connection, cursor)
+
+    def invalidate(self):
+        """Forget in-memory write positions, they are restored by the next load_windows()."""
+        with self._lock:
+            self._sequences = {}
+            self._last_retention = None
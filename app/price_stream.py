@@ -0,0 +1,145 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+# Import the WebSocket client if available
+try:
+    import websockets
+    WEBSOCKETS_AVAILABLE = True
+except ImportError:
+    WEBSOCKETS_AVAILABLE = False
+
+# All-market mini-ticker stream: one array per second with every symbol that changed
+BINANCE_WS_URL = os.getenv('BINANCE_WS_URL', 'wss://stream.binance.com:9443/ws/!miniTicker@arr')
+
+# Seconds to wait before reconnecting, doubled after every failed attempt
+STREAM_RECONNECT_DELAY = 1.0
+STREAM_RECONNECT_MAX_DELAY = 60.0
+
+class LatestPriceTable:
+    """
+    Thread-safe table of the latest price of every symbol received from the stream.
+
+    The stream thread writes into it as messages arrive, and the monitor loop reads
+    either the whole table or only the symbols that changed since its last flush.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._prices = {}
+        self._changed = {}
+        self.last_message_at = None
+
+    def update_many(self, prices):
+        """
+        Store new prices.
+
+        Args:
+            prices: dict of symbol -> price
+        """
+        with self._lock:
+            self._prices.update(prices)
+            self._changed.update(prices)
+            self.last_message_at = time.monotonic()
+
+    def snapshot(self):
+        """Get a copy of the latest price of every symbol and reset the changed set."""
+        with self._lock:
+            self._changed = {}
+            return dict(self._prices)
+
+    def take_changes(self):
+        """Get the prices that changed since the previous call (or snapshot) and reset them."""
+        with self._lock:
+            changed, self._changed = self._changed, {}
+            return changed
+
+    def age(self):
+        """Seconds since the last stream message, or None if nothing was received yet."""
+        if self.last_message_at is None:
+            return None
+        return time.monotonic() - self.last_message_at
+
+def parse_mini_tickers(message):
+    """
+    Parse a mini-ticker stream message.
+
+    Args:
+        message: JSON text of a single `24hrMiniTicker` event or an array of them,
+                 optionally wrapped in a combined stream envelope ({"stream", "data"})
+
+    Returns:
+        dict: symbol -> close price
+    """
+    data = json.loads(message)
+    if isinstance(data, dict) and 'data' in data:
+        data = data['data']
+    if isinstance(data, dict):
+        data = [data]
+
+    prices = {}
+    for ticker in data:
+        if ticker.get('e') == '24hrMiniTicker':
+            prices[ticker['s']] = float(ticker['c'])
+    return prices
+
+class MiniTickerStream:
+    """
+    Subscriber to the all-market mini-ticker WebSocket stream.
+
+    consume() can run as a task on an existing event loop, or start() runs it on its own
+    event loop in a daemon thread. Every message is written into a LatestPriceTable, and
+    the connection is re-established with exponential backoff when it drops (Binance also
+    closes every connection after 24 hours).
+    """
+
+    def __init__(self, url=BINANCE_WS_URL, table=None):
+        if not WEBSOCKETS_AVAILABLE:
+            raise RuntimeError("The websockets package is required for streaming price ingestion")
+        self.url = url
+        self.table = table if table is not None else LatestPriceTable()
+        self.connected = False
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Start the subscriber thread."""
+        self._thread = threading.Thread(target=self._run, daemon=True, name="mini-ticker-stream")
+        self._thread.start()
+        logging.info(f"Started mini-ticker stream from {self.url}")
+        return self._thread
+
+    def stop(self):
+        """Ask the subscriber thread to exit after the current message."""
+        self._stop.set()
+
+    def _run(self):
+        asyncio.run(self.consume())
+
+    async def consume(self):
+        """Receive stream messages until stop() is called, reconnecting when the connection drops."""
+        delay = STREAM_RECONNECT_DELAY
+        while not self._stop.is_set():
+            try:
+                async with websockets.connect(self.url, max_size=None) as websocket:
+                    self.connected = True
+                    delay = STREAM_RECONNECT_DELAY
+                    logging.info("Connected to mini-ticker stream")
+                    async for message in websocket:
+                        prices = parse_mini_tickers(message)
+                        if prices:
+                            self.table.update_many(prices)
+                        if self._stop.is_set():
+                            break
+            except Exception as e:
+                logging.error(f"Mini-ticker stream error: {e}")
+            finally:
+                self.connected = False
+
+            if not self._stop.is_set():
+                logging.info(f"Reconnecting to mini-ticker stream in {delay:.0f} seconds")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, STREAM_RECONNECT_MAX_DELAY)
@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+# Binance request weight limit per minute and IP
+BINANCE_WEIGHT_LIMIT = int(os.getenv('BINANCE_WEIGHT_LIMIT', '6000'))
+
+# Fraction of the weight limit the governor lets through, keeping a margin below the cap
+BINANCE_WEIGHT_HEADROOM = float(os.getenv('BINANCE_WEIGHT_HEADROOM', '0.9'))
+
+# Fraction of the budget user-triggered requests may use; the rest is reserved for the monitor tick
+BINANCE_USER_WEIGHT_SHARE = float(os.getenv('BINANCE_USER_WEIGHT_SHARE', '0.7'))
+
+# Seconds a request may wait for weight before it is shed
+BINANCE_MONITOR_MAX_WAIT = float(os.getenv('BINANCE_MONITOR_MAX_WAIT', '30'))
+BINANCE_USER_MAX_WAIT = float(os.getenv('BINANCE_USER_MAX_WAIT', '2'))
+
+# Request priorities
+PRIORITY_MONITOR = 0
+PRIORITY_USER = 1
+
+# Weight of the endpoints we call: (without symbol, with symbol)
+ENDPOINT_WEIGHTS = {
+    "/api/v3/ticker/price": (4, 2),
+    "/api/v3/aggTrades": (2, 2),
+    "/api/v3/historicalTrades": (25, 25),
+}
+
+def request_weight(path, params=None):
+    """
+    Get the request weight Binance charges for a call.
+
+    Args:
+        path: Endpoint path
+        params: Query parameters
+
+    Returns:
+        int: The request weight
+    """
+    params = params or {}
+    if path == "/api/v3/trades":
+        # Weight 25 since the limit of the trades endpoint was raised to 1000
+        return 25
+    if path == "/api/v3/ticker/price" and "symbols" in params:
+        return 4
+    without_symbol, with_symbol = ENDPOINT_WEIGHTS.get(path, (1, 1))
+    return with_symbol if "symbol" in params else without_symbol
+
+class RateLimitExceeded(Exception):
+    """Raised when a request is shed because the weight budget is exhausted."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class WeightGovernor:
+    """
+    Token bucket of Binance request weight shared by all outbound calls.
+
+    The bucket holds `limit * headroom` weight and refills over a minute. Every response
+    reports the weight Binance has counted for the current minute (X-MBX-USED-WEIGHT-1M),
+    which caps the bucket, so calls made before a restart or by other processes on the
+    same IP are accounted for. User requests may only draw the bucket down to the
+    reserve kept for the monitor tick; when no weight is left they wait a short time
+    and are then shed, while monitor requests wait longer. A 429/418 response stops
+    all requests until its Retry-After has passed.
+    """
+
+    def __init__(self, limit=BINANCE_WEIGHT_LIMIT, headroom=BINANCE_WEIGHT_HEADROOM,
+                 user_share=BINANCE_USER_WEIGHT_SHARE):
+        self.capacity = limit * headroom
+        self.refill_rate = self.capacity / 60.0
+        self.user_floor = self.capacity * (1 - user_share)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.used_weight = 0
+        self.waits = 0
+        self.shed = 0
+        self.bans = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+    def _reserve(self, weight, priority):
+        """Take `weight` from the bucket, or return the seconds to wait until it can be taken."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            self._refill(now)
+            floor = 0.0 if priority == PRIORITY_MONITOR else self.user_floor
+            # Requests heavier than the bucket can never fit, let them through on a full bucket
+            needed = min(weight, self.capacity - floor)
+            if self.tokens - floor >= needed:
+                self.tokens -= weight
+                return 0.0
+            return (needed - (self.tokens - floor)) / self.refill_rate
+
+    def _max_wait(self, priority):
+        return BINANCE_MONITOR_MAX_WAIT if priority == PRIORITY_MONITOR else BINANCE_USER_MAX_WAIT
+
+    def _shed(self, weight, wait):
+        with self._lock:
+            self.shed += 1
+        logging.warning(f"Shedding Binance request of weight {weight}, weight budget exhausted for {wait:.1f}s")
+        return RateLimitExceeded(f"Binance request weight limit reached, retry in {wait:.0f}s", wait)
+
+    def acquire(self, weight, priority=PRIORITY_USER):
+        """
+        Wait until `weight` is available.
+
+        Raises:
+            RateLimitExceeded: If the weight isn't available within the priority's maximum wait
+        """
+        deadline = time.monotonic() + self._max_wait(priority)
+        wait = self._reserve(weight, priority)
+        if wait > 0:
+            with self._lock:
+                self.waits += 1
+        while wait > 0:
+            if time.monotonic() + wait > deadline:
+                raise self._shed(weight, wait)
+            time.sleep(wait)
+            wait = self._reserve(weight, priority)
+
+    async def acquire_async(self, weight, priority=PRIORITY_USER):
+        """Async version of acquire()."""
+        deadline = time.monotonic() + self._max_wait(priority)
+        wait = self._reserve(weight, priority)
+        if wait > 0:
+            with self._lock:
+                self.waits += 1
+        while wait > 0:
+            if time.monotonic() + wait > deadline:
+                raise self._shed(weight, wait)
+            await asyncio.sleep(wait)
+            wait = self._reserve(weight, priority)
+
+    def observe(self, status_code, headers):
+        """
+        Update the bucket from a Binance response.
+
+        Args:
+            status_code: HTTP status of the response
+            headers: Response headers
+        """
+        used = headers.get("X-MBX-USED-WEIGHT-1M")
+        with self._lock:
+            if used is not None:
+                try:
+                    self.used_weight = int(used)
+                    self._refill(time.monotonic())
+                    self.tokens = min(self.tokens, self.capacity - self.used_weight)
+                except ValueError:
+                    pass
+
+            if status_code in (418, 429):
+                try:
+                    retry_after = float(headers.get("Retry-After") or 60)
+                except ValueError:
+                    retry_after = 60.0
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+                self.bans += 1
+                logging.error(f"Binance returned {status_code}, pausing all requests for {retry_after:.0f}s")
+
+    def stats(self):
+        """Current budget and counters of waits, shed requests and 429/418 responses."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "capacity": self.capacity,
+                "available": max(self.tokens, 0.0),
+                "used_weight_1m": self.used_weight,
+                "blocked_for": max(self.blocked_until - time.monotonic(), 0.0),
+                "waits": self.waits,
+                "shed": self.shed,
+                "bans": self.bans,
+            }
+
+# Governor shared by all outbound Binance calls of this process
+weight_governor = WeightGovernor()
@@ -0,0 +1,288 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+
+from .database import symbol_filter
+from .price_history import PRICE_HISTORY_RETENTION_INTERVAL
+
+# Import PostgreSQL libraries if available
+try:
+    import psycopg2
+    from psycopg2.extras import execute_values
+    POSTGRES_AVAILABLE = True
+except ImportError:
+    POSTGRES_AVAILABLE = False
+
+# Roll the price ticks up into OHLC bars in price_rollups
+PRICE_ROLLUPS = os.getenv('PRICE_ROLLUPS', 'true').lower() in ('1', 'true', 'yes')
+
+# Days of bars kept per tier
+ROLLUP_RETENTION_1M_DAYS = float(os.getenv('ROLLUP_RETENTION_1M_DAYS', '2'))
+ROLLUP_RETENTION_5M_DAYS = float(os.getenv('ROLLUP_RETENTION_5M_DAYS', '30'))
+ROLLUP_RETENTION_1H_DAYS = float(os.getenv('ROLLUP_RETENTION_1H_DAYS', '365'))
+
+# Number of bars a query returns at most when no resolution is requested
+ROLLUP_MAX_BARS = int(os.getenv('ROLLUP_MAX_BARS', '500'))
+
+RollupTier = namedtuple("RollupTier", "name seconds retention")
+
+# Tiers from finest to coarsest; each resolution is a multiple of the previous one
+ROLLUP_TIERS = (
+    RollupTier("1m", 60, ROLLUP_RETENTION_1M_DAYS * 86400),
+    RollupTier("5m", 300, ROLLUP_RETENTION_5M_DAYS * 86400),
+    RollupTier("1h", 3600, ROLLUP_RETENTION_1H_DAYS * 86400),
+)
+
+def floor_bucket(timestamp, seconds):
+    """Start of the `seconds` wide bucket containing the Unix timestamp."""
+    return int(timestamp // seconds) * seconds
+
+class PriceRollupStore:
+    """
+    Tiered OHLC bars of the price ticks, for history beyond the indicator windows.
+
+    Every tick is merged into the bar of the finest tier with an UPSERT (the high and
+    low widen, the close moves). When a bar of the finest tier closes, the bars of each
+    coarser tier covering it are recomputed from the tier below with one set-based
+    statement, for the symbols this process recorded (with sharding, each worker
+    compacts its own symbols); recomputing is idempotent, so a restart or a new leader simply compacts
+    again from the latest bar. Each tier is trimmed to its own retention, so the table
+    size is bounded by the number of symbols rather than by time.
+    """
+
+    def __init__(self, tiers=ROLLUP_TIERS, enabled=PRICE_ROLLUPS,
+                 retention_interval=PRICE_HISTORY_RETENTION_INTERVAL):
+        self.tiers = tuple(tiers)
+        self.enabled = enabled
+        self.retention_interval = retention_interval
+        self._lock = threading.Lock()
+        self._last_retention = None
+        # Finest bucket written since the last compaction, None until read from the database
+        self._pending_bucket = None
+        # Symbols recorded since the last compaction
+        self._pending_symbols = set()
+
+    def record(self, connection, cursor, rows, now=None):
+        """
+        Merge the prices of a tick into the bars, and compact the coarser tiers when a
+        bar of the finest tier closed. The caller is responsible for committing.
+
+        Args:
+            connection: Database connection
+            cursor: Database cursor
+            rows: List of (symbol, price) tuples
+            now: Unix time of the tick (default: the current time)
+        """
+        if not self.enabled or not rows:
+            return
+        base = self.tiers[0]
+        bucket = floor_bucket(time.time() if now is None else now, base.seconds)
+        is_postgres = isinstance(connection, psycopg2.extensions.connection)
+
+        with self._lock:
+            pending = self._pending_bucket
+            self._pending_symbols.update(symbol for symbol, _ in rows)
+        if pending is None:
+            # Continue from the latest bar, which may not be compacted yet
+            placeholder = "%s" if is_postgres else "?"
+            cursor.execute(f"SELECT MAX(bucket) FROM price_rollups WHERE resolution = {placeholder}", (base.seconds,))
+            latest = cursor.fetchone()[0]
+            pending = bucket if latest is None else min(int(latest), bucket)
+
+        bars = [(symbol, base.seconds, bucket, price, price, price, price) for symbol, price in rows]
+        if is_postgres:
+            execute_values(
+                cursor,
+                """
+                    INSERT INTO price_rollups (symbol, resolution, bucket, open, high, low, close, ticks)
+                    VALUES %s
+                    ON CONFLICT (symbol, resolution, bucket) DO UPDATE
+                    SET high = GREATEST(price_rollups.high, EXCLUDED.high),
+                        low = LEAST(price_rollups.low, EXCLUDED.low),
+                        close = EXCLUDED.close,
+                        ticks = price_rollups.ticks + 1
+                """,
+                bars,
+                template="(%s, %s, %s, %s, %s, %s, %s, 1)",
+                page_size=1000
+            )
+        else:
+            cursor.executemany(
+                """
+                    INSERT INTO price_rollups (symbol, resolution, bucket, open, high, low, close, ticks)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, 1)
+                    ON CONFLICT (symbol, resolution, bucket) DO UPDATE
+                    SET high = MAX(price_rollups.high, excluded.high),
+                        low = MIN(price_rollups.low, excluded.low),
+                        close = excluded.close,
+                        ticks = price_rollups.ticks + 1
+                """,
+                bars
+            )
+
+        if pending < bucket:
+            with self._lock:
+                symbols, self._pending_symbols = self._pending_symbols, set()
+            for source, target in zip(self.tiers, self.tiers[1:]):
+                self._compact(connection, cursor, source, target, pending, bucket + base.seconds, symbols)
+        with self._lock:
+            self._pending_bucket = bucket
+
+    def _compact(self, connection, cursor, source, target, start, end, symbols):
+        """Recompute the `target` bars of `symbols` overlapping [start, end) from the `source` bars."""
+        placeholder = "%s" if isinstance(connection, psycopg2.extensions.connection) else "?"
+        low = floor_bucket(start, target.seconds)
+        high = floor_bucket(end - 1, target.seconds) + target.seconds
+        condition, params = symbol_filter(connection, sorted(symbols))
+        # The open and close of a bar are those of its first and last source bar; buckets
+        # are integers, so the division truncates on both backends
+        cursor.execute(f"""
+            INSERT INTO price_rollups (symbol, resolution, bucket, open, high, low, close, ticks)
+            SELECT g.symbol, {target.seconds}, g.bucket, o.open, g.high, g.low, c.close, g.ticks
+            FROM (
+                SELECT symbol, bucket / {target.seconds} * {target.seconds} AS bucket,
+                       MIN(bucket) AS first_bucket, MAX(bucket) AS last_bucket,
+                       MAX(high) AS high, MIN(low) AS low, SUM(ticks) AS ticks
+                FROM price_rollups
+                WHERE resolution = {source.seconds} AND bucket >= {placeholder} AND bucket < {placeholder}
+                  AND {condition}
+                GROUP BY symbol, bucket / {target.seconds} * {target.seconds}
+            ) AS g
+            JOIN price_rollups AS o
+              ON o.symbol = g.symbol AND o.resolution = {source.seconds} AND o.bucket = g.first_bucket
+            JOIN price_rollups AS c
+              ON c.symbol = g.symbol AND c.resolution = {source.seconds} AND c.bucket = g.last_bucket
+            WHERE TRUE
+            ON CONFLICT (symbol, resolution, bucket) DO UPDATE
+            SET open = EXCLUDED.open, high = EXCLUDED.high, low = EXCLUDED.low,
+                close = EXCLUDED.close, ticks = EXCLUDED.ticks
+        """, [low, high] + params)
+
+    def prune(self, connection, cursor, now=None):
+        """
+        Delete the bars older than the retention of their tier.
+        The caller is responsible for committing.
+
+        Returns:
+            int: Number of deleted rows
+        """
+        if not self.enabled:
+            return 0
+        now = time.time() if now is None else now
+        placeholder = "%s" if isinstance(connection, psycopg2.extensions.connection) else "?"
+        deleted = 0
+        for tier in self.tiers:
+            cursor.execute(
+                f"DELETE FROM price_rollups WHERE resolution = {placeholder} AND bucket < {placeholder}",
+                (tier.seconds, floor_bucket(now - tier.retention, tier.seconds))
+            )
+            deleted += max(cursor.rowcount, 0)
+        if deleted:
+            logging.info(f"Pruned {deleted} rows from price_rollups")
+        return deleted
+
+    def prune_if_due(self, connection, cursor):
+        """
+        Run the retention job if `retention_interval` seconds have passed since the last run.
+
+        Returns:
+            int: Number of deleted rows (0 if the job didn't run)
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._last_retention is not None and now - self._last_retention < self.retention_interval:
+                return 0
+            self._last_retention = now
+        return self.prune(connection, cursor)
+
+    def invalidate(self):
+        """Forget the compaction position, it is read from the database on the next record()."""
+        with self._lock:
+            self._pending_bucket = None
+            self._last_retention = None
+
+    def select_tier(self, start, end, resolution=None, now=None):
+        """
+        Pick the tier to answer a query from: the coarsest tier that is at least as fine
+        as the resolution and still holds bars at `start`. If no such tier reaches back
+        to `start`, a coarser tier with a longer retention is used instead.
+
+        Args:
+            start: Unix time of the first bar
+            end: Unix time after the last bar
+            resolution: Seconds per bar (default: the range divided into ROLLUP_MAX_BARS)
+            now: Current Unix time
+
+        Returns:
+            tuple: (RollupTier, resolution in seconds, a multiple of the tier's)
+        """
+        now = time.time() if now is None else now
+        if resolution is None:
+            resolution = (end - start) / ROLLUP_MAX_BARS
+        fine_enough = [tier for tier in self.tiers if tier.seconds <= resolution] or [self.tiers[0]]
+        covering = [tier for tier in self.tiers if now - tier.retention <= start]
+
+        candidates = [tier for tier in fine_enough if tier in covering]
+        if candidates:
+            tier = candidates[-1]
+        elif covering:
+            tier = covering[0]
+        else:
+            tier = max(self.tiers, key=lambda t: t.retention)
+        resolution = max(math.ceil(resolution / tier.seconds), 1) * tier.seconds
+        return tier, resolution
+
+    def load_bars(self, connection, cursor, symbol, start, end, resolution=None, now=None):
+        """
+        Load the OHLC bars of a symbol, merging the bars of the selected tier up to the
+        requested resolution. Bars are aligned to multiples of the resolution in Unix time.
+
+        Args:
+            connection: Database connection
+            cursor: Database cursor
+            symbol: The coin symbol
+            start: Unix time of the first bar
+            end: Unix time after the last bar
+            resolution: Optional seconds per bar
+            now: Current Unix time
+
+        Returns:
+            dict: Symbol, tier, resolution and the bars, oldest first
+        """
+        tier, resolution = self.select_tier(start, end, resolution, now)
+        placeholder = "%s" if isinstance(connection, psycopg2.extensions.connection) else "?"
+        cursor.execute(f"""
+            SELECT bucket, open, high, low, close, ticks
+            FROM price_rollups
+            WHERE symbol = {placeholder} AND resolution = {placeholder}
+              AND bucket >= {placeholder} AND bucket < {placeholder}
+            ORDER BY bucket
+        """, (symbol, tier.seconds, floor_bucket(start, resolution), end))
+
+        bars = []
+        for bucket, open_price, high, low, close, ticks in cursor.fetchall():
+            time_bucket = floor_bucket(bucket, resolution)
+            if bars and bars[-1]["time"] == time_bucket:
+                bar = bars[-1]
+                bar["high"] = max(bar["high"], high)
+                bar["low"] = min(bar["low"], low)
+                bar["close"] = close
+                bar["ticks"] += ticks
+            else:
+                bars.append({"time": time_bucket, "open": open_price, "high": high, "low": low,
+                             "close": close, "ticks": ticks})
+
+        return {
+            "symbol": symbol,
+            "tier": tier.name,
+            "resolution": resolution,
+            "start": floor_bucket(start, resolution),
+            "end": end,
+            "bars": bars,
+        }
+
+# OHLC bars of the price ticks, written by the price monitor and read by the API
+price_rollup_store = PriceRollupStore()
@@ -0,0 +1,180 @@
+import bisect
+import logging
+import math
+import os
+import threading
+import time
+
+# What to do when a tick runs past the next deadline: skip the missed ticks and wait for the
+# next slot, or merge them into one tick that runs right away
+TICK_OVERRUN_POLICY = os.getenv('TICK_OVERRUN_POLICY', 'skip').lower()
+
+# Shorten the tick interval while the market is volatile
+ADAPTIVE_TICK_INTERVAL = os.getenv('ADAPTIVE_TICK_INTERVAL', 'false').lower() in ('1', 'true', 'yes')
+
+# Shortest interval the adaptive scheduler goes down to, in seconds
+MIN_PRICE_SAMPLE_INTERVAL = float(os.getenv('MIN_PRICE_SAMPLE_INTERVAL', '5'))
+
+# Fraction of the symbols completing a price cycle per tick at which the interval reaches its minimum
+TICK_VOLATILITY_TARGET = float(os.getenv('TICK_VOLATILITY_TARGET', '0.05'))
+
+# Weight of the latest tick in the smoothed volatility
+VOLATILITY_SMOOTHING = 0.3
+
+# Upper bounds of the tick duration histogram buckets, in seconds
+TICK_DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class DurationHistogram:
+    """Counts of durations per bucket, with their sum, in the shape of a Prometheus histogram."""
+
+    def __init__(self, buckets=TICK_DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: Cumulative counts per upper bound ("+Inf" last), sum and count
+        """
+        with self._lock:
+            cumulative = []
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+                total += count
+                cumulative.append((bound, total))
+            return {"buckets": cumulative, "sum": self.sum, "count": self.count}
+
+class TickScheduler:
+    """
+    Fixed-rate scheduling of the price monitor tick on the monotonic clock.
+
+    Deadlines are anchored: each one is the previous deadline plus the interval, not the
+    end of the previous tick plus the interval, so the tick duration doesn't add up into
+    drift. A tick still running at the next deadline is an overrun; the missed deadlines
+    are then either skipped (the next tick waits for the next slot on the grid) or merged
+    into a single tick that runs right away.
+
+    With adaptive scheduling, the fraction of symbols whose price fell more than
+    cycle_end_percent from its high (completing a price cycle) is smoothed over the ticks,
+    and the interval shrinks linearly from the base interval down to `min_interval` as it
+    approaches `volatility_target`.
+    """
+
+    def __init__(self, interval, min_interval=MIN_PRICE_SAMPLE_INTERVAL, adaptive=ADAPTIVE_TICK_INTERVAL,
+                 overrun_policy=TICK_OVERRUN_POLICY, volatility_target=TICK_VOLATILITY_TARGET):
+        if overrun_policy not in ('skip', 'merge'):
+            logging.warning(f"Unknown tick overrun policy '{overrun_policy}', skipping missed ticks")
+            overrun_policy = 'skip'
+        self.base_interval = interval
+        self.min_interval = min(min_interval, interval)
+        self.adaptive = adaptive
+        self.overrun_policy = overrun_policy
+        self.volatility_target = volatility_target
+        self.interval = interval
+        self.volatility = 0.0
+        self.durations = DurationHistogram()
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.merged = 0
+        self.last_duration = 0.0
+        self.deadline = time.monotonic()
+        self._started = None
+        self._crossings = 0
+        self._symbols = 0
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Anchor the schedule at the current time, so the first tick runs right away."""
+        with self._lock:
+            self.deadline = time.monotonic()
+            self._started = None
+
+    def delay(self):
+        """Seconds until the next tick is due (0 if it is due)."""
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def due(self):
+        return time.monotonic() >= self.deadline
+
+    def tick_started(self):
+        self._started = time.monotonic()
+
+    def record_crossings(self, crossings, symbols):
+        """
+        Report the symbols that completed a price cycle, used by the adaptive interval.
+
+        Args:
+            crossings: Number of symbols whose price fell more than cycle_end_percent from the high
+            symbols: Number of symbols updated
+        """
+        with self._lock:
+            self._crossings += crossings
+            self._symbols = max(self._symbols, symbols)
+
+    def _adapt(self):
+        if self._symbols:
+            fraction = self._crossings / self._symbols
+            self.volatility += VOLATILITY_SMOOTHING * (fraction - self.volatility)
+        self._crossings = 0
+        self._symbols = 0
+        if not self.adaptive or self.volatility_target <= 0:
+            return
+
+        pressure = min(self.volatility / self.volatility_target, 1.0)
+        interval = self.base_interval - (self.base_interval - self.min_interval) * pressure
+        if abs(interval - self.interval) >= 0.5:
+            logging.info(f"Tick interval adapted to {interval:.1f}s (volatility {self.volatility:.2%})")
+            self.interval = interval
+
+    def tick_finished(self):
+        """Record the tick's duration and schedule the next tick."""
+        now = time.monotonic()
+        started = self._started if self._started is not None else now
+        duration = now - started
+        self.durations.observe(duration)
+
+        with self._lock:
+            self.ticks += 1
+            self.last_duration = duration
+            self._started = None
+            self._adapt()
+
+            self.deadline += self.interval
+            if now > self.deadline:
+                missed = math.floor((now - self.deadline) / self.interval) + 1
+                self.overruns += 1
+                if self.overrun_policy == 'merge':
+                    # Run once now for all the missed deadlines, then continue on the grid
+                    self.deadline += (missed - 1) * self.interval
+                    self.merged += missed
+                else:
+                    self.deadline += missed * self.interval
+                    self.skipped += missed
+                logging.warning(
+                    f"Price tick took {duration:.2f}s, overrunning the {self.interval:.1f}s interval; "
+                    f"{'merged' if self.overrun_policy == 'merge' else 'skipped'} {missed} missed tick(s)"
+                )
+
+    def stats(self):
+        """Current interval, smoothed volatility, tick and overrun counters and the duration histogram."""
+        with self._lock:
+            return {
+                "interval": self.interval,
+                "volatility": self.volatility,
+                "ticks": self.ticks,
+                "overruns": self.overruns,
+                "skipped": self.skipped,
+                "merged": self.merged,
+                "last_duration": self.last_duration,
+                "durations": self.durations.snapshot(),
+            }
@@ -0,0 +1,161 @@
+import logging
+import os
+import socket
+import time
+import zlib
+
+# Import PostgreSQL libraries if available
+try:
+    import psycopg2
+    POSTGRES_AVAILABLE = True
+except ImportError:
+    POSTGRES_AVAILABLE = False
+
+# Number of shards the monitored symbols are split into; 0 disables sharding
+MONITOR_SHARD_COUNT = int(os.getenv('MONITOR_SHARD_COUNT', '0'))
+
+# Unique name of this monitor worker
+MONITOR_WORKER_ID = os.getenv('MONITOR_WORKER_ID') or f"{socket.gethostname()}-{os.getpid()}"
+
+# Seconds a shard lease (and a worker heartbeat) stays valid without being renewed
+SHARD_LEASE_TTL = float(os.getenv('SHARD_LEASE_TTL', '60'))
+
+def shard_of(symbol, shard_count):
+    """
+    Get the shard a symbol belongs to.
+
+    Uses CRC32 rather than hash(), so every worker process maps a symbol to the same shard.
+    """
+    return zlib.crc32(symbol.encode("utf-8")) % shard_count
+
+class ShardCoordinator:
+    """
+    Splits the monitored symbols between monitor workers through lease rows in the database.
+
+    Every worker heartbeats in monitor_workers and owns its fair share of the rows in
+    monitor_shard_leases, renewing the leases on every sync. The fair share is
+    floor(shards / live workers), plus one for the first (shards % live workers) workers
+    by worker id, so the shares add up to the shard count and no worker is left idle. A worker with more than its share releases the extra shards, so a new
+    worker picks them up; shards of a worker that stopped renewing expire after
+    SHARD_LEASE_TTL seconds and are claimed by the others. Claims are conditional updates,
+    so two workers can never own the same shard.
+    """
+
+    def __init__(self, shard_count=MONITOR_SHARD_COUNT, worker_id=MONITOR_WORKER_ID, lease_ttl=SHARD_LEASE_TTL):
+        self.shard_count = shard_count
+        self.worker_id = worker_id
+        self.lease_ttl = lease_ttl
+        self.owned = frozenset()
+        self.symbols = []
+        self.synced_at = 0.0
+        self._initialized = False
+
+    def sync_due(self):
+        """Leases are renewed three times per TTL, so a missed sync doesn't lose them."""
+        return time.monotonic() - self.synced_at >= self.lease_ttl / 3
+
+    def owns(self, symbol):
+        """Check whether this worker currently monitors a symbol."""
+        return shard_of(symbol, self.shard_count) in self.owned
+
+    def sync(self, connection, cursor):
+        """
+        Heartbeat, renew the owned leases and claim or release shards to reach the fair share.
+        The caller is responsible for committing.
+
+        Args:
+            connection: Database connection
+            cursor: Database cursor
+
+        Returns:
+            bool: True if the set of owned shards changed
+        """
+        placeholder = "%s" if POSTGRES_AVAILABLE and isinstance(connection, psycopg2.extensions.connection) else "?"
+        now = time.time()
+        expires_at = now + self.lease_ttl
+
+        if not self._initialized:
+            cursor.executemany(f"""
+                INSERT INTO monitor_shard_leases (shard, owner, expires_at)
+                VALUES ({placeholder}, NULL, 0)
+                ON CONFLICT (shard) DO NOTHING
+            """, [(shard,) for shard in range(self.shard_count)])
+            self._initialized = True
+
+        cursor.execute(f"""
+            INSERT INTO monitor_workers (worker_id, heartbeat_at)
+            VALUES ({placeholder}, {placeholder})
+            ON CONFLICT (worker_id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at
+        """, (self.worker_id, now))
+        cursor.execute(f"DELETE FROM monitor_workers WHERE heartbeat_at < {placeholder}", (now - self.lease_ttl,))
+        cursor.execute("SELECT worker_id FROM monitor_workers ORDER BY worker_id")
+        workers = [row[0] for row in cursor.fetchall()]
+        live_workers = max(len(workers), 1)
+        rank = workers.index(self.worker_id) if self.worker_id in workers else len(workers)
+        fair_share = self.shard_count // live_workers + (1 if rank < self.shard_count % live_workers else 0)
+
+        # Renew our leases; a lease that expired and was claimed by another worker is lost
+        cursor.execute(f"""
+            UPDATE monitor_shard_leases SET expires_at = {placeholder}
+            WHERE owner = {placeholder} AND shard < {placeholder}
+        """, (expires_at, self.worker_id, self.shard_count))
+        cursor.execute(f"""
+            SELECT shard FROM monitor_shard_leases
+            WHERE owner = {placeholder} AND shard < {placeholder}
+            ORDER BY shard
+        """, (self.worker_id, self.shard_count))
+        owned = [row[0] for row in cursor.fetchall()]
+
+        if len(owned) > fair_share:
+            # Hand the extra shards over to the other workers
+            extra = owned[fair_share:]
+            cursor.executemany(f"""
+                UPDATE monitor_shard_leases SET owner = NULL, expires_at = 0
+                WHERE shard = {placeholder} AND owner = {placeholder}
+            """, [(shard, self.worker_id) for shard in extra])
+            owned = owned[:fair_share]
+        elif len(owned) < fair_share:
+            cursor.execute(f"""
+                SELECT shard FROM monitor_shard_leases
+                WHERE (owner IS NULL OR expires_at < {placeholder}) AND shard < {placeholder}
+                ORDER BY shard
+            """, (now, self.shard_count))
+            for (shard,) in cursor.fetchall():
+                if len(owned) >= fair_share:
+                    break
+                cursor.execute(f"""
+                    UPDATE monitor_shard_leases SET owner = {placeholder}, expires_at = {placeholder}
+                    WHERE shard = {placeholder} AND (owner IS NULL OR expires_at < {placeholder})
+                """, (self.worker_id, expires_at, shard, now))
+                if cursor.rowcount == 1:
+                    owned.append(shard)
+
+        cursor.execute("SELECT symbol FROM coin_monitor")
+        owned = frozenset(owned)
+        self.symbols = sorted(row[0] for row in cursor.fetchall() if shard_of(row[0], self.shard_count) in owned)
+        self.synced_at = time.monotonic()
+
+        changed = owned != self.owned
+        if changed:
+            logging.info(
+                f"Worker {self.worker_id} owns {len(owned)}/{self.shard_count} shards "
+                f"({len(self.symbols)} symbols, {live_workers} live workers)"
+            )
+        self.owned = owned
+        return changed
+
+    def release(self, connection, cursor):
+        """
+        Give up all leases and the heartbeat, e.g. on shutdown, so other workers take over
+        right away. The caller is responsible for committing.
+        """
+        placeholder = "%s" if POSTGRES_AVAILABLE and isinstance(connection, psycopg2.extensions.connection) else "?"
+        cursor.execute(f"""
+            UPDATE monitor_shard_leases SET owner = NULL, expires_at = 0 WHERE owner = {placeholder}
+        """, (self.worker_id,))
+        cursor.execute(f"DELETE FROM monitor_workers WHERE worker_id = {placeholder}", (self.worker_id,))
+        self.owned = frozenset()
+        self.symbols = []
+
+# Coordinator of this process, or None when sharding is disabled
+shard_coordinator = ShardCoordinator() if MONITOR_SHARD_COUNT > 0 else None
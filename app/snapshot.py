@@ -0,0 +1,267 @@
+import json
+import logging
+import threading
+import time
+from datetime import date, datetime
+from types import MappingProxyType
+
+# Fields rewritten on every tick that don't count as a change for ?since= deltas
+VOLATILE_FIELDS = ("updated_at",)
+
+# Number of serialized delta and query responses cached per snapshot
+DELTA_CACHE_SIZE = 16
+
+def _json_default(value):
+    # Timestamps are written in ISO format, as FastAPI's jsonable_encoder does
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _encode_json(value):
+    # Same encoding FastAPI's JSONResponse uses
+    return json.dumps(
+        value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"),
+        default=_json_default
+    ).encode("utf-8")
+
+def _plain_record(coin):
+    # Readers see the timestamps as the strings they are served as
+    return {key: _json_default(value) if isinstance(value, (datetime, date)) else value
+            for key, value in coin.items()}
+
+def _stable_fields(coin):
+    return {key: value for key, value in coin.items() if key not in VOLATILE_FIELDS}
+
+class CoinSnapshot:
+    """
+    Immutable, versioned view of all coin monitor records published by the price tick.
+
+    The JSON body of the coin list is serialized once when the snapshot is built, so
+    API handlers can return it as-is no matter how many clients request it. Records that
+    didn't change since the previous snapshot reuse its serialized rows. The snapshot
+    also knows the version in which each symbol last changed, so it can answer
+    "what changed since version N" without keeping old snapshots around.
+    """
+
+    __slots__ = ("version", "created_at", "coins", "by_symbol", "body", "etag",
+                 "base_version", "changed_at", "removed_at", "_rows", "_deltas", "_queries", "_lock")
+
+    def __init__(self, version, coins, previous=None):
+        self.version = version
+        self.created_at = time.time()
+        previous_coins = previous.by_symbol if previous is not None else {}
+        records = []
+        rows = {}
+        changed_at = {}
+        for coin in coins:
+            symbol = coin["symbol"]
+            old = previous_coins.get(symbol)
+            if coin is not old:
+                coin = _plain_record(coin)
+                if coin == old:
+                    coin = old
+            if coin is old:
+                # Unchanged record, keep its serialized row and version
+                records.append(old)
+                rows[symbol] = previous._rows[symbol]
+                changed_at[symbol] = previous.changed_at[symbol]
+                continue
+
+            record = MappingProxyType(coin)
+            records.append(record)
+            rows[symbol] = _encode_json(coin)
+            if old is not None and _stable_fields(old) == _stable_fields(record):
+                changed_at[symbol] = previous.changed_at[symbol]
+            else:
+                changed_at[symbol] = version
+
+        self.coins = tuple(records)
+        self.by_symbol = MappingProxyType({coin["symbol"]: coin for coin in self.coins})
+        self._rows = rows
+        self.body = b"[" + b",".join(rows[coin["symbol"]] for coin in self.coins) + b"]"
+        self.etag = f'"{version}"'
+
+        if previous is None:
+            # Deltas can only be computed for versions published by this process
+            self.base_version = version
+            removed_at = {}
+        else:
+            self.base_version = previous.base_version
+            removed_at = {
+                symbol: removed_version for symbol, removed_version in previous.removed_at.items()
+                if symbol not in self.by_symbol
+            }
+            for symbol in previous.by_symbol:
+                if symbol not in self.by_symbol:
+                    removed_at[symbol] = version
+
+        self.changed_at = MappingProxyType(changed_at)
+        self.removed_at = MappingProxyType(removed_at)
+        self._deltas = {}
+        self._queries = {}
+        self._lock = threading.Lock()
+
+    def delta_body(self, since):
+        """
+        Get the serialized changes since an earlier version.
+
+        Args:
+            since: Version the client already has
+
+        Returns:
+            bytes: JSON object {"version", "since", "changed", "removed"} with the records
+            that changed and the symbols that were removed after `since`, or None if
+            `since` is unknown (older than this process or newer than this snapshot)
+            and the full list has to be sent instead
+        """
+        if since < self.base_version or since > self.version:
+            return None
+
+        with self._lock:
+            body = self._deltas.get(since)
+            if body is None:
+                body = _encode_json({
+                    "version": self.version,
+                    "since": since,
+                    "changed": [dict(coin) for coin in self.coins if self.changed_at[coin["symbol"]] > since],
+                    "removed": [symbol for symbol, version in self.removed_at.items() if version > since],
+                })
+                if len(self._deltas) >= DELTA_CACHE_SIZE:
+                    self._deltas.pop(next(iter(self._deltas)))
+                self._deltas[since] = body
+        return body
+
+    def query_body(self, key, run):
+        """
+        Get the serialized result of a query over the records, cached per snapshot so
+        clients polling the same view (e.g. the top movers) share one evaluation per tick.
+
+        Args:
+            key: Hashable description of the query
+            run: Callable taking the records and returning (result, extra); the result is
+                serialized and `extra` (e.g. a pagination cursor) is returned as-is
+
+        Returns:
+            tuple: (body, extra)
+        """
+        with self._lock:
+            cached = self._queries.get(key)
+        if cached is not None:
+            return cached
+
+        result, extra = run(self.coins)
+        cached = (_encode_json(result), extra)
+        with self._lock:
+            if len(self._queries) >= DELTA_CACHE_SIZE:
+                self._queries.pop(next(iter(self._queries)))
+            self._queries[key] = cached
+        return cached
+
+    def matches_etag(self, if_none_match):
+        """Check whether an If-None-Match header refers to this snapshot."""
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag == "*" or tag == self.etag:
+                return True
+        return False
+
+class SnapshotStore:
+    """
+    Holds the current CoinSnapshot.
+
+    Publishing swaps a single reference, so readers always see a complete snapshot
+    without locking, and the version increases by one with every publish. Listeners
+    are called with every published snapshot, e.g. to push changes to stream clients.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listeners = []
+        # Start from the current time in milliseconds, so versions (and ETags) keep
+        # increasing across restarts and a client never sees an old version again
+        self._version = int(time.time() * 1000)
+        self.current = None
+
+    def publish(self, coins):
+        """
+        Build and publish a new snapshot.
+
+        Args:
+            coins: List of coin monitor records, as returned by get_all_coin_monitors()
+
+        Returns:
+            CoinSnapshot: The published snapshot
+        """
+        with self._lock:
+            snapshot = self._swap(coins)
+            listeners = list(self._listeners)
+
+        self._notify(listeners, snapshot)
+        return snapshot
+
+    def publish_changes(self, base, changes):
+        """
+        Build and publish a new snapshot from an earlier one and the fields of the records
+        that changed since, e.g. the prices just written by a tick, without reloading the
+        records from the database. Unchanged records keep their serialized rows.
+
+        Args:
+            base: The snapshot the changes apply to
+            changes: dict of symbol -> dict of changed fields
+
+        Returns:
+            CoinSnapshot: The published snapshot, or None if `base` is no longer the current
+            snapshot or the changes include symbols it doesn't have, so the records have
+            to be reloaded and published with publish()
+        """
+        with self._lock:
+            if base is None or base is not self.current:
+                return None
+            if any(symbol not in base.by_symbol for symbol in changes):
+                return None
+            coins = [
+                coin if coin["symbol"] not in changes else {**coin, **changes[coin["symbol"]]}
+                for coin in base.coins
+            ]
+            snapshot = self._swap(coins)
+            listeners = list(self._listeners)
+
+        self._notify(listeners, snapshot)
+        return snapshot
+
+    def _swap(self, coins):
+        # Called with the lock held
+        self._version += 1
+        snapshot = CoinSnapshot(self._version, coins, self.current)
+        self.current = snapshot
+        return snapshot
+
+    def _notify(self, listeners, snapshot):
+        for listener in listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                logging.error(f"Error notifying snapshot listener: {e}")
+
+    def add_listener(self, listener):
+        """
+        Register a callable that is called with every published snapshot.
+
+        Listeners run in the publishing thread (usually the price monitor), so they
+        must return quickly and hand any real work off to their own thread or loop.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Unregister a listener added with add_listener()."""
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+# Snapshot shared by the price monitor (writer) and the API handlers (readers)
+snapshot_store = SnapshotStore()
@@ -2,7 +2,8 @@ import time
 import logging
 import psycopg2
 import os
-from coin_price_monitor import start_price_monitor, get_database_connection
+from coin_price_monitor import start_price_monitor
+from database import db_connection
 
 # Configure logging
 logging.basicConfig(
@@ -16,15 +17,18 @@ logging.basicConfig(
 def print_coin_monitor_data():
     """Print the data from the coin_monitor table."""
     try:
-        connection, cursor = get_database_connection()
-        query = """
-            SELECT symbol, initial_price, low_price, high_price, latest_price,
-                   low_price_1, high_price_1
-            FROM coin_monitor
-            LIMIT 10
-        """
-        cursor.execute(query)
-        records = cursor.fetchall()
+        with db_connection() as (connection, cursor):
+            query = """
+                SELECT c.symbol, c.initial_price, c.low_price, c.high_price, c.latest_price,
+                       COALESCE(p.low, 0.0), COALESCE(p.high, 0.0)
+                FROM coin_monitor c
+                LEFT JOIN price_cycles p
+                  ON p.symbol = c.symbol
+                 AND p.seq = (SELECT MAX(seq) FROM price_cycles WHERE symbol = c.symbol)
+                LIMIT 10
+            """
+            cursor.execute(query)
+            records = cursor.fetchall()
         
         print("\n=== Coin Monitor Data ===")
         print("Symbol | Initial Price | Low Price | High Price | Latest Price | Low Price 1 | High Price 1")
@@ -39,10 +43,6 @@ def print_coin_monitor_data():
     except Exception as e:
         logging.error(f"Error printing coin monitor data: {e}")
         return False
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
 
 def main():
     """Test the coin price monitor."""
@@ -0,0 +1,196 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from .http_client import binance_get
+
+# Length of the sliding window of recent trade statistics in seconds
+TRADE_WINDOW_SECONDS = int(os.getenv('TRADE_WINDOW_SECONDS', '30'))
+
+# Minimum seconds between two fetches for the same symbol; requests in between share the last result
+TRADE_REFRESH_INTERVAL = float(os.getenv('TRADE_REFRESH_INTERVAL', '1'))
+
+# Aggregators that haven't been read for this many seconds are dropped
+TRADE_AGGREGATOR_IDLE_TTL = float(os.getenv('TRADE_AGGREGATOR_IDLE_TTL', '300'))
+
+# Page size of /api/v3/aggTrades requests (the API maximum)
+AGG_TRADES_LIMIT = 1000
+
+# Pages fetched per refresh before the aggregator gives up catching up and starts over
+AGG_TRADES_MAX_PAGES = 5
+
+class RollingTradeWindow:
+    """
+    Buy/sell counts and volumes of the trades in a sliding time window.
+
+    Trades are kept in arrival order with running totals, so adding a trade and
+    evicting an expired one are both O(1).
+    """
+
+    def __init__(self, window_seconds=TRADE_WINDOW_SECONDS):
+        self.window_ms = int(window_seconds * 1000)
+        self.trades = deque()
+        self.buy_trades = 0
+        self.sell_trades = 0
+        self.buy_volume = 0.0
+        self.sell_volume = 0.0
+
+    def add(self, trade_time, is_buy, quantity, count=1):
+        """
+        Add an (aggregate) trade.
+
+        Args:
+            trade_time: Trade time in milliseconds
+            is_buy: True if the taker was the buyer
+            quantity: Traded quantity
+            count: Number of individual trades it combines
+        """
+        self.trades.append((trade_time, is_buy, quantity, count))
+        if is_buy:
+            self.buy_trades += count
+            self.buy_volume += quantity
+        else:
+            self.sell_trades += count
+            self.sell_volume += quantity
+
+    def evict(self, now_ms):
+        """Drop the trades that fell out of the window."""
+        cutoff = now_ms - self.window_ms
+        trades = self.trades
+        while trades and trades[0][0] < cutoff:
+            _, is_buy, quantity, count = trades.popleft()
+            if is_buy:
+                self.buy_trades -= count
+                self.buy_volume -= quantity
+            else:
+                self.sell_trades -= count
+                self.sell_volume -= quantity
+        if not trades:
+            # Reset the running sums so floating point errors don't accumulate
+            self.buy_volume = self.sell_volume = 0.0
+
+    def clear(self):
+        self.trades.clear()
+        self.buy_trades = self.sell_trades = 0
+        self.buy_volume = self.sell_volume = 0.0
+
+class TradeAggregator:
+    """
+    Rolling recent-trade statistics of one symbol.
+
+    The first refresh loads the most recent aggregate trades; later refreshes only
+    fetch the trades after the last aggregate trade id seen (fromId), so every viewer
+    of a symbol shares one incremental download instead of 1000 trades per request.
+    """
+
+    def __init__(self, symbol, window_seconds=TRADE_WINDOW_SECONDS):
+        self.symbol = symbol
+        self.window = RollingTradeWindow(window_seconds)
+        self.last_id = None
+        self.refreshed_at = 0.0
+        self.last_read = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _add_trades(self, trades, cutoff_ms):
+        for trade in trades:
+            if trade['T'] >= cutoff_ms:
+                # An aggregate trade combines the individual trades f..l of one taker order
+                self.window.add(trade['T'], not trade['m'], float(trade['q']), trade['l'] - trade['f'] + 1)
+            self.last_id = trade['a']
+
+    def _fetch_new_trades(self, now_ms):
+        cutoff_ms = now_ms - self.window.window_ms
+        if self.last_id is not None:
+            for _ in range(AGG_TRADES_MAX_PAGES):
+                trades = binance_get('/api/v3/aggTrades', params={
+                    'symbol': self.symbol, 'fromId': self.last_id + 1, 'limit': AGG_TRADES_LIMIT
+                })
+                self._add_trades(trades, cutoff_ms)
+                if len(trades) < AGG_TRADES_LIMIT:
+                    return
+            # Too far behind to catch up, start over from the most recent trades
+            logging.info(f"Trade aggregator for {self.symbol} fell behind, reloading recent trades")
+            self.window.clear()
+
+        trades = binance_get('/api/v3/aggTrades', params={'symbol': self.symbol, 'limit': AGG_TRADES_LIMIT})
+        self._add_trades(trades, cutoff_ms)
+
+    def refresh(self):
+        """
+        Fetch new trades unless another request did so in the last TRADE_REFRESH_INTERVAL seconds.
+        Concurrent callers wait for the fetch in progress instead of starting their own.
+        """
+        with self._lock:
+            self.last_read = time.monotonic()
+            if time.monotonic() - self.refreshed_at < TRADE_REFRESH_INTERVAL:
+                return
+            now_ms = int(time.time() * 1000)
+            self._fetch_new_trades(now_ms)
+            self.window.evict(now_ms)
+            self.refreshed_at = time.monotonic()
+
+    def summary(self):
+        """
+        Get the trade statistics of the current window.
+
+        Returns:
+            dict: Trade counts, volumes, percentages and trend, in the format of
+            /api/coin-monitors/{symbol}/recent-trades
+        """
+        with self._lock:
+            self.window.evict(int(time.time() * 1000))
+            buy_trades = self.window.buy_trades
+            sell_trades = self.window.sell_trades
+            buy_volume = max(self.window.buy_volume, 0.0)
+            sell_volume = max(self.window.sell_volume, 0.0)
+
+        total_volume = buy_volume + sell_volume
+        total_trades = buy_trades + sell_trades
+
+        # Calculate percentages
+        buy_percentage = (buy_volume / total_volume * 100) if total_volume > 0 else 0
+        sell_percentage = (sell_volume / total_volume * 100) if total_volume > 0 else 0
+
+        # Calculate average trade size
+        average_trade_size = total_volume / total_trades if total_trades > 0 else 0
+
+        # Determine trend based on buy/sell ratio
+        trend = "Neutral"
+        if buy_percentage > 55:
+            trend = "Bullish"  # More buying than selling
+        elif sell_percentage > 55:
+            trend = "Bearish"  # More selling than buying
+
+        return {
+            "symbol": self.symbol,
+            "period": f"{TRADE_WINDOW_SECONDS} seconds",
+            "total_trades": total_trades,
+            "buy_trades": buy_trades,
+            "sell_trades": sell_trades,
+            "buy_volume": round(buy_volume, 4),
+            "sell_volume": round(sell_volume, 4),
+            "buy_percentage": round(buy_percentage, 2),
+            "sell_percentage": round(sell_percentage, 2),
+            "average_trade_size": round(average_trade_size, 4),
+            "trend": trend,
+        }
+
+_aggregators = {}
+_aggregators_lock = threading.Lock()
+
+def get_trade_aggregator(symbol):
+    """
+    Get the shared aggregator of a symbol, creating it on first use.
+    Aggregators nobody read for TRADE_AGGREGATOR_IDLE_TTL seconds are dropped.
+    """
+    now = time.monotonic()
+    with _aggregators_lock:
+        for idle_symbol in [s for s, a in _aggregators.items() if now - a.last_read > TRADE_AGGREGATOR_IDLE_TTL]:
+            del _aggregators[idle_symbol]
+
+        aggregator = _aggregators.get(symbol)
+        if aggregator is None:
+            aggregator = _aggregators[symbol] = TradeAggregator(symbol)
+        return aggregator
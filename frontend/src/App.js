@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import './App.css';
 import CoinList from './components/CoinList';
@@ -14,25 +14,83 @@ function App() {
   const [error, setError] = useState(null);
   const [selectedCoin, setSelectedCoin] = useState(null);
   const [showAdminPanel, setShowAdminPanel] = useState(false);
+  // Snapshot version and coins of the last response, used to request only changes
+  const versionRef = useRef(null);
+  const coinsBySymbolRef = useRef(new Map());
 
   useEffect(() => {
+    const showCoins = () => {
+      const updatedCoins = Array.from(coinsBySymbolRef.current.values())
+        .sort((a, b) => (a.symbol < b.symbol ? -1 : a.symbol > b.symbol ? 1 : 0));
+      setCoins(updatedCoins);
+
+      // Check if there's a selected coin in localStorage
+      const savedCoinSymbol = localStorage.getItem('selectedCoinSymbol');
+      if (savedCoinSymbol) {
+        // Find the coin with the saved symbol
+        const savedCoin = updatedCoins.find(coin => coin.symbol === savedCoinSymbol);
+        if (savedCoin) {
+          setSelectedCoin(savedCoin);
+        }
+      }
+
+      setLoading(false);
+    };
+
+    if (window.EventSource) {
+      // Live updates: the server pushes the full list once, then only changed fields
+      const source = new EventSource(`${API_URL}/api/stream`);
+
+      source.addEventListener('snapshot', (event) => {
+        const data = JSON.parse(event.data);
+        const coinsBySymbol = coinsBySymbolRef.current;
+        coinsBySymbol.clear();
+        data.coins.forEach(coin => coinsBySymbol.set(coin.symbol, coin));
+        versionRef.current = data.version;
+        setError(null);
+        showCoins();
+      });
+
+      source.addEventListener('diff', (event) => {
+        const data = JSON.parse(event.data);
+        const coinsBySymbol = coinsBySymbolRef.current;
+        Object.entries(data.changed).forEach(([symbol, fields]) => {
+          coinsBySymbol.set(symbol, { ...coinsBySymbol.get(symbol), ...fields });
+        });
+        data.removed.forEach(symbol => coinsBySymbol.delete(symbol));
+        versionRef.current = data.version;
+        showCoins();
+      });
+
+      source.onerror = (err) => {
+        // EventSource reconnects by itself and gets a fresh snapshot
+        console.error('Error in coin update stream:', err);
+      };
+
+      // Close the stream on component unmount
+      return () => source.close();
+    }
+
     const fetchCoins = async () => {
       try {
         setLoading(true);
-        const response = await axios.get(`${API_URL}/api/coin-monitors`);
-        setCoins(response.data);
-
-        // Check if there's a selected coin in localStorage
-        const savedCoinSymbol = localStorage.getItem('selectedCoinSymbol');
-        if (savedCoinSymbol) {
-          // Find the coin with the saved symbol
-          const savedCoin = response.data.find(coin => coin.symbol === savedCoinSymbol);
-          if (savedCoin) {
-            setSelectedCoin(savedCoin);
-          }
-        }
+        const params = versionRef.current ? { since: versionRef.current } : {};
+        const response = await axios.get(`${API_URL}/api/coin-monitors`, { params });
 
-        setLoading(false);
+        const coinsBySymbol = coinsBySymbolRef.current;
+        if (Array.isArray(response.data)) {
+          // Full list (first request, or the server no longer knows our version)
+          coinsBySymbol.clear();
+          response.data.forEach(coin => coinsBySymbol.set(coin.symbol, coin));
+          const etag = response.headers.etag;
+          versionRef.current = etag ? etag.replace(/^W\//, '').replace(/"/g, '') : null;
+        } else {
+          // Only the coins that changed since our version
+          response.data.changed.forEach(coin => coinsBySymbol.set(coin.symbol, coin));
+          response.data.removed.forEach(symbol => coinsBySymbol.delete(symbol));
+          versionRef.current = response.data.version;
+        }
+        showCoins();
       } catch (err) {
         setError('Error fetching coin data. Please try again later.');
         setLoading(false);
@@ -40,8 +98,8 @@ function App() {
       }
     };
 
+    // Browsers without EventSource poll every 20 seconds
     fetchCoins();
-    // Set up polling to refresh data every 20 seconds
     const interval = setInterval(fetchCoins, 20000);
 
     // Clean up interval on component unmount
@@ -91,7 +149,7 @@ function App() {
         )}
       </main>
       <footer className="App-footer">
-        <p>Coin data refreshes automatically every 20 seconds.</p>
+        <p>Coin data updates automatically with every price tick.</p>
       </footer>
     </div>
   );
@@ -14,6 +14,16 @@ setup(
     extras_require={
         "dev": [
             "python-dotenv>=1.0.0",
+            "pytest>=7.0",
+        ],
+        "fast": [
+            "numpy>=1.24",
+        ],
+        "stream": [
+            "websockets>=11.0,<13",
+        ],
+        "async": [
+            "httpx>=0.24,<0.28",
         ],
     },
     author="Your Name",
@@ -27,5 +37,5 @@ setup(
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
-    python_requires=">=3.8",
+    python_requires=">=3.9",
 )
\ No newline at end of file
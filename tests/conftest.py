@@ -0,0 +1,34 @@
+import sqlite3
+
+import pytest
+
+from app.database import ensure_sqlite_schema
+
+@pytest.fixture
+def sqlite_db():
+    """In-memory SQLite database with the monitor schema, as (connection, cursor)."""
+    connection = sqlite3.connect(":memory:")
+    cursor = connection.cursor()
+    ensure_sqlite_schema(cursor)
+    connection.commit()
+    yield connection, cursor
+    connection.close()
+
+class FakeClock:
+    """Stand-in for the time module of the module under test; sleeping advances the clock."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def clock():
+    return FakeClock()
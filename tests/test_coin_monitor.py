@@ -0,0 +1,11 @@
+from app.coin_monitor import write_latest_prices
+
+def test_write_latest_prices(sqlite_db):
+    connection, cursor = sqlite_db
+    cursor.executemany("INSERT INTO coin_monitor (symbol, initial_price, low_price, high_price, latest_price) "
+                       "VALUES (?, 1, 1, 1, 1)", [("BTCUSDT",), ("ETHUSDT",), ("XRPUSDT",)])
+
+    write_latest_prices(connection, cursor, [(2.0, 2.0, 1.0, "BTCUSDT"), (0.5, 1.0, 0.5, "ETHUSDT")])
+
+    cursor.execute("SELECT symbol, latest_price, high_price, low_price FROM coin_monitor ORDER BY symbol")
+    assert cursor.fetchall() == [("BTCUSDT", 2.0, 2.0, 1.0), ("ETHUSDT", 0.5, 1.0, 0.5), ("XRPUSDT", 1.0, 1.0, 1.0)]
@@ -0,0 +1,69 @@
+import pytest
+
+from app.coin_query import CoinQuery, decode_cursor, encode_cursor
+
+COINS = [
+    {"symbol": f"COIN{i:02d}USDT", "initial_price": 100.0, "latest_price": 100.0 + (i * 7) % 11 - 5,
+     "trend": "UP" if i % 2 else "DOWN", "cycle_status": "Consolidation"}
+    for i in range(25)
+]
+
+def pages(**params):
+    """Collect all pages of a query, following the cursors."""
+    records, cursor = [], None
+    while True:
+        page, cursor = CoinQuery(cursor=cursor, **params).apply(COINS)
+        records.extend(page)
+        if cursor is None:
+            return records
+
+def test_empty_query_returns_everything():
+    query = CoinQuery()
+
+    assert query.is_empty
+    assert query.apply(COINS) == ([dict(coin) for coin in COINS], None)
+
+@pytest.mark.parametrize("sort", ["symbol", "-symbol", "change", "-change"])
+def test_cursor_pages_cover_the_sorted_list(sort):
+    everything, cursor = CoinQuery(sort=sort).apply(COINS)
+    assert cursor is None
+
+    assert pages(limit=4, sort=sort) == everything
+
+def test_change_sort_breaks_ties_by_symbol():
+    records, _ = CoinQuery(sort="change").apply(COINS)
+    descending, _ = CoinQuery(sort="-change").apply(COINS)
+
+    keys = [(coin["latest_price"] - 100.0, coin["symbol"]) for coin in records]
+    assert keys == sorted(keys)
+    assert descending == records[::-1]
+
+def test_filters_and_fields():
+    records, cursor = CoinQuery(trend="up", min_price=100, max_price=104, symbol_prefix="coin0",
+                                fields="latest_price,trend").apply(COINS)
+
+    assert cursor is None
+    assert records
+    for record in records:
+        assert set(record) == {"symbol", "latest_price", "trend"}
+        assert record["trend"] == "UP"
+        assert 100 <= record["latest_price"] <= 104
+        assert record["symbol"].startswith("COIN0")
+
+def test_key_identifies_the_query():
+    assert CoinQuery(trend="UP,DOWN").key == CoinQuery(trend="down, up").key
+    assert CoinQuery(limit=5).key != CoinQuery(limit=6).key
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor([1.5, "BTCUSDT"])) == [1.5, "BTCUSDT"]
+
+@pytest.mark.parametrize("params", [
+    {"limit": 0},
+    {"limit": 1001},
+    {"sort": "price"},
+    {"cursor": "not a cursor"},
+    {"cursor": encode_cursor(["BTCUSDT"]), "sort": "change"},
+])
+def test_invalid_parameters(params):
+    with pytest.raises(ValueError):
+        CoinQuery(**params)
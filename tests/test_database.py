@@ -0,0 +1,33 @@
+import sqlite3
+
+from app.database import symbol_filter
+from app.price_cycles import append_cycles, load_cycles
+
+def test_symbol_filter_matches_the_symbols(sqlite_db):
+    connection, cursor = sqlite_db
+    cursor.executemany("INSERT INTO coin_monitor (symbol, initial_price, low_price, high_price, latest_price) "
+                       "VALUES (?, 1, 1, 1, 1)", [("BTCUSDT",), ("ETHUSDT",), ("XRPUSDT",)])
+
+    condition, params = symbol_filter(connection, ["ETHUSDT", "XRPUSDT", "DOGEUSDT"])
+    cursor.execute(f"SELECT symbol FROM coin_monitor WHERE {condition} ORDER BY symbol", params)
+
+    assert [row[0] for row in cursor.fetchall()] == ["ETHUSDT", "XRPUSDT"]
+
+def test_symbol_filter_with_no_symbols(sqlite_db):
+    connection, cursor = sqlite_db
+
+    condition, params = symbol_filter(connection, [])
+    cursor.execute(f"SELECT symbol FROM coin_monitor WHERE {condition}", params)
+
+    assert cursor.fetchall() == []
+
+def test_symbol_filter_beyond_the_variable_limit(sqlite_db):
+    connection, cursor = sqlite_db
+    # The default of SQLite builds before 3.32
+    connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+    append_cycles(connection, cursor, [("BTCUSDT", 10.0, 9.0)])
+    symbols = [f"COIN{i}USDT" for i in range(5000)] + ["BTCUSDT"]
+
+    cycles = load_cycles(connection, cursor, symbols=symbols)
+
+    assert list(cycles) == ["BTCUSDT"]
@@ -0,0 +1,162 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app import http_client
+from app.http_client import SingleFlight, binance_get
+from app.rate_limit import PRIORITY_MONITOR, PRIORITY_USER
+
+def test_concurrent_calls_share_one_request():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def request():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"price": 1.0}
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("ticker", request, 0)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("ticker", request, 0))) for _ in range(3)]
+    for follower in followers:
+        follower.start()
+    while flight.stats()["shared"] < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == [{"price": 1.0}] * 4
+    assert flight.stats() == {"requests": 1, "shared": 3, "cache_hits": 0}
+
+def test_results_are_reused_for_the_ttl():
+    flight = SingleFlight()
+    calls = []
+
+    def request():
+        calls.append(1)
+        return len(calls)
+
+    assert flight.do("ticker", request, 60) == 1
+    assert flight.do("ticker", request, 60) == 1
+    assert flight.do("other", request, 60) == 2
+    assert flight.do("ticker-no-cache", request, 0) == 3
+    assert flight.do("ticker-no-cache", request, 0) == 4
+    assert flight.stats()["cache_hits"] == 1
+
+def test_errors_are_not_cached():
+    flight = SingleFlight()
+
+    def failing():
+        raise ValueError("down")
+
+    with pytest.raises(ValueError):
+        flight.do("ticker", failing, 60)
+    assert flight.do("ticker", lambda: "up", 60) == "up"
+
+def test_async_calls_share_one_request():
+    flight = SingleFlight()
+    calls = []
+
+    async def request():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*(flight.do_async("ticker", request, 0) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["result"] * 5
+    assert len(calls) == 1
+
+def test_async_errors_reach_every_caller():
+    flight = SingleFlight()
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("down")
+
+    async def main():
+        return await asyncio.gather(*(flight.do_async("ticker", failing, 60) for _ in range(3)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert asyncio.run(flight.do_async("ticker", lambda: asyncio.sleep(0, "up"), 60)) == "up"
+
+class Abort(BaseException):
+    pass
+
+def test_base_exceptions_reach_waiters_and_are_not_cached():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def aborted():
+        started.set()
+        release.wait(5)
+        raise Abort()
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("ticker", aborted, 60)
+        except Abort as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while flight.stats()["shared"] < 1:
+        time.sleep(0.001)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert len(errors) == 2
+    assert flight.do("ticker", lambda: "up", 60) == "up"
+
+def test_cancelling_the_first_caller_does_not_cancel_the_others():
+    flight = SingleFlight()
+    calls = []
+
+    async def request():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        first = asyncio.create_task(flight.do_async("ticker", request, 60))
+        await asyncio.sleep(0.01)
+        others = [asyncio.create_task(flight.do_async("ticker", request, 60)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await asyncio.gather(*others)
+
+    assert asyncio.run(main()) == ["result", "result"]
+    assert len(calls) == 1
+
+def test_calls_are_only_shared_within_a_priority(monkeypatch):
+    calls = []
+    monkeypatch.setattr(http_client, "binance_single_flight", SingleFlight())
+    monkeypatch.setattr(http_client, "_binance_get",
+                        lambda path, params, priority: calls.append(priority) or "ticker")
+
+    assert binance_get("/api/v3/ticker/price", cache_ttl=60, priority=PRIORITY_USER) == "ticker"
+    assert binance_get("/api/v3/ticker/price", cache_ttl=60, priority=PRIORITY_USER) == "ticker"
+    assert binance_get("/api/v3/ticker/price", cache_ttl=60, priority=PRIORITY_MONITOR) == "ticker"
+
+    assert calls == [PRIORITY_USER, PRIORITY_MONITOR]
@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from app.coin_price_monitor import identify_trend
+from app.moving_averages import MovingAverageTracker
+
+np = pytest.importorskip("numpy")
+
+from app.indicators import VectorIndicatorEngine, identify_trends  # noqa: E402
+
+def test_identify_trends_matches_identify_trend():
+    rng = random.Random(3)
+    cases = [(100.0, 0.0, 0.0, 0.0), (100.0, 99.0, 98.0, 0.0), (97.0, 98.0, 99.0, 96.0),
+             (100.0, 99.8, 99.7, 101.0), (99.5, 99.7, 99.8, 98.0), (100.0, 100.0, 100.0, 100.0)]
+    for _ in range(500):
+        ma25 = rng.uniform(90, 110)
+        cases.append((ma25 * rng.uniform(0.97, 1.03), ma25 * rng.uniform(0.99, 1.01), ma25,
+                      rng.choice([0.0, ma25 * rng.uniform(0.95, 1.05)])))
+
+    prices, ma7, ma25, ma99 = (np.array(column) for column in zip(*cases))
+    trends, statuses = identify_trends(prices, ma7, ma25, ma99)
+
+    assert list(zip(trends, statuses)) == [identify_trend(*case) for case in cases]
+
+def test_engine_matches_tracker_and_identify_trend():
+    rng = random.Random(5)
+    symbols = [f"COIN{i}USDT" for i in range(20)]
+    history = {symbol: [rng.uniform(1, 100) for _ in range(rng.randint(0, 120))] for symbol in symbols}
+    engine = VectorIndicatorEngine()
+    tracker = MovingAverageTracker()
+    engine.rebuild(history)
+    tracker.rebuild(history)
+
+    for _ in range(150):
+        prices = [rng.uniform(1, 100) for _ in symbols]
+        results = engine.update_many(symbols, prices)
+        for symbol, price, (ma7, ma25, ma99, trend, status) in zip(symbols, prices, results):
+            expected = tracker.update(symbol, price)
+            assert (ma7, ma25, ma99) == pytest.approx(expected, rel=1e-9)
+            assert (trend, status) == identify_trend(price, *expected)
+
+def test_engine_adds_new_symbols():
+    engine = VectorIndicatorEngine()
+    engine.rebuild({})
+
+    results = engine.update_many([f"COIN{i}USDT" for i in range(100)], [float(i + 1) for i in range(100)])
+
+    assert len(results) == 100
+    assert results[9][:3] == (10.0, 10.0, 10.0)
+    assert engine.update_many([], []) == []
@@ -0,0 +1,17 @@
+from app.leader import FileLock, LeaderElection
+
+def test_file_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / "leader.lock")
+    first, second = FileLock(path), FileLock(path)
+
+    assert first.try_acquire()
+    assert not second.try_acquire()
+    first.release()
+    assert second.try_acquire()
+    second.release()
+
+def test_unopenable_lock_file_is_not_held(tmp_path):
+    election = LeaderElection(FileLock(str(tmp_path / "missing" / "leader.lock")))
+
+    assert not election.campaign()
+    assert not election.is_leader
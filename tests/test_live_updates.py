@@ -0,0 +1,58 @@
+import asyncio
+import json
+
+from app.live_updates import LiveUpdateHub, live_update_hub
+from app.main import stream_coin_monitors
+from app.snapshot import SnapshotStore, snapshot_store
+
+def parse_event(event):
+    lines = event.decode().strip().split("\n")
+    fields = dict(line.split(": ", 1) for line in lines)
+    return fields["event"], json.loads(fields["data"])
+
+def test_events_send_snapshot_then_diffs():
+    store = SnapshotStore()
+    hub = LiveUpdateHub(store=store)
+    store.publish([{"symbol": "BTCUSDT", "latest_price": 1.0}, {"symbol": "ETHUSDT", "latest_price": 2.0}])
+
+    async def main():
+        client = hub.subscribe({"BTCUSDT"})
+        events = hub.events(client)
+        first = await events.__anext__()
+        store.publish([{"symbol": "BTCUSDT", "latest_price": 1.5}, {"symbol": "ETHUSDT", "latest_price": 2.5}])
+        second = await asyncio.wait_for(events.__anext__(), 5)
+        await events.aclose()
+        return parse_event(first), parse_event(second)
+
+    (first_type, first), (second_type, second) = asyncio.run(main())
+
+    assert first_type == "snapshot"
+    assert [coin["symbol"] for coin in first["coins"]] == ["BTCUSDT"]
+    assert second_type == "diff"
+    assert second["changed"] == {"BTCUSDT": {"latest_price": 1.5}}
+    assert hub.client_count == 0
+
+def test_max_clients():
+    hub = LiveUpdateHub(store=SnapshotStore(), max_clients=1)
+
+    async def main():
+        return hub.subscribe(), hub.subscribe()
+
+    first, second = asyncio.run(main())
+    assert first is not None
+    assert second is None
+
+def test_stream_unsubscribes_when_the_body_never_starts():
+    snapshot_store.publish([{"symbol": "BTCUSDT", "latest_price": 1.0}])
+
+    async def main():
+        before = live_update_hub.client_count
+        response = await stream_coin_monitors()
+        subscribed = live_update_hub.client_count
+        # A client disconnecting before the first event: only the background task runs
+        await response.background()
+        return before, subscribed, live_update_hub.client_count
+
+    before, subscribed, after = asyncio.run(main())
+    assert subscribed == before + 1
+    assert after == before
@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+from app.coin_monitor import calculate_price_history_update
+from app.moving_averages import MovingAverageTracker, RollingWindow
+
+EMPTY_CYCLE = (0.0, 0.0)
+
+def cycles_of(*recorded, depth=10):
+    """Cycles, most recent first, padded with empty cycles."""
+    return list(recorded) + [EMPTY_CYCLE] * (depth - len(recorded))
+
+def test_rolling_window_average():
+    window = RollingWindow(3)
+    assert window.average == 0.0
+
+    for value in (1.0, 2.0, 3.0, 4.0):
+        window.push(value)
+
+    assert len(window) == 3
+    assert window.average == pytest.approx(3.0)
+
+def test_rolling_window_matches_brute_force():
+    rng = random.Random(7)
+    values = [rng.uniform(0.0001, 100000) for _ in range(1000)]
+    window = RollingWindow(25)
+
+    for i, value in enumerate(values):
+        window.push(value)
+        expected = values[max(0, i - 24):i + 1]
+        assert window.average == pytest.approx(sum(expected) / len(expected), rel=1e-12)
+
+def test_tracker_rebuild_and_update():
+    tracker = MovingAverageTracker(periods=(2, 4))
+    # Newest first
+    tracker.rebuild({"BTCUSDT": [4.0, 3.0, 2.0, 1.0]})
+
+    assert tracker.averages("BTCUSDT") == (3.5, 2.5)
+    assert tracker.update("BTCUSDT", 5.0) == (4.5, 3.5)
+    assert tracker.averages("ETHUSDT") == (0.0, 0.0)
+
+def test_tracker_short_history_gives_equal_averages():
+    tracker = MovingAverageTracker(periods=(7, 25, 99))
+
+    ma7, ma25, ma99 = tracker.update("BTCUSDT", 0.1)
+
+    assert ma7 == ma25 == ma99 == 0.1
+
+def test_price_history_initialized():
+    cycles = cycles_of()
+
+    new_cycles, reason = calculate_price_history_update("BTCUSDT", 100.0, cycles, 102.0, 98.0, 100.0)
+
+    assert reason == "initialized"
+    assert new_cycles[0] == (102.0, 98.0)
+    assert new_cycles[1:] == cycles[1:]
+
+def test_price_history_unchanged_without_cycle_end():
+    cycles = cycles_of((102.0, 98.0), (110.0, 90.0))
+
+    assert calculate_price_history_update("BTCUSDT", 102.0, cycles, 102.0, 98.0, 101.9) is None
+
+def test_price_history_cycle_completed_shifts_cycles():
+    cycles = cycles_of((102.0, 98.0), (110.0, 90.0))
+
+    new_cycles, reason = calculate_price_history_update("BTCUSDT", 102.0, cycles, 102.0, 98.0, 100.0)
+
+    assert reason == "cycle completed"
+    assert len(new_cycles) == len(cycles)
+    high, low = new_cycles[0]
+    assert low < high
+    assert new_cycles[1:] == cycles[:-1]
+    assert new_cycles[-1] == EMPTY_CYCLE
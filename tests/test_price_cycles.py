@@ -0,0 +1,91 @@
+from app.database import legacy_cycle_migration_sql
+from app.price_cycles import (
+    EMPTY_CYCLE,
+    append_cycles,
+    load_cycles,
+    pad_cycles,
+    replace_latest_cycles,
+    set_cycles,
+)
+
+def test_set_cycles_round_trip_keeps_positions(sqlite_db):
+    connection, cursor = sqlite_db
+    cycles = pad_cycles([(10.0, 9.0), EMPTY_CYCLE, EMPTY_CYCLE, EMPTY_CYCLE, (50.0, 40.0)])
+
+    set_cycles(connection, cursor, "BTCUSDT", cycles)
+
+    assert load_cycles(connection, cursor, "BTCUSDT") == {"BTCUSDT": cycles}
+
+def test_set_cycles_with_empty_most_recent_cycle(sqlite_db):
+    connection, cursor = sqlite_db
+    cycles = pad_cycles([EMPTY_CYCLE, (20.0, 15.0)])
+
+    set_cycles(connection, cursor, "BTCUSDT", cycles)
+
+    assert load_cycles(connection, cursor, "BTCUSDT")["BTCUSDT"] == cycles
+
+def test_append_cycles_keeps_depth(sqlite_db):
+    connection, cursor = sqlite_db
+    for i in range(1, 5):
+        append_cycles(connection, cursor, [("BTCUSDT", float(i), float(i) - 0.5)], depth=3)
+
+    loaded = load_cycles(connection, cursor, "BTCUSDT", depth=3)["BTCUSDT"]
+
+    assert loaded == [(4.0, 3.5), (3.0, 2.5), (2.0, 1.5)]
+    cursor.execute("SELECT COUNT(*) FROM price_cycles")
+    assert cursor.fetchone()[0] == 3
+
+def test_append_after_set_cycles_shifts_positions(sqlite_db):
+    connection, cursor = sqlite_db
+    set_cycles(connection, cursor, "BTCUSDT", pad_cycles([(10.0, 9.0), EMPTY_CYCLE, (30.0, 25.0)]))
+
+    append_cycles(connection, cursor, [("BTCUSDT", 11.0, 8.0)])
+
+    loaded = load_cycles(connection, cursor, "BTCUSDT")["BTCUSDT"]
+    assert loaded[:4] == [(11.0, 8.0), (10.0, 9.0), EMPTY_CYCLE, (30.0, 25.0)]
+
+def test_replace_latest_cycles(sqlite_db):
+    connection, cursor = sqlite_db
+    replace_latest_cycles(connection, cursor, [("BTCUSDT", 10.0, 9.0)])
+    append_cycles(connection, cursor, [("BTCUSDT", 12.0, 11.0)])
+
+    replace_latest_cycles(connection, cursor, [("BTCUSDT", 13.0, 10.0)])
+
+    loaded = load_cycles(connection, cursor, "BTCUSDT")["BTCUSDT"]
+    assert loaded[:2] == [(13.0, 10.0), (10.0, 9.0)]
+
+def test_load_cycles_for_several_symbols(sqlite_db):
+    connection, cursor = sqlite_db
+    append_cycles(connection, cursor, [("BTCUSDT", 10.0, 9.0), ("ETHUSDT", 2.0, 1.0), ("XRPUSDT", 0.6, 0.5)])
+
+    loaded = load_cycles(connection, cursor, symbols=["BTCUSDT", "ETHUSDT", "DOGEUSDT"])
+
+    assert set(loaded) == {"BTCUSDT", "ETHUSDT"}
+    assert loaded["ETHUSDT"] == pad_cycles([(2.0, 1.0)])
+
+def test_legacy_migration_keeps_positions(sqlite_db):
+    connection, cursor = sqlite_db
+    cursor.execute("""
+        INSERT INTO coin_monitor (symbol, initial_price, low_price, high_price, latest_price,
+                                  high_price_1, low_price_1, high_price_3, low_price_3)
+        VALUES ('BTCUSDT', 1, 1, 1, 1, 10, 9, 30, 25)
+    """)
+
+    cursor.execute(legacy_cycle_migration_sql())
+
+    loaded = load_cycles(connection, cursor, "BTCUSDT")["BTCUSDT"]
+    assert loaded[:3] == [(10.0, 9.0), EMPTY_CYCLE, (30.0, 25.0)]
+
+def test_legacy_migration_with_empty_most_recent_cycle(sqlite_db):
+    connection, cursor = sqlite_db
+    cursor.execute("""
+        INSERT INTO coin_monitor (symbol, initial_price, low_price, high_price, latest_price,
+                                  high_price_2, low_price_2)
+        VALUES ('BTCUSDT', 1, 1, 1, 1, 20, 15)
+    """)
+    cursor.execute(legacy_cycle_migration_sql())
+
+    replace_latest_cycles(connection, cursor, [("BTCUSDT", 11.0, 10.0)])
+
+    loaded = load_cycles(connection, cursor, "BTCUSDT")["BTCUSDT"]
+    assert loaded[:3] == [(11.0, 10.0), (20.0, 15.0), EMPTY_CYCLE]
@@ -0,0 +1,61 @@
+import pytest
+
+from app import rate_limit
+from app.rate_limit import PRIORITY_MONITOR, PRIORITY_USER, RateLimitExceeded, WeightGovernor, request_weight
+
+@pytest.fixture
+def governor(clock, monkeypatch):
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return WeightGovernor(limit=600, headroom=1.0, user_share=0.5)
+
+def test_request_weight():
+    assert request_weight("/api/v3/ticker/price") == 4
+    assert request_weight("/api/v3/ticker/price", {"symbol": "BTCUSDT"}) == 2
+    assert request_weight("/api/v3/ticker/price", {"symbols": '["BTCUSDT"]'}) == 4
+    assert request_weight("/api/v3/trades", {"symbol": "BTCUSDT"}) == 25
+    assert request_weight("/api/v3/unknown") == 1
+
+def test_acquire_takes_weight(governor, clock):
+    governor.acquire(100, PRIORITY_MONITOR)
+
+    assert governor.tokens == 500
+    assert clock.now == 1000.0
+    assert governor.waits == 0
+
+def test_user_requests_keep_the_monitor_reserve(governor, clock):
+    governor.acquire(300, PRIORITY_USER)
+
+    # The bucket refills 10 weight per second, the user may wait 2 seconds at most
+    with pytest.raises(RateLimitExceeded) as excinfo:
+        governor.acquire(100, PRIORITY_USER)
+    assert excinfo.value.retry_after == pytest.approx(10.0)
+    assert governor.shed == 1
+
+    # The monitor can still use the reserve right away
+    governor.acquire(300, PRIORITY_MONITOR)
+    assert clock.now == 1000.0
+
+def test_monitor_requests_wait_for_weight(governor, clock):
+    governor.acquire(600, PRIORITY_MONITOR)
+
+    governor.acquire(50, PRIORITY_MONITOR)
+
+    assert clock.now == pytest.approx(1005.0)
+    assert governor.waits == 1
+
+def test_used_weight_header_caps_the_bucket(governor):
+    governor.observe(200, {"X-MBX-USED-WEIGHT-1M": "550"})
+
+    assert governor.tokens == 50
+    assert governor.stats()["used_weight_1m"] == 550
+
+def test_ban_blocks_all_requests(governor, clock):
+    governor.observe(429, {"Retry-After": "5"})
+
+    governor.acquire(1, PRIORITY_MONITOR)
+    assert clock.now == pytest.approx(1005.0)
+
+    governor.observe(418, {"Retry-After": "120"})
+    with pytest.raises(RateLimitExceeded):
+        governor.acquire(1, PRIORITY_MONITOR)
+    assert governor.bans == 2
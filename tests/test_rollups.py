@@ -0,0 +1,130 @@
+import random
+
+import pytest
+
+from app.rollups import PriceRollupStore, RollupTier, floor_bucket
+
+DAY = 86400
+TIERS = (RollupTier("1m", 60, 2 * DAY), RollupTier("5m", 300, 30 * DAY), RollupTier("1h", 3600, 365 * DAY))
+START = 1_700_000_000 // 3600 * 3600
+
+@pytest.fixture
+def store():
+    return PriceRollupStore(tiers=TIERS, enabled=True, retention_interval=0)
+
+def expected_bars(ticks, seconds):
+    """Brute-force OHLC bars of (time, price) ticks."""
+    bars = {}
+    for timestamp, price in ticks:
+        bucket = floor_bucket(timestamp, seconds)
+        bar = bars.get(bucket)
+        if bar is None:
+            bars[bucket] = [price, price, price, price, 1]
+        else:
+            bar[1] = max(bar[1], price)
+            bar[2] = min(bar[2], price)
+            bar[3] = price
+            bar[4] += 1
+    return bars
+
+def stored_bars(cursor, seconds):
+    cursor.execute("""
+        SELECT bucket, open, high, low, close, ticks FROM price_rollups
+        WHERE symbol = 'BTCUSDT' AND resolution = ? ORDER BY bucket
+    """, (seconds,))
+    return {bucket: [open_price, high, low, close, ticks] for bucket, open_price, high, low, close, ticks in cursor.fetchall()}
+
+def test_floor_bucket():
+    assert floor_bucket(START + 59.9, 60) == START
+    assert floor_bucket(START + 60, 60) == START + 60
+
+def test_ticks_roll_up_into_every_tier(sqlite_db, store):
+    connection, cursor = sqlite_db
+    rng = random.Random(11)
+    ticks = [(START + i * 15 + rng.uniform(0, 10), rng.uniform(90, 110)) for i in range(2 * 60 * 4 + 1)]
+
+    for timestamp, price in ticks:
+        store.record(connection, cursor, [("BTCUSDT", price)], now=timestamp)
+
+    # The coarser tiers are compacted whenever a finest bar opens, and the last tick opened one
+    assert stored_bars(cursor, 60) == expected_bars(ticks, 60)
+    assert stored_bars(cursor, 300) == expected_bars(ticks, 300)
+    assert stored_bars(cursor, 3600) == expected_bars(ticks, 3600)
+
+def test_compaction_only_covers_the_recorded_symbols(sqlite_db):
+    connection, cursor = sqlite_db
+    # Two sharded workers recording their own symbols into the same table
+    first = PriceRollupStore(tiers=TIERS, enabled=True, retention_interval=0)
+    second = PriceRollupStore(tiers=TIERS, enabled=True, retention_interval=0)
+    first.record(connection, cursor, [("BTCUSDT", 100.0)], now=START)
+    second.record(connection, cursor, [("ETHUSDT", 10.0)], now=START)
+
+    first.record(connection, cursor, [("BTCUSDT", 101.0)], now=START + 60)
+
+    cursor.execute("SELECT DISTINCT symbol FROM price_rollups WHERE resolution = 300")
+    assert cursor.fetchall() == [("BTCUSDT",)]
+
+def test_coarser_tiers_wait_for_the_next_bar(sqlite_db, store):
+    connection, cursor = sqlite_db
+    store.record(connection, cursor, [("BTCUSDT", 100.0)], now=START)
+    store.record(connection, cursor, [("BTCUSDT", 105.0)], now=START + 60)
+
+    store.record(connection, cursor, [("BTCUSDT", 110.0)], now=START + 70)
+
+    assert stored_bars(cursor, 300) == {START: [100.0, 105.0, 100.0, 105.0, 2]}
+
+def test_compaction_continues_after_restart(sqlite_db, store):
+    connection, cursor = sqlite_db
+    ticks = [(START + i * 30, 100.0 + i) for i in range(41)]
+    for timestamp, price in ticks[:20]:
+        store.record(connection, cursor, [("BTCUSDT", price)], now=timestamp)
+
+    restarted = PriceRollupStore(tiers=TIERS, enabled=True)
+    for timestamp, price in ticks[20:]:
+        restarted.record(connection, cursor, [("BTCUSDT", price)], now=timestamp)
+
+    assert stored_bars(cursor, 300) == expected_bars(ticks, 300)
+
+def test_prune_keeps_each_tier_for_its_retention(sqlite_db, store):
+    connection, cursor = sqlite_db
+    for i in range(10):
+        store.record(connection, cursor, [("BTCUSDT", 100.0)], now=START + i * 600)
+
+    deleted = store.prune(connection, cursor, now=START + 2 * DAY + 3000)
+
+    assert deleted == 5
+    assert min(stored_bars(cursor, 60)) == START + 3000
+    assert min(stored_bars(cursor, 300)) == START
+
+def test_select_tier(store):
+    now = START + 100 * DAY
+
+    assert store.select_tier(now - 3600, now, now=now) == (TIERS[0], 60)
+    assert store.select_tier(now - 3600, now, resolution=90, now=now) == (TIERS[0], 120)
+    assert store.select_tier(now - 10 * DAY, now, now=now) == (TIERS[1], 1800)
+    assert store.select_tier(now - 10 * DAY, now, resolution=60, now=now) == (TIERS[1], 300)
+    assert store.select_tier(now - 90 * DAY, now, now=now) == (TIERS[2], 18000)
+    assert store.select_tier(now - 1000 * DAY, now, resolution=60, now=now) == (TIERS[2], 3600)
+
+def test_load_bars_resamples(sqlite_db, store):
+    connection, cursor = sqlite_db
+    ticks = [(START + i * 60, 100.0 + i % 7) for i in range(30)]
+    for timestamp, price in ticks:
+        store.record(connection, cursor, [("BTCUSDT", price)], now=timestamp)
+
+    result = store.load_bars(connection, cursor, "BTCUSDT", START, START + 1800, resolution=120,
+                             now=START + 1800)
+
+    assert result["tier"] == "1m"
+    assert result["resolution"] == 120
+    expected = expected_bars(ticks, 120)
+    assert [[bar["open"], bar["high"], bar["low"], bar["close"], bar["ticks"]] for bar in result["bars"]] == \
+        [expected[bucket] for bucket in sorted(expected)]
+
+def test_disabled_store_writes_nothing(sqlite_db):
+    connection, cursor = sqlite_db
+    store = PriceRollupStore(tiers=TIERS, enabled=False)
+
+    store.record(connection, cursor, [("BTCUSDT", 100.0)], now=START)
+
+    assert stored_bars(cursor, 60) == {}
@@ -0,0 +1,78 @@
+import pytest
+
+from app import scheduler
+from app.scheduler import TickScheduler
+
+@pytest.fixture
+def make_scheduler(clock, monkeypatch):
+    monkeypatch.setattr(scheduler, "time", clock)
+
+    def make(**kwargs):
+        tick_scheduler = TickScheduler(10.0, **kwargs)
+        tick_scheduler.reset()
+        return tick_scheduler
+    return make
+
+def run_tick(tick_scheduler, clock, duration):
+    tick_scheduler.tick_started()
+    clock.sleep(duration)
+    tick_scheduler.tick_finished()
+
+def test_deadlines_do_not_drift(make_scheduler, clock):
+    tick_scheduler = make_scheduler()
+    start = clock.now
+
+    for _ in range(5):
+        assert tick_scheduler.due()
+        run_tick(tick_scheduler, clock, 3.0)
+        clock.sleep(tick_scheduler.delay())
+
+    assert clock.now == pytest.approx(start + 50.0)
+    assert tick_scheduler.ticks == 5
+    assert tick_scheduler.overruns == 0
+    assert tick_scheduler.durations.snapshot()["count"] == 5
+
+def test_overrun_skips_missed_ticks(make_scheduler, clock):
+    tick_scheduler = make_scheduler(overrun_policy="skip")
+    start = clock.now
+
+    run_tick(tick_scheduler, clock, 25.0)
+
+    assert tick_scheduler.deadline == pytest.approx(start + 30.0)
+    assert tick_scheduler.overruns == 1
+    assert tick_scheduler.skipped == 2
+
+def test_overrun_merges_missed_ticks(make_scheduler, clock):
+    tick_scheduler = make_scheduler(overrun_policy="merge")
+    start = clock.now
+
+    run_tick(tick_scheduler, clock, 25.0)
+
+    assert tick_scheduler.due()
+    assert tick_scheduler.deadline == pytest.approx(start + 20.0)
+    assert tick_scheduler.merged == 2
+
+def test_unknown_overrun_policy_skips(make_scheduler):
+    assert make_scheduler(overrun_policy="bogus").overrun_policy == "skip"
+
+def test_adaptive_interval_follows_volatility(make_scheduler, clock):
+    tick_scheduler = make_scheduler(adaptive=True, min_interval=2.0, volatility_target=0.05)
+
+    for _ in range(30):
+        tick_scheduler.record_crossings(10, 100)
+        run_tick(tick_scheduler, clock, 0.1)
+    assert tick_scheduler.interval == pytest.approx(2.0, abs=0.5)
+
+    for _ in range(30):
+        tick_scheduler.record_crossings(0, 100)
+        run_tick(tick_scheduler, clock, 0.1)
+    assert tick_scheduler.interval == pytest.approx(10.0, abs=0.5)
+
+def test_fixed_interval_without_adaptive(make_scheduler, clock):
+    tick_scheduler = make_scheduler(adaptive=False)
+
+    tick_scheduler.record_crossings(100, 100)
+    run_tick(tick_scheduler, clock, 0.1)
+
+    assert tick_scheduler.interval == 10.0
+    assert tick_scheduler.volatility > 0
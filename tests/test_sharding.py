@@ -0,0 +1,46 @@
+from app.sharding import ShardCoordinator, shard_of
+
+def sync_all(connection, cursor, coordinators, rounds=3):
+    for _ in range(rounds):
+        for coordinator in coordinators:
+            coordinator.sync(connection, cursor)
+            connection.commit()
+
+def test_shard_of_is_stable():
+    assert shard_of("BTCUSDT", 4) == shard_of("BTCUSDT", 4)
+    assert 0 <= shard_of("BTCUSDT", 4) < 4
+
+def test_shards_are_split_without_idle_workers(sqlite_db):
+    connection, cursor = sqlite_db
+    coordinators = [ShardCoordinator(shard_count=4, worker_id=f"worker-{i}") for i in range(3)]
+
+    sync_all(connection, cursor, coordinators)
+
+    owned = [coordinator.owned for coordinator in coordinators]
+    assert sorted(len(shards) for shards in owned) == [1, 1, 2]
+    assert frozenset().union(*owned) == frozenset(range(4))
+    assert sum(len(shards) for shards in owned) == 4
+
+def test_single_worker_owns_all_shards(sqlite_db):
+    connection, cursor = sqlite_db
+    coordinator = ShardCoordinator(shard_count=4, worker_id="worker-0")
+    cursor.executemany("INSERT INTO coin_monitor (symbol, initial_price, low_price, high_price, latest_price) "
+                       "VALUES (?, 1, 1, 1, 1)", [("BTCUSDT",), ("ETHUSDT",)])
+
+    assert coordinator.sync(connection, cursor)
+
+    assert coordinator.owned == frozenset(range(4))
+    assert coordinator.symbols == ["BTCUSDT", "ETHUSDT"]
+    assert coordinator.owns("BTCUSDT")
+
+def test_release_hands_shards_over(sqlite_db):
+    connection, cursor = sqlite_db
+    first, second = (ShardCoordinator(shard_count=4, worker_id=f"worker-{i}") for i in range(2))
+    sync_all(connection, cursor, [first, second])
+    assert len(first.owned) == len(second.owned) == 2
+
+    first.release(connection, cursor)
+    second.sync(connection, cursor)
+
+    assert first.owned == frozenset()
+    assert second.owned == frozenset(range(4))
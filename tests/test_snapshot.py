@@ -0,0 +1,118 @@
+import json
+from datetime import datetime
+
+from app.snapshot import SnapshotStore
+
+def coin(symbol, price, updated_at="2024-01-01T00:00:00"):
+    return {"symbol": symbol, "latest_price": price, "updated_at": updated_at}
+
+def test_publish_serializes_the_coin_list():
+    store = SnapshotStore()
+
+    snapshot = store.publish([coin("BTCUSDT", 1.0), coin("ETHUSDT", 2.0)])
+
+    assert store.current is snapshot
+    assert json.loads(snapshot.body) == [coin("BTCUSDT", 1.0), coin("ETHUSDT", 2.0)]
+    assert snapshot.by_symbol["ETHUSDT"]["latest_price"] == 2.0
+    assert snapshot.matches_etag(snapshot.etag)
+    assert snapshot.matches_etag(f'W/{snapshot.etag}, "other"')
+    assert not snapshot.matches_etag('"other"')
+    assert not snapshot.matches_etag(None)
+
+def test_versions_increase():
+    store = SnapshotStore()
+
+    first = store.publish([])
+    second = store.publish([])
+
+    assert second.version == first.version + 1
+
+def test_delta_body_reports_changes_and_removals():
+    store = SnapshotStore()
+    first = store.publish([coin("BTCUSDT", 1.0), coin("ETHUSDT", 2.0), coin("XRPUSDT", 0.5)])
+    # Only updated_at changes for BTCUSDT, which doesn't count as a change
+    store.publish([coin("BTCUSDT", 1.0, "2024-01-01T00:00:05"), coin("ETHUSDT", 2.5), coin("XRPUSDT", 0.5)])
+    third = store.publish([coin("BTCUSDT", 1.0, "2024-01-01T00:00:10"), coin("ETHUSDT", 2.5)])
+
+    delta = json.loads(third.delta_body(first.version))
+
+    assert delta["version"] == third.version
+    assert delta["since"] == first.version
+    assert [changed["symbol"] for changed in delta["changed"]] == ["ETHUSDT"]
+    assert delta["removed"] == ["XRPUSDT"]
+
+    latest = json.loads(third.delta_body(third.version))
+    assert latest["changed"] == [] and latest["removed"] == []
+
+def test_timestamps_are_served_in_iso_format():
+    store = SnapshotStore()
+
+    snapshot = store.publish([coin("BTCUSDT", 1.0, datetime(2024, 1, 1, 0, 0, 5))])
+
+    assert snapshot.by_symbol["BTCUSDT"]["updated_at"] == "2024-01-01T00:00:05"
+    assert json.loads(snapshot.body) == [coin("BTCUSDT", 1.0, "2024-01-01T00:00:05")]
+
+def test_unchanged_records_are_reused():
+    store = SnapshotStore()
+    first = store.publish([coin("BTCUSDT", 1.0), coin("ETHUSDT", 2.0)])
+
+    second = store.publish([coin("BTCUSDT", 1.0), coin("ETHUSDT", 2.5)])
+
+    assert second.by_symbol["BTCUSDT"] is first.by_symbol["BTCUSDT"]
+    assert second.by_symbol["ETHUSDT"] is not first.by_symbol["ETHUSDT"]
+    assert json.loads(second.body) == [coin("BTCUSDT", 1.0), coin("ETHUSDT", 2.5)]
+
+def test_publish_changes_applies_changed_fields():
+    store = SnapshotStore()
+    first = store.publish([coin("BTCUSDT", 1.0), coin("ETHUSDT", 2.0)])
+
+    second = store.publish_changes(first, {"ETHUSDT": {"latest_price": 2.5}})
+
+    assert store.current is second
+    assert json.loads(second.body) == [coin("BTCUSDT", 1.0), coin("ETHUSDT", 2.5)]
+    assert second.by_symbol["BTCUSDT"] is first.by_symbol["BTCUSDT"]
+    delta = json.loads(second.delta_body(first.version))
+    assert [changed["symbol"] for changed in delta["changed"]] == ["ETHUSDT"]
+
+def test_publish_changes_needs_the_current_snapshot():
+    store = SnapshotStore()
+    first = store.publish([coin("BTCUSDT", 1.0)])
+
+    assert store.publish_changes(first, {"XRPUSDT": {"latest_price": 0.5}}) is None
+    store.publish([coin("BTCUSDT", 1.5)])
+    assert store.publish_changes(first, {"BTCUSDT": {"latest_price": 2.0}}) is None
+    assert store.publish_changes(None, {}) is None
+    assert store.current.by_symbol["BTCUSDT"]["latest_price"] == 1.5
+
+def test_delta_body_unknown_version():
+    store = SnapshotStore()
+    snapshot = store.publish([coin("BTCUSDT", 1.0)])
+
+    assert snapshot.delta_body(snapshot.version - 1) is None
+    assert snapshot.delta_body(snapshot.version + 1) is None
+
+def test_query_body_is_cached_per_snapshot():
+    store = SnapshotStore()
+    snapshot = store.publish([coin("BTCUSDT", 1.0)])
+    runs = []
+
+    def run(coins):
+        runs.append(len(coins))
+        return [dict(c) for c in coins], "cursor"
+
+    assert snapshot.query_body("key", run) == snapshot.query_body("key", run)
+    assert runs == [1]
+    assert store.publish([coin("BTCUSDT", 1.0)]).query_body("key", run)[1] == "cursor"
+    assert runs == [1, 1]
+
+def test_listeners_get_every_snapshot():
+    store = SnapshotStore()
+    received = []
+    store.add_listener(received.append)
+    store.add_listener(lambda snapshot: 1 / 0)
+
+    snapshot = store.publish([])
+    store.remove_listener(received.append)
+    store.publish([])
+
+    assert received == [snapshot]